@@ -0,0 +1,197 @@
+# backends.py
+
+import asyncio
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import aclosing
+from statistics import median
+
+import httpx
+
+from config import (
+    OPENROUTER_MODEL, LOCAL_LLM_URL, LOCAL_LLM_MODEL, LOCAL_LLM_API_KEY, LLM_READ_TIMEOUT,
+    LLM_BACKENDS, LLM_FALLBACK_BACKEND, LLM_ROUTE_WINDOW, LLM_ROUTE_EXPLORE
+)
+from flow_control import CircuitOpenError
+from llm_client import LLMClient, UpstreamError, llm_client
+
+# Failures that send a request on to the next backend
+BACKEND_ERRORS = (httpx.TransportError, UpstreamError, CircuitOpenError)
+
+class Backend(ABC):
+    """A source of chat replies.
+
+    payload is an OpenAI-style chat-completions body without "model";
+    each backend fills in its own. cacheable is False for backends whose
+    replies should not be served again from the response cache.
+    """
+
+    name = ""
+    model = ""
+    cacheable = True
+
+    @abstractmethod
+    async def stream(self, payload, max_retries=3, retry_delay=1):
+        """Yield the reply in pieces."""
+
+    @abstractmethod
+    async def complete(self, payload, max_retries=3, retry_delay=1):
+        """Return the whole reply text."""
+
+class OpenAICompatibleBackend(Backend):
+    """Any chat-completions endpoint speaking the OpenAI wire format (OpenRouter, vLLM, Ollama, ...)."""
+
+    def __init__(self, name, model, client):
+        self.name = name
+        self.model = model
+        self.client = client
+
+    async def stream(self, payload, max_retries=3, retry_delay=1):
+        async with aclosing(self.client.stream(dict(payload, model=self.model), max_retries, retry_delay)) as deltas:
+            async for delta in deltas:
+                yield delta
+
+    async def complete(self, payload, max_retries=3, retry_delay=1):
+        response = await self.client.complete(dict(payload, model=self.model), max_retries, retry_delay)
+        return response.json()["choices"][0]["message"]["content"]
+
+class OfflineBackend(Backend):
+    """Deterministic template replies, for running the app with no network or API key."""
+
+    name = "offline"
+    model = "offline-template"
+    cacheable = False
+    TEMPLATE = ("You said: \"{user_input}\". I'm practicing offline right now, so let's keep it simple. "
+                "Try saying that again with one new word!")
+
+    def reply(self, payload):
+        return self.TEMPLATE.format(user_input=payload["messages"][-1]["content"].strip())
+
+    async def stream(self, payload, max_retries=3, retry_delay=1):
+        for word in self.reply(payload).split(" "):
+            yield word + " "
+            await asyncio.sleep(0)
+
+    async def complete(self, payload, max_retries=3, retry_delay=1):
+        return self.reply(payload)
+
+def build_backend(name):
+    """Create the backend configured under name in config.py."""
+    if name == "openrouter":
+        # Shares the module-level client, so its pool and breaker are the app's
+        return OpenAICompatibleBackend("openrouter", OPENROUTER_MODEL, llm_client)
+    if name == "local":
+        headers = {"Content-Type": "application/json"}
+        if LOCAL_LLM_API_KEY:
+            headers["Authorization"] = f"Bearer {LOCAL_LLM_API_KEY}"
+        return OpenAICompatibleBackend("local", LOCAL_LLM_MODEL, LLMClient(url=LOCAL_LLM_URL, headers=headers))
+    if name == "offline":
+        return OfflineBackend()
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+class BackendRouter:
+    """Sends each request to the backend with the lowest recent median latency.
+
+    Latency is time to the first piece of a streamed reply, or to the whole
+    reply otherwise, over each backend's last window requests; a failure
+    counts as failure_penalty seconds. Backends without samples go first so
+    they get measured, and with probability explore a random backend is
+    tried first to keep the others' numbers fresh. If a backend fails before
+    producing any text, the next one is tried, then fallback (if set). Once
+    text has been sent to the learner, errors are raised instead.
+    """
+
+    def __init__(self, backends, fallback=None, window=LLM_ROUTE_WINDOW, explore=LLM_ROUTE_EXPLORE,
+                 failure_penalty=LLM_READ_TIMEOUT):
+        self.backends = list(backends)
+        self.fallback = fallback
+        self.explore = explore
+        self.failure_penalty = failure_penalty
+        self._latencies = {backend.name: deque(maxlen=window) for backend in self.all_backends()}
+        self.served = {backend.name: 0 for backend in self.all_backends()}
+        self.failures = {backend.name: 0 for backend in self.all_backends()}
+
+    def all_backends(self):
+        return self.backends + ([self.fallback] if self.fallback else [])
+
+    def backend(self, name):
+        return next(backend for backend in self.all_backends() if backend.name == name)
+
+    @property
+    def cache_namespace(self):
+        """Identifies the routed models in response-cache keys."""
+        return "|".join(backend.model for backend in self.backends)
+
+    def p50(self, name):
+        latencies = self._latencies[name]
+        return median(latencies) if latencies else 0.0
+
+    def route(self):
+        """Backends in the order they should be tried for the next request."""
+        ordered = sorted(self.backends, key=lambda backend: self.p50(backend.name))
+        if len(ordered) > 1 and random.random() < self.explore:
+            ordered.insert(0, ordered.pop(random.randrange(1, len(ordered))))
+        return ordered + ([self.fallback] if self.fallback else [])
+
+    def _record(self, backend, latency=None):
+        """Add a latency sample for backend; None records a failure."""
+        if latency is None:
+            self.failures[backend.name] += 1
+            latency = self.failure_penalty
+        else:
+            self.served[backend.name] += 1
+        self._latencies[backend.name].append(latency)
+
+    async def stream(self, payload, max_retries=3, retry_delay=1):
+        """Yield (backend, delta) pairs from the first backend that answers."""
+        error = None
+        for backend in self.route():
+            start = time.perf_counter()
+            started = False
+            try:
+                async with aclosing(backend.stream(payload, max_retries, retry_delay)) as deltas:
+                    async for delta in deltas:
+                        if not started:
+                            started = True
+                            self._record(backend, time.perf_counter() - start)
+                        yield backend, delta
+                return
+            except BACKEND_ERRORS as e:
+                if started:
+                    raise
+                self._record(backend)
+                error = e
+        raise error
+
+    async def complete(self, payload, max_retries=3, retry_delay=1):
+        """Return (backend, text) from the first backend that answers."""
+        error = None
+        for backend in self.route():
+            start = time.perf_counter()
+            try:
+                text = await backend.complete(payload, max_retries, retry_delay)
+            except BACKEND_ERRORS as e:
+                self._record(backend)
+                error = e
+                continue
+            self._record(backend, time.perf_counter() - start)
+            return backend, text
+        raise error
+
+    def stats(self):
+        return {
+            backend.name: {
+                "p50_ms": self.p50(backend.name) * 1000,
+                "served": self.served[backend.name],
+                "failures": self.failures[backend.name]
+            }
+            for backend in self.all_backends()
+        }
+
+# Router over the backends selected in config.py, used by the chat pipeline
+llm_router = BackendRouter(
+    [build_backend(name) for name in LLM_BACKENDS],
+    build_backend(LLM_FALLBACK_BACKEND) if LLM_FALLBACK_BACKEND else None
+)
@@ -0,0 +1,172 @@
+# backfill.py
+
+"""Re-analyze stored chats after the sentiment or mistake logic changes.
+
+Chats are read in id order, one chunk at a time. Each page is fetched by
+keyset pagination (WHERE id > last ORDER BY id), so it is a primary-key
+seek however deep into the table it is. Chunks are scored in a pool of
+worker processes and written back in one transaction per chunk:
+- changed sentiment scores are updated
+- each chat's mistake row is inserted, retyped or deleted to match the
+  new classification, with the stats triggers keeping totals in step
+
+At most two chunks per worker are held at once, so memory stays flat for
+any table size. The last committed chat id is checkpointed after every
+chunk, so an interrupted run resumes where it stopped. A run that gets
+through every chat marks the checkpoint complete, so the next one (after
+the next logic change) goes over all chats again. --restart discards an
+interrupted run's checkpoint.
+Usage: python backfill.py [--database language_chatbot.db] [--chunk-size 5000] [--workers N]
+       [--checkpoint backfill_checkpoint.json] [--restart] [--only sentiment|mistakes]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from config import DATABASE_PATH, BACKFILL_CHUNK_SIZE, BACKFILL_CHECKPOINT, BACKFILL_PROGRESS_INTERVAL
+from mistakes import analyze_mistake
+from sentiment import analyze_many, analyze_sentiment
+from storage import Storage
+
+def _init_worker():
+    # Load the sentiment lexicon once per process rather than in the first chunk
+    analyze_sentiment("warm up")
+
+def analyze_chunk(turns):
+    """(chat_id, sentiment_score, mistake_type) for each (chat_id, user_input, bot_response)."""
+    scores = analyze_many([user_input or "" for _, user_input, _ in turns])
+    return [
+        (chat_id, score, analyze_mistake(user_input or "", bot_response or ""))
+        for (chat_id, user_input, bot_response), score in zip(turns, scores)
+    ]
+
+def load_checkpoint(path):
+    try:
+        with open(path) as checkpoint:
+            return json.load(checkpoint)
+    except FileNotFoundError:
+        return None
+
+def save_checkpoint(path, state):
+    # Write then rename, so a crash never leaves a half-written checkpoint
+    temporary = path + ".tmp"
+    with open(temporary, "w") as checkpoint:
+        json.dump(state, checkpoint)
+    os.replace(temporary, path)
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+class Progress:
+    """Throughput and ETA, estimated from how far through the id range the run is."""
+
+    def __init__(self, start_id, max_id, interval=BACKFILL_PROGRESS_INTERVAL, report=print):
+        self.start_id = start_id
+        self.max_id = max_id or 0
+        self.interval = interval
+        self.report = report
+        self.rows = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def update(self, rows, last_id, state, final=False):
+        self.rows += rows
+        now = time.perf_counter()
+        if not final and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        elapsed = now - self.started
+        rate = self.rows / elapsed if elapsed else 0.0
+        span = self.max_id - self.start_id
+        done = min(1.0, (last_id - self.start_id) / span) if span > 0 else 1.0
+        eta = elapsed * (1 - done) / done if 0 < done < 1 else 0.0
+        self.report(
+            f"{'done' if final else 'progress'}: {state['rows']:,} rows ({done:.1%}) at {rate:,.0f} rows/s, "
+            f"ETA {format_duration(eta)} | sentiment updated {state['sentiment']:,}, mistakes "
+            f"+{state['inserted']:,} ~{state['retyped']:,} -{state['deleted']:,}"
+        )
+
+def run_backfill(store, chunk_size=BACKFILL_CHUNK_SIZE, workers=None, checkpoint_path=BACKFILL_CHECKPOINT,
+                 restart=False, sentiment=True, mistakes=True, progress_interval=BACKFILL_PROGRESS_INTERVAL,
+                 report=print):
+    """Re-analyze every chat after the checkpoint; returns the final checkpoint state.
+
+    workers=0 analyzes in this process, which is handy for small databases.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    database = os.path.abspath(store.pool.path)
+    state = None if restart else load_checkpoint(checkpoint_path)
+    if state is not None and state.get("database") != database:
+        report(f"checkpoint {checkpoint_path} belongs to {state.get('database')}; starting from the first chat")
+        state = None
+    if state is not None and state.get("complete"):
+        state = None  # the last run finished; this one re-analyzes everything
+    if state is None:
+        state = {"database": database, "last_id": 0, "rows": 0, "sentiment": 0, "inserted": 0, "retyped": 0,
+                 "deleted": 0}
+    elif state["last_id"]:
+        report(f"resuming after chat id {state['last_id']:,} ({state['rows']:,} rows already done)")
+
+    _, max_id = store.chat_id_range()
+    progress = Progress(state["last_id"], max_id, progress_interval, report)
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker) if workers else None
+    pending = deque()  # (chunk, future or results), in id order
+    last_read = state["last_id"]
+    exhausted = False
+    try:
+        while True:
+            # Keep every worker busy while holding at most two chunks per worker
+            while not exhausted and len(pending) < max(1, workers) * 2:
+                chunk = store.chats_after(last_read, chunk_size)
+                if not chunk:
+                    exhausted = True
+                    break
+                last_read = chunk[-1][0]
+                turns = [(chat_id, user_input, bot_response) for chat_id, _, user_input, bot_response, *_ in chunk]
+                pending.append((chunk, pool.submit(analyze_chunk, turns) if pool else analyze_chunk(turns)))
+            if not pending:
+                break
+
+            chunk, results = pending.popleft()
+            if pool:
+                results = results.result()
+            counts = store.apply_reanalysis(chunk, results, sentiment=sentiment, mistakes=mistakes)
+            for key, count in counts.items():
+                state[key] += count
+            state["rows"] += len(chunk)
+            state["last_id"] = chunk[-1][0]
+            save_checkpoint(checkpoint_path, state)
+            progress.update(len(chunk), state["last_id"], state)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+    state["complete"] = True
+    save_checkpoint(checkpoint_path, state)
+    progress.update(0, state["last_id"], state, final=True)
+    return state
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-analyze stored chats with the current sentiment and mistake logic.")
+    parser.add_argument("--database", default=DATABASE_PATH)
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE, help="chats per read and per transaction")
+    parser.add_argument("--workers", type=int, default=None, help="analysis processes (default: CPU count, 0: none)")
+    parser.add_argument("--checkpoint", default=BACKFILL_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true",
+                        help="discard an interrupted run's checkpoint and start from the first chat")
+    parser.add_argument("--only", choices=("sentiment", "mistakes"), help="re-analyze just one of the two")
+    parser.add_argument("--progress-interval", type=float, default=BACKFILL_PROGRESS_INTERVAL,
+                        help="seconds between progress lines")
+    args = parser.parse_args()
+
+    store = Storage(args.database)
+    store.migrate()
+    run_backfill(store, args.chunk_size, args.workers, args.checkpoint, args.restart,
+                 sentiment=args.only != "mistakes", mistakes=args.only != "sentiment",
+                 progress_interval=args.progress_interval)
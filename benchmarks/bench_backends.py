@@ -0,0 +1,82 @@
+# benchmarks/bench_backends.py
+
+"""Latency-based routing and fallback across LLM backends, and offline turns.
+
+Two fake servers stand in for OpenRouter (slow) and a local OpenAI-compatible
+server (fast). The script reports where requests were routed, then takes
+the fast one down and checks every turn still gets an answer. Finally it
+runs chat turns through chatbot_ui on the offline backend alone, with no
+server at all.
+Usage: python benchmarks/bench_backends.py [requests] [slow_latency_s] [fast_latency_s]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import BackendRouter, OfflineBackend, OpenAICompatibleBackend
+from fake_openrouter import FakeOpenRouter
+from llm_client import LLMClient
+
+def payload(text):
+    return {"messages": [{"role": "user", "content": text}]}
+
+async def send(router, count, label):
+    start = time.perf_counter()
+    for i in range(count):
+        reply = "".join([delta async for _, delta in router.stream(payload(f"{label} {i}"), retry_delay=0.05)])
+        assert reply.startswith("Echo: "), reply
+    elapsed = time.perf_counter() - start
+    print(f"  {label}: {count / elapsed:.1f} turns/sec")
+    for name, stats in router.stats().items():
+        print(f"    {name:10} p50={stats['p50_ms']:7.1f}ms served={stats['served']:4} failures={stats['failures']}")
+
+async def routing(requests, slow_latency, fast_latency):
+    with FakeOpenRouter(latency=slow_latency) as slow, FakeOpenRouter(latency=fast_latency) as fast:
+        router = BackendRouter([
+            OpenAICompatibleBackend("openrouter", "fake", LLMClient(url=slow.url, headers={})),
+            OpenAICompatibleBackend("local", "fake", LLMClient(url=fast.url, headers={}))
+        ], fallback=OfflineBackend())
+        await send(router, requests, "both healthy")
+        fast.inject_faults(error_rate=1.0, error_status=503)
+        await send(router, requests, "local down")
+        for backend in router.backends:
+            await backend.client.aclose()
+
+def offline_chat(turns):
+    os.chdir(tempfile.mkdtemp())
+    import chatbot_ui
+    chatbot_ui.create_app()
+    chatbot_ui.llm_router = BackendRouter([OfflineBackend()])
+    request = SimpleNamespace(session_hash="offline-learner")
+    chatbot_ui.setup_user("English", "Spanish", "Beginner", "greeting someone", request=request)
+
+    async def run():
+        history = []
+        for i in range(turns):
+            async for history, _, _ in chatbot_ui.turn_pipeline.run(f"hola {i}", history, request=request,
+                                                                     refresh_view=False):
+                pass
+        return history
+
+    start = time.perf_counter()
+    history = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    assert all("practicing offline" in message["content"] for message in history if message["role"] == "assistant")
+    print(f"offline backend: {turns} chat turns in {elapsed:.2f}s with no network")
+
+def main(requests, slow_latency, fast_latency):
+    print("routing:")
+    asyncio.run(routing(requests, slow_latency, fast_latency))
+    offline_chat(20)
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    slow_latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    fast_latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.01
+    main(requests, slow_latency, fast_latency)
@@ -0,0 +1,121 @@
+# benchmarks/bench_backfill.py
+
+"""Backfill throughput, memory and resumability.
+
+Seeds a database with chats whose sentiment scores and mistake rows are
+stale. It runs backfill.py in a child process and kills it partway
+through, then resumes from the checkpoint in this process. After that it
+checks every chat against the current analysis and checks that the stats
+totals match the rows. Peak RSS is reported for the resumed run; it
+includes database pages SQLite maps into memory, so a full rerun also
+reports the Python heap peak, which stays flat however many chats there are.
+Runs against a throwaway database in a temporary directory.
+Usage: python benchmarks/bench_backfill.py [chats] [workers] [chunk_size]
+"""
+
+import json
+import os
+import random
+import resource
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backfill import load_checkpoint, run_backfill
+from mistakes import analyze_mistake
+from sentiment import analyze_sentiment
+from storage import Storage
+
+INPUTS = ["I love this place!", "this is so hard", "how do I say thank you", "yo tener hambre",
+          "where is the station", "I don't understand", "great lesson", "Je suis allé"]
+REPLIES = ["Watch the verb tense here.", "A better word choice is 'tener'.", "Nice pronunciation!",
+           "In formal settings say 'usted'.", "Perfect, well done!", "That's the right answer."]
+
+def seed(store, chats):
+    rng = random.Random(2)
+    now = int(time.time())
+    batch = []
+    for i in range(chats):
+        # Stale data: neutral scores and a random (often wrong) mistake type
+        batch.append(("learner", f"{rng.choice(INPUTS)} {i % 5000}", rng.choice(REPLIES), 0.0, "greeting someone",
+                      rng.choice(["general", "grammar", "vocabulary", "cultural"]), now - chats + i))
+        if len(batch) == 10000:
+            store.record_turns(batch)
+            batch = []
+    if batch:
+        store.record_turns(batch)
+
+def verify(path):
+    conn = sqlite3.connect(path)
+    mistakes = {}
+    for chat_id, mistake_type in conn.execute("SELECT chat_id, mistake_type FROM mistakes"):
+        mistakes.setdefault(chat_id, []).append(mistake_type)
+    for chat_id, user_input, bot_response, score in conn.execute(
+        "SELECT id, user_input, bot_response, sentiment_score FROM chats"
+    ):
+        expected = analyze_mistake(user_input, bot_response)
+        assert mistakes.get(chat_id, []) == ([] if expected == "general" else [expected]), chat_id
+        assert abs(score - analyze_sentiment(user_input)) < 1e-9, chat_id
+    totals = dict(conn.execute("SELECT mistake_type, count FROM mistake_totals WHERE count > 0"))
+    counted = dict(conn.execute("SELECT mistake_type, COUNT(*) FROM mistakes GROUP BY mistake_type"))
+    assert totals == counted, (totals, counted)
+    conn.close()
+
+def main(chats, workers, chunk_size):
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, "bench.db")
+    checkpoint = os.path.join(workdir, "checkpoint.json")
+    store = Storage(path)
+    store.migrate()
+    seed(store, chats)
+    print(f"seeded {chats:,} chats with stale scores and mistake types")
+
+    # Interrupt a run partway through, as a crash or Ctrl-C would
+    child = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "backfill.py"), "--database", path, "--checkpoint", checkpoint,
+         "--workers", str(workers), "--chunk-size", str(chunk_size), "--progress-interval", "3600"],
+        stdout=subprocess.DEVNULL, start_new_session=True
+    )
+    while (load_checkpoint(checkpoint) or {}).get("rows", 0) < chats // 3 and child.poll() is None:
+        time.sleep(0.05)
+    os.killpg(child.pid, signal.SIGKILL)  # the pool workers too
+    child.wait()
+    interrupted = load_checkpoint(checkpoint)
+    print(f"killed the first run after {interrupted['rows']:,} rows (checkpoint at chat id {interrupted['last_id']:,})")
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    state = run_backfill(Storage(path), chunk_size, workers, checkpoint, progress_interval=1)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    resumed_rows = state["rows"] - interrupted["rows"]
+    print(f"resumed: {resumed_rows:,} rows in {elapsed:.2f}s ({resumed_rows / elapsed:,.0f} rows/s) "
+          f"with {workers} workers, chunks of {chunk_size}")
+    print(f"peak RSS {rss_before:.0f}MB before the run, {rss_after:.0f}MB after")
+    print("changes: " + json.dumps({key: state[key] for key in ("sentiment", "inserted", "retyped", "deleted")}))
+
+    assert state["rows"] == chats, "every chat is processed exactly once across both runs"
+    verify(path)
+    print("every chat matches the current analysis; stats totals match the mistake rows")
+
+    assert load_checkpoint(checkpoint)["complete"], "a finished run marks its checkpoint complete"
+    tracemalloc.start()
+    again = run_backfill(Storage(path), chunk_size, workers, checkpoint, report=lambda line: None)
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    assert again["rows"] == chats, "the run after a finished one goes over every chat again"
+    assert again["inserted"] == again["retyped"] == again["deleted"] == again["sentiment"] == 0
+    print(f"next run: starts over after a finished one, nothing to change, Python heap peak {peak:.1f}MB")
+
+if __name__ == "__main__":
+    chats = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    main(chats, workers, chunk_size)
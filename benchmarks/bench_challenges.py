@@ -0,0 +1,99 @@
+# benchmarks/bench_challenges.py
+
+"""Challenge bank generation and serving.
+
+Generates a bank for every (language, difficulty, scene) through a
+stand-in LLM router that answers with JSON challenges after a fixed
+delay. It reruns generation to show finished keys are skipped, then
+serves challenge rounds with per-learner daily limits and checks that
+serving makes no LLM calls.
+Runs against a throwaway database in a temporary directory.
+Usage: python benchmarks/bench_challenges.py [rounds] [learners] [llm_latency_s]
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from challenges import ChallengeBank, DailyLimiter, build_bank, check_answer
+from config import CHALLENGE_BANK_SIZE, CHALLENGE_DAILY_LIMIT, CHALLENGE_DIFFICULTY_LEVELS, SCENE_OPTIONS
+from storage import Storage
+
+LANGUAGES = ["Spanish", "French", "German", "Italian", "Portuguese", "Japanese"]
+
+class SyntheticRouter:
+    """Answers generation requests with numbered challenges, like a model would in JSON."""
+
+    cacheable = True
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    async def complete(self, payload, max_retries=3, retry_delay=1):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        count = int(payload["messages"][-1]["content"].split()[1])
+        items = [{"prompt": f"sentence {self.calls}-{i}", "answer": f"frase {self.calls} {i}", "hint": "frase"}
+                 for i in range(count)]
+        return self, "```json\n" + json.dumps(items) + "\n```"
+
+def bank_keys():
+    return [(language, difficulty, scene) for language in LANGUAGES for difficulty in CHALLENGE_DIFFICULTY_LEVELS
+            for scene in SCENE_OPTIONS[difficulty.title()]]
+
+def main(rounds, learners, latency):
+    store = Storage(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    store.migrate()
+    router = SyntheticRouter(latency)
+    keys = bank_keys()
+
+    start = time.perf_counter()
+    added = asyncio.run(build_bank(store, router, keys))
+    elapsed = time.perf_counter() - start
+    print(f"generated {sum(added.values())} challenges for {len(keys)} keys in {elapsed:.2f}s "
+          f"({router.calls} LLM calls, {latency * 1000:.0f}ms each)")
+    assert all(count == CHALLENGE_BANK_SIZE for count in store.challenge_counts().values())
+
+    calls = router.calls
+    asyncio.run(build_bank(store, router, keys))
+    print(f"rerun: {router.calls - calls} LLM calls (full keys are skipped)")
+    assert router.calls == calls
+
+    bank = ChallengeBank(store)
+    limiter = DailyLimiter(CHALLENGE_DAILY_LIMIT)
+    rng = random.Random(11)
+    profiles = [rng.choice(keys) for _ in range(learners)]
+    served = refused = correct = 0
+    calls = router.calls
+    start = time.perf_counter()
+    for round_number in range(rounds):
+        learner = round_number % learners
+        challenge = bank.pick(*profiles[learner], rng=rng)
+        if not limiter.try_acquire(learner):
+            refused += 1
+            continue
+        served += 1
+        correct += check_answer(challenge[2] if rng.random() < 0.5 else "no sé", challenge[2])
+    elapsed = time.perf_counter() - start
+    print(f"{rounds} rounds for {learners} learners: {elapsed / rounds * 1e6:.1f}us per round, "
+          f"served={served} refused by the daily limit={refused} correct={correct}")
+    print(f"LLM calls while serving: {router.calls - calls}")
+    assert router.calls == calls, "serving must not call the LLM"
+    assert served == min(rounds, learners * CHALLENGE_DAILY_LIMIT)
+
+    tomorrow = time.time() + 86400
+    assert limiter.try_acquire(0, now=tomorrow) and limiter.remaining(1, now=tomorrow) == CHALLENGE_DAILY_LIMIT
+    print(f"per-round cost vs generating on demand: {elapsed / rounds * 1e6:.1f}us vs {latency * 1e6:.0f}us+")
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    learners = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    main(rounds, learners, latency)
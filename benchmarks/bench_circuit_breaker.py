@@ -0,0 +1,118 @@
+# benchmarks/bench_circuit_breaker.py
+
+"""Turn latency during an upstream outage, with and without the circuit breaker.
+
+Injects faults into the fake server: an outage returning 503s, a hang
+longer than the read timeout, and 429s carrying Retry-After. It then
+reports what each costs a learner's turn and how many requests reach the
+provider. The last part sends turns through chatbot_ui during an outage
+to check that learners get the friendly message within milliseconds.
+Usage: python benchmarks/bench_circuit_breaker.py [turns]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openrouter import FakeOpenRouter
+from flow_control import CircuitBreaker
+from llm_client import LLMClient, llm_client
+
+def payload(text):
+    return {"model": "fake", "messages": [{"role": "user", "content": text}]}
+
+async def timed_turn(client, text, max_retries=3):
+    start = time.perf_counter()
+    try:
+        async for _ in client.stream(payload(text), max_retries=max_retries, retry_delay=0.05):
+            pass
+        outcome = "ok"
+    except Exception as e:
+        outcome = type(e).__name__
+    return time.perf_counter() - start, outcome
+
+def summarize(label, results, upstream):
+    latencies = sorted(latency for latency, _ in results)
+    outcomes = {}
+    for _, outcome in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    print(f"  {label}: p50={latencies[len(latencies) // 2] * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms "
+          f"upstream requests={upstream} outcomes={outcomes}")
+
+async def outage(server, turns):
+    print("outage (every request gets a 503):")
+    server.inject_faults(error_rate=1.0, error_status=503)
+    for breaker in (False, True):
+        client = LLMClient(url=server.url, headers={}, circuit_breaker=breaker, coalesce=False)
+        before = server.request_count
+        results = [await timed_turn(client, f"turn {i}") for i in range(turns)]
+        summarize(f"breaker={breaker!s:5}", results, server.request_count - before)
+        await client.aclose()
+
+    print("recovery:")
+    client = LLMClient(url=server.url, headers={}, coalesce=False)
+    client.breaker = CircuitBreaker(failure_rate=0.5, window=20, min_calls=5, reset_timeout=0.5)
+    for i in range(turns):
+        await timed_turn(client, f"turn {i}")
+    server.inject_faults()
+    rejected = await timed_turn(client, "while open")
+    await asyncio.sleep(0.5)
+    recovered = await timed_turn(client, "trial")
+    print(f"  while open: {rejected[1]} in {rejected[0] * 1000:.2f}ms; after reset_timeout: {recovered[1]}, "
+          f"breaker {client.breaker.state}")
+    assert recovered[1] == "ok" and client.breaker.state == CircuitBreaker.CLOSED
+    await client.aclose()
+
+async def hang(server):
+    print("hang (provider accepts the request but answers after 3s, read timeout 0.5s):")
+    server.inject_faults(latency=3.0)
+    client = LLMClient(url=server.url, headers={}, read_timeout=0.5, circuit_breaker=False)
+    before = server.request_count
+    summarize("turn", [await timed_turn(client, "slow")], server.request_count - before)
+    server.inject_faults()
+    await client.aclose()
+
+async def retry_after(server, turns):
+    print("rate limited (30% of requests get 429 with Retry-After: 0.2):")
+    server.inject_faults(error_rate=0.3, error_status=429, retry_after=0.2)
+    client = LLMClient(url=server.url, headers={}, circuit_breaker=False, coalesce=False)
+    before = server.request_count
+    results = await asyncio.gather(*(timed_turn(client, f"turn {i}", max_retries=6) for i in range(turns)))
+    summarize("turns", results, server.request_count - before)
+    server.inject_faults()
+    await client.aclose()
+
+def friendly_messages(server, turns):
+    os.chdir(tempfile.mkdtemp())
+    import chatbot_ui
+    chatbot_ui.create_app()
+    llm_client.url = server.url
+    server.inject_faults(error_rate=1.0, error_status=503)
+
+    async def run():
+        latencies = []
+        for i in range(turns):
+            start = time.perf_counter()
+            reply = await chatbot_ui.query_openrouter(f"turn {i}", retry_delay=0.05)
+            latencies.append(time.perf_counter() - start)
+            assert "trouble connecting" in reply, reply
+        return latencies
+
+    latencies = asyncio.run(run())
+    tail = sorted(latencies[turns // 2:])
+    print(f"chat turns during an outage: first={latencies[0] * 1000:.0f}ms, "
+          f"once open p50={tail[len(tail) // 2] * 1000:.2f}ms (breaker {llm_client.breaker.state})")
+
+def main(turns):
+    with FakeOpenRouter(latency=0.02) as server:
+        asyncio.run(outage(server, turns))
+        asyncio.run(hang(server))
+        asyncio.run(retry_after(server, turns))
+        friendly_messages(server, turns)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
@@ -0,0 +1,73 @@
+# benchmarks/bench_context_window.py
+
+"""Prompt-context assembly: per-turn database query vs. the in-memory window.
+
+Times building the context block both ways and counts the recent-context
+queries the chat pipeline makes over a run of turns.
+Runs against a throwaway database in a temporary directory.
+Usage: python benchmarks/bench_context_window.py [turns]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openrouter import FakeOpenRouter
+from llm_client import llm_client
+
+def format_context(recent_context):
+    return "Previous conversation:\n" + "\n".join(
+        f"User: {msg[0]}\nAssistant: {msg[1]}" for msg in recent_context
+    ) + "\n\n"
+
+def main(turns):
+    os.chdir(tempfile.mkdtemp())
+    import chatbot_ui
+    chatbot_ui.create_app()
+
+    storage = chatbot_ui.storage
+    queries = []
+    recent_context = storage.recent_context
+
+    def counting_recent_context(*args, **kwargs):
+        queries.append(args)
+        return recent_context(*args, **kwargs)
+
+    storage.recent_context = counting_recent_context
+    request = SimpleNamespace(session_hash="bench")
+    chatbot_ui.setup_user("English", "Spanish", "Beginner", "greeting someone", request=request)
+
+    with FakeOpenRouter(reply_words=60) as server:
+        llm_client.url = server.url
+
+        async def run_turns():
+            history = []
+            for turn in range(turns):
+                async for history, _, _ in chatbot_ui.turn_pipeline.run(
+                        f"hello number {turn}", history, request=request, refresh_view=False):
+                    pass
+
+        asyncio.run(run_turns())
+    print(f"turns={turns} recent-context DB queries: before={turns} (one per turn) after={len(queries)}")
+
+    session = chatbot_ui.sessions.get("bench")
+    repeats = 5000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        format_context(recent_context(3, "bench"))
+    before = (time.perf_counter() - start) / repeats * 1e6
+    start = time.perf_counter()
+    for _ in range(repeats):
+        format_context(chatbot_ui.get_recent_context(session))
+    after = (time.perf_counter() - start) / repeats * 1e6
+    window = session["window"]
+    print(f"context assembly: before={before:.1f}us (DB, 3 turns) "
+          f"after={after:.1f}us (window, {len(window)} turns / {window.tokens} tokens)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,72 @@
+# benchmarks/bench_dashboard.py
+
+"""Dashboard refresh: rendering on every call vs. the version-keyed cache.
+
+Replays a stream of turns against a throwaway database, refreshing the
+dashboard after each one as the UI does, and counts the SQL queries each
+approach issues, the cache's one-row version read included. mistake_rate
+is the share of turns that store a mistake.
+Usage: python benchmarks/bench_dashboard.py [turns] [mistake_rate]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dashboard import DashboardRenderer, render_dashboard
+from storage import Storage
+
+class CountingStorage(Storage):
+    """Storage that counts the dashboard's read queries."""
+
+    queries = 0
+
+    def mistake_stats(self, session_id=None):
+        self.queries += 1
+        return super().mistake_stats(session_id)
+
+    def recent_mistakes(self, limit=5):
+        self.queries += 1
+        return super().recent_mistakes(limit)
+
+    @property
+    def mistakes_version(self):
+        self.queries += 1
+        return super().mistakes_version
+
+def main(turns, mistake_rate):
+    store = CountingStorage(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    store.migrate()
+    rng = random.Random(0)
+    # Learner text with markup, which must come out escaped
+    plan = [("grammar" if rng.random() < mistake_rate else "general", f"<b>turn {i}</b> & more")
+            for i in range(turns)]
+
+    def replay(refresh):
+        store.queries = 0
+        render_time = 0.0
+        for mistake_type, text in plan:
+            store.record_turn(text, "Check your grammar.", 0.0, "greeting someone", mistake_type)
+            start = time.perf_counter()
+            refresh()
+            render_time += time.perf_counter() - start
+        return render_time / turns * 1000, store.queries / turns
+
+    uncached_ms, uncached_queries = replay(lambda: render_dashboard(store.mistake_stats(), store.recent_mistakes(5)))
+    renderer = DashboardRenderer(store)
+    cached_ms, cached_queries = replay(renderer.render)
+
+    output = renderer.render()
+    assert output == render_dashboard(store.mistake_stats(), store.recent_mistakes(5))
+    assert "<b>" not in output and "&lt;b&gt;" in output
+    print(f"{turns} turns, {mistake_rate:.0%} with a mistake")
+    print(f"uncached: {uncached_ms:.3f}ms/refresh, {uncached_queries:.2f} queries/turn")
+    print(f"cached:   {cached_ms:.3f}ms/refresh, {cached_queries:.2f} queries/turn ({renderer.renders} renders)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 0.2)
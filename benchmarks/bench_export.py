@@ -0,0 +1,181 @@
+# benchmarks/bench_export.py
+
+"""Export and import throughput, file size and peak memory per format.
+
+Fills a throwaway database with chats, mistakes for a third of them and
+a little user_progress, then runs export.py and import for JSON Lines,
+gzipped JSON Lines and the columnar format. Each run is its own process,
+so its peak RSS is measured alone. RSS includes the database pages that
+SQLite maps into memory (DB_MMAP_SIZE at most). Filling and checking
+run in a spawned process, since a child inherits its parent's peak RSS
+as a floor. Every import is checked
+row for row against the source, stats totals included. Finally it adds
+new chats and reviews some old mistakes in place, exports only those rows
+with the watermark and applies them to an imported copy.
+Pass 8000000 for a database of a few GB (it takes a while to fill).
+Usage: python benchmarks/bench_export.py [chats] [new_chats]
+"""
+
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from export import read_columnar
+from storage import Storage
+
+SCENES = ["'greeting someone'", "'ordering food at a restaurant'", "'asking for directions'",
+          "'shopping for clothes'", "'booking a hotel room'", "'talking about hobbies'"]
+
+FILL_CHATS = f"""
+    WITH RECURSIVE n(i) AS (SELECT ? UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+    INSERT INTO chats (session_id, user_input, bot_response, sentiment_score, scene, timestamp, updated_at)
+    SELECT 'session-' || (i % 5000),
+           printf('Quisiera %d cafés con leche y un pastel, por favor %d', i % 97, abs(random()) % 100000),
+           printf('Great try! You wrote "%d cafés"; in this scene a native speaker would say "Me gustaría '
+                  || 'pedir %d cafés con leche". Remember that "quisiera" is the polite conditional form. '
+                  || 'Now, what would you like to eat with that? Try answering in a full sentence. %d',
+                  i % 97, i % 89, abs(random()) % 1000000),
+           round((abs(random()) % 2000) / 1000.0 - 1.0, 3),
+           CASE i % 6 {" ".join(f"WHEN {index} THEN {scene}" for index, scene in enumerate(SCENES))} END,
+           ? + i, ? + i
+    FROM n
+"""
+
+FILL_MISTAKES = """
+    INSERT INTO mistakes (session_id, user_input, mistake_type, correction, explanation, context, timestamp,
+                          due_at, chat_id, updated_at)
+    SELECT session_id, user_input, CASE id % 4 WHEN 0 THEN 'grammar' WHEN 1 THEN 'vocabulary'
+                                              WHEN 2 THEN 'pronunciation' ELSE 'cultural' END,
+           bot_response, 'Extracted from conversation', scene, timestamp, timestamp, id, timestamp
+    FROM chats WHERE id BETWEEN ? AND ? AND id % 3 = 0
+"""
+
+FILL_PROGRESS = """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+    INSERT INTO user_progress (session_date, scene, total_interactions, correct_responses, mistakes_made,
+                               confidence_score, updated_at)
+    SELECT date(1700000000 + i * 86400, 'unixepoch'), 'greeting someone', i % 40, i % 30, i % 10, (i % 100) / 100.0,
+           1700000000 + i * 86400
+    FROM n
+"""
+
+# A review session on old mistakes; the triggers stamp the rows' updated_at
+REVIEW_MISTAKES = """
+    UPDATE mistakes SET review_count = review_count + 1, review_streak = review_streak + 1,
+                        review_interval = 6, due_at = due_at + 6 * 86400
+    WHERE id IN (SELECT id FROM mistakes ORDER BY id LIMIT ?)
+"""
+
+TABLES = ["chats", "mistakes", "user_progress", "mistake_totals", "session_mistake_totals", "scene_totals",
+          "session_scene_totals"]
+
+def fill(path, first, last, start_time, step=200000):
+    """Add chats first..last (and their mistakes); returns the history row count."""
+    store = Storage(path)
+    store.migrate()
+    for low in range(first, last + 1, step):
+        high = min(low + step - 1, last)
+        with store.pool.transaction() as conn:
+            conn.execute(FILL_CHATS, (low, high, start_time, start_time))
+            conn.execute(FILL_MISTAKES, (low, high))
+    with store.pool.transaction() as conn:
+        if first == 1:
+            conn.execute(FILL_PROGRESS, (1000,))
+        rows = sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                   for table in ("chats", "mistakes", "user_progress"))
+    store.pool.close()
+    return rows
+
+def review(path, count):
+    """Grade the count oldest mistakes; returns how many changed."""
+    store = Storage(path)
+    with store.pool.transaction() as conn:
+        changed = conn.execute(REVIEW_MISTAKES, (count,)).rowcount
+    store.pool.close()
+    return changed
+
+def digest(path):
+    """Hash of every row of the history and totals tables, in key order."""
+    conn = sqlite3.connect(path)
+    hashed = hashlib.sha256()
+    for table in TABLES:
+        for row in conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2"):
+            hashed.update(repr(row).encode())
+    conn.close()
+    return hashed.hexdigest()
+
+def run(*args):
+    """Run export.py with args; returns (elapsed seconds, peak RSS in MB)."""
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, os.path.join(ROOT, "export.py"), *args], stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(child.pid, 0)
+    elapsed = time.perf_counter() - start
+    assert status == 0, f"export.py {' '.join(args)} failed"
+    return elapsed, usage.ru_maxrss / 1024
+
+def main(chats, new_chats):
+    worker = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, "source.db")
+    now = int(time.time())
+    rows = worker.submit(fill, source, 1, chats, now - chats - 3600).result()
+    print(f"source: {rows:,} rows, {os.path.getsize(source) / 1e6:,.0f}MB database")
+    expected = worker.submit(digest, source).result()
+
+    print(f"{'format':<10} {'size':>9} {'bytes/row':>9} {'export rows/s':>13} {'peak RSS':>8} "
+          f"{'import rows/s':>13} {'peak RSS':>8}")
+    for extension in ("jsonl", "jsonl.gz", "lcol"):
+        path = os.path.join(workdir, f"history.{extension}")
+        target = os.path.join(workdir, f"imported-{extension.replace('.', '-')}.db")
+        export_args = ["export", path, "--database", source]
+        if extension == "lcol":
+            export_args += ["--watermark", os.path.join(workdir, "watermark.json")]
+        export_time, export_rss = run(*export_args)
+        import_time, import_rss = run("import", path, "--database", target)
+        size = os.path.getsize(path)
+        print(f"{extension:<10} {size / 1e6:>7.1f}MB {size / rows:>9.1f} {rows / export_time:>13,.0f} "
+              f"{export_rss:>6.0f}MB {rows / import_time:>13,.0f} {import_rss:>6.0f}MB")
+        assert worker.submit(digest, target).result() == expected, f"{extension} import differs from the source"
+        if extension != "lcol":
+            os.remove(path)
+            os.remove(target)
+    print("every import matches the source row for row, stats totals included")
+
+    worker.submit(fill, source, chats + 1, chats + new_chats, now - chats - 3600).result()
+    reviewed = worker.submit(review, source, new_chats // 10).result()
+    delta = os.path.join(workdir, "delta.lcol")
+    export_time, export_rss = run("export", delta, "--database", source,
+                                  "--watermark", os.path.join(workdir, "watermark.json"))
+    import_time, _ = run("import", delta, "--database", os.path.join(workdir, "imported-lcol.db"))
+    with open(delta, "rb") as file:
+        batches = read_columnar(file)
+        next(batches)
+        exported = {}
+        for table, _, rows in batches:
+            exported[table] = exported.get(table, 0) + len(rows)
+    new_mistakes = (chats + new_chats) // 3 - chats // 3  # one per chat with an id divisible by 3
+    print(f"incremental: {new_chats:,} new chats, {new_mistakes:,} new and {reviewed:,} reviewed mistakes; "
+          f"{exported.get('chats', 0):,} chats and {exported.get('mistakes', 0):,} mistakes exported "
+          f"in {export_time:.2f}s ({os.path.getsize(delta) / 1e3:,.0f}KB, peak RSS {export_rss:.0f}MB) "
+          f"and imported in {import_time:.2f}s")
+    assert new_chats <= exported.get("chats", 0) <= new_chats + 1, "only chats since the watermark are exported"
+    assert new_mistakes + reviewed <= exported.get("mistakes", 0) <= new_mistakes + reviewed + 1, \
+        "new and reviewed mistakes are exported, and only those"
+    copy = worker.submit(digest, os.path.join(workdir, "imported-lcol.db"))
+    assert copy.result() == worker.submit(digest, source).result(), "incremental import differs"
+    worker.shutdown()
+    print("the imported copy matches the source again")
+
+if __name__ == "__main__":
+    chats = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    new_chats = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    main(chats, new_chats)
@@ -0,0 +1,80 @@
+# benchmarks/bench_flow_control.py
+
+"""Upstream hits with request coalescing, and the in-flight/rate limits.
+
+Part 1 sends the same prompt from many learners at once, streamed and
+buffered, with coalescing off and on, and counts what reaches the fake
+server. Part 2 sends distinct prompts through a client with a small
+in-flight cap and rate limit, and checks the server never saw more than
+the cap at once and the request rate stayed under the limit.
+Usage: python benchmarks/bench_flow_control.py [learners] [max_in_flight] [rate_per_s]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openrouter import FakeOpenRouter
+from llm_client import LLMClient
+
+def payload(text):
+    return {"model": "fake", "messages": [{"role": "user", "content": text}]}
+
+async def streamed(client, text):
+    return "".join([delta async for delta in client.stream(payload(text))])
+
+async def buffered(client, text):
+    response = await client.complete(payload(text))
+    return response.json()["choices"][0]["message"]["content"]
+
+async def identical_prompts(learners, coalesce):
+    with FakeOpenRouter(latency=0.1, token_latency=0.002, reply_words=20) as server:
+        client = LLMClient(url=server.url, headers={}, coalesce=coalesce)
+        for send in (streamed, buffered):
+            before = server.request_count
+            start = time.perf_counter()
+            replies = await asyncio.gather(*(send(client, "hola") for _ in range(learners)))
+            elapsed = time.perf_counter() - start
+            assert len(set(replies)) == 1, "every learner should get the same reply"
+            print(f"  {send.__name__:8} coalesce={coalesce!s:5} upstream requests={server.request_count - before:4} "
+                  f"for {learners} learners in {elapsed:.2f}s")
+
+        # A learner who leaves mid-stream must not cut the reply short for the others
+        tasks = [asyncio.ensure_future(streamed(client, "adios")) for _ in range(5)]
+        await asyncio.sleep(0.12)
+        tasks[0].cancel()
+        replies = await asyncio.gather(*tasks[1:])
+        assert all(reply == replies[0] and reply.endswith(" word") for reply in replies)
+        await client.aclose()
+
+async def limited(requests, max_in_flight, rate, burst):
+    with FakeOpenRouter(latency=0.05) as server:
+        client = LLMClient(url=server.url, headers={}, max_in_flight=max_in_flight,
+                           rate_limit=rate, rate_burst=burst, coalesce=False)
+        start = time.perf_counter()
+        await asyncio.gather(*(buffered(client, f"prompt {i}") for i in range(requests)))
+        elapsed = time.perf_counter() - start
+        await client.aclose()
+        peak = server.peak_concurrency
+    # The first burst requests go out at once; the rest are paced at rate
+    min_elapsed = (requests - burst) / rate
+    print(f"  {requests} requests, max_in_flight={max_in_flight} rate={rate}/s burst={burst}: "
+          f"peak upstream concurrency={peak} elapsed={elapsed:.2f}s (limit allows >= {min_elapsed:.2f}s)")
+    assert peak <= max_in_flight, "in-flight cap exceeded"
+    assert elapsed >= min_elapsed * 0.95, "rate limit exceeded"
+
+def main(learners, max_in_flight, rate):
+    print("identical concurrent prompts:")
+    asyncio.run(identical_prompts(learners, coalesce=False))
+    asyncio.run(identical_prompts(learners, coalesce=True))
+    print("distinct prompts under limits:")
+    asyncio.run(limited(learners, max_in_flight, rate, burst=max_in_flight))
+
+if __name__ == "__main__":
+    learners = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    max_in_flight = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else 100
+    main(learners, max_in_flight, rate)
@@ -0,0 +1,43 @@
+# benchmarks/bench_llm_client.py
+
+"""Measure turns/sec through the pooled async LLM client.
+
+Usage: python benchmarks/bench_llm_client.py [users] [turns_per_user] [latency_s]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openrouter import FakeOpenRouter
+from llm_client import LLMClient
+
+async def simulate_user(client, user_id, turns):
+    for turn in range(turns):
+        payload = {
+            "model": "fake",
+            "messages": [{"role": "user", "content": f"user {user_id} turn {turn}"}]
+        }
+        response = await client.complete(payload)
+        assert response.status_code == 200
+
+async def run(users, turns, latency):
+    with FakeOpenRouter(latency=latency) as server:
+        client = LLMClient(url=server.url, headers={})
+        start = time.perf_counter()
+        await asyncio.gather(*(simulate_user(client, i, turns) for i in range(users)))
+        elapsed = time.perf_counter() - start
+        await client.aclose()
+        total = users * turns
+        print(f"users={users} turns={total} latency={latency * 1000:.0f}ms")
+        print(f"elapsed={elapsed:.2f}s throughput={total / elapsed:.1f} turns/sec")
+        print(f"upstream requests={server.request_count} connections opened={server.connection_count}")
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    asyncio.run(run(users, turns, latency))
@@ -0,0 +1,80 @@
+# benchmarks/bench_metrics.py
+
+"""Per-stage latency of chat turns, as reported by the metrics registry.
+
+Runs turns against the fake OpenRouter server with a throwaway database,
+prints p50/p95/p99 for every stage and the cost of one timer, then scrapes
+/metrics from the Gradio app to check the Prometheus output.
+Usage: python benchmarks/bench_metrics.py [turns] [latency_ms]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from starlette.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_openrouter import FakeOpenRouter
+from llm_client import llm_client
+from metrics import Metrics
+
+EXPECTED_STAGES = ["sentiment", "context", "llm_first_token", "llm", "turn", "mistake", "db_insert", "dashboard"]
+
+async def run_turns(chatbot_ui, turns):
+    history = []
+    for turn in range(turns):
+        async for history, _, _ in chatbot_ui.turn_pipeline.run(f"how do I say number {turn}?", history):
+            pass
+
+def timer_overhead(calls=200000):
+    registry = Metrics()
+    start = time.perf_counter()
+    for _ in range(calls):
+        with registry.timer("noop"):
+            pass
+    return (time.perf_counter() - start) / calls * 1e9
+
+def main(turns, latency_ms):
+    os.chdir(tempfile.mkdtemp())
+    import chatbot_ui
+    chatbot_ui.create_app()
+    from gradio.routes import App
+
+    chatbot_ui.sessions.get("").update(target_lang="Spanish", scene="greeting someone")
+    with FakeOpenRouter(latency=latency_ms / 1000, token_latency=0.001, reply_words=20) as server:
+        llm_client.url = server.url
+        start = time.perf_counter()
+        asyncio.run(run_turns(chatbot_ui, turns))
+        elapsed = time.perf_counter() - start
+
+    print(f"turns={turns} elapsed={elapsed:.2f}s upstream latency={latency_ms}ms")
+    print(f"{'stage':<16}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for stage, summary in chatbot_ui.metrics.stage_summaries().items():
+        print(f"{stage:<16}{summary['count']:>7}{summary['mean_ms']:>8.2f}ms{summary['p50_ms']:>8.2f}ms"
+              f"{summary['p95_ms']:>8.2f}ms{summary['p99_ms']:>8.2f}ms")
+    print(f"timer overhead: {timer_overhead():.0f}ns per timed block")
+
+    app = App.create_app(chatbot_ui.demo, app_kwargs={"routes": chatbot_ui.metrics_routes()})
+    with TestClient(app) as client:
+        start = time.perf_counter()
+        response = client.get("/metrics")
+        scrape_ms = (time.perf_counter() - start) * 1000
+    body = response.text
+    print(f"GET /metrics: status={response.status_code} {len(body.splitlines())} lines "
+          f"{len(body)} bytes in {scrape_ms:.1f}ms")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    for stage in EXPECTED_STAGES:
+        assert f'chatalyst_stage_duration_seconds_count{{stage="{stage}"}}' in body, f"missing stage {stage}"
+    assert f"chatalyst_turns_total {turns}" in body
+    assert "chatalyst_write_queue_depth" in body and "chatalyst_upstream_breaker_state 0" in body
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    main(turns, latency_ms)
@@ -0,0 +1,80 @@
+# benchmarks/bench_mistakes.py
+
+"""Mistake classification over a corpus of stored-size replies: old substring scan vs. the classifier.
+
+Also times one alternation regex over every keyword, the single-pass
+alternative: search() stops at the first hit, while a priority pick
+needs finditer() over the whole reply.
+
+Usage: python benchmarks/bench_mistakes.py [responses]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mistakes import MISTAKE_KEYWORDS, mistake_classifier
+
+SENTENCES = [
+    "Bonjour is the French word for hello.", "That sounds great, keep practicing!",
+    "Remember to use the past tense here.", "A better word choice would be 'merci'.",
+    "The pronunciation is bon-zhoor.", "In a formal setting, use 'vous'.",
+    "You can say 'Salut' with friends.", "Here are some examples for you:",
+    "Your sentence structure is almost right.", "Keep up the good work!",
+    "Try ordering a coffee next.", "This phrase means 'thank you very much'."
+]
+
+def substring_scan(bot_response):
+    """The previous analyze_mistake: every keyword searched in the lowered reply."""
+    lower_response = bot_response.lower()
+    for category, keywords in MISTAKE_KEYWORDS.items():
+        if any(keyword in lower_response for keyword in keywords):
+            return category
+    return "general"
+
+def main(count):
+    random.seed(3)
+    corpus = [" ".join(random.choices(SENTENCES, k=10)) for _ in range(count)]
+    average = sum(len(text) for text in corpus) / count
+    print(f"responses={count} average length={average:.0f} chars")
+
+    start = time.perf_counter()
+    old = [substring_scan(text) for text in corpus]
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = [mistake_classifier.classify(text) for text in corpus]
+    after = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text in corpus:
+        mistake_classifier.matches(text)
+    positions = time.perf_counter() - start
+
+    alternation = re.compile(r"\b(?:" + "|".join(
+        re.escape(keyword) for _, _, keyword in mistake_classifier.keywords) + r")\b")
+    start = time.perf_counter()
+    for text in corpus:
+        alternation.search(text.lower())
+    first_hit = time.perf_counter() - start
+    priority = {keyword: rank for rank, _, keyword in mistake_classifier.keywords}
+    start = time.perf_counter()
+    for text in corpus:
+        min((priority[match.group()] for match in alternation.finditer(text.lower())), default=None)
+    full_scan = time.perf_counter() - start
+
+    changed = sum(1 for a, b in zip(old, new) if a != b)
+    print(f"substring scan: {before:.2f}s ({count / before:,.0f}/sec)")
+    print(f"classifier:     {after:.2f}s ({count / after:,.0f}/sec), "
+          f"all matches with positions: {positions:.2f}s ({count / positions:,.0f}/sec)")
+    print(f"alternation regex: search, first hit only {count / first_hit:,.0f}/sec; "
+          f"finditer + priority pick {count / full_scan:,.0f}/sec")
+    print(f"classifications changed by whole-word matching: {changed} "
+          f"(e.g. 'sound' inside 'sounds')")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,83 @@
+# benchmarks/bench_prompt_compaction.py
+
+"""Prompt tokens per turn: raw recent turns vs. summary plus trimmed turns.
+
+Replays a long conversation with verbose bot replies. "before" is the
+old context: up to 1500 tokens of raw turns, with full replies. "after"
+is the ConversationWindow/build_context_prompt pair used by the app now.
+Reports context tokens per turn and the time to build the context.
+Usage: python benchmarks/bench_prompt_compaction.py [turns] [max_reply_tokens]
+"""
+
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CONTEXT_SUMMARY_TOKENS, CONTEXT_TOKEN_BUDGET
+from context_builder import build_context_prompt, estimate_tokens
+from sessions import ConversationWindow
+
+WORDS = ("muy bien you can say the word for coffee is café and in a restaurant people often "
+         "ask for the menu politely remember to use usted with strangers").split()
+
+class RawWindow:
+    """The previous context: whole turns, trimmed to 1500 tokens."""
+
+    def __init__(self, token_budget=1500, max_turns=20):
+        self.token_budget = token_budget
+        self._turns = deque(maxlen=max_turns)
+
+    def add(self, user_input, bot_response):
+        self._turns.append((user_input, bot_response, estimate_tokens(user_input) + estimate_tokens(bot_response)))
+        while sum(turn[2] for turn in self._turns) > self.token_budget and len(self._turns) > 1:
+            self._turns.popleft()
+
+    def prompt(self):
+        if not self._turns:
+            return ""
+        return "Previous conversation:\n" + "\n".join(
+            f"User: {user_input}\nAssistant: {bot_response}" for user_input, bot_response, _ in self._turns
+        ) + "\n\n"
+
+def reply(rng, max_tokens):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(max_tokens // 3, max_tokens))]
+    return " ".join(words).capitalize() + ". Keep practicing!"
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main(turns, max_reply_tokens):
+    rng = random.Random(3)
+    conversation = [(f"como se dice {rng.choice(WORDS)} en la {rng.choice(WORDS)}", reply(rng, max_reply_tokens))
+                    for _ in range(turns)]
+
+    results = {}
+    for label, window, build in (("before", RawWindow(), RawWindow.prompt),
+                                 ("after", ConversationWindow(), build_context_prompt)):
+        tokens = []
+        elapsed = 0.0
+        for user_input, bot_response in conversation:
+            start = time.perf_counter()
+            context = build(window)
+            elapsed += time.perf_counter() - start
+            tokens.append(estimate_tokens(context))
+            window.add(user_input, bot_response)
+        results[label] = tokens
+        print(f"{label:6}: context tokens/turn mean={sum(tokens) / turns:6.0f} p95={percentile(tokens, 0.95):5} "
+              f"max={max(tokens):5}  build={elapsed / turns * 1e6:.0f}us/turn")
+
+    # Header lines aside, the context stays within the two budgets
+    limit = CONTEXT_TOKEN_BUDGET + CONTEXT_SUMMARY_TOKENS + 20
+    assert max(results["after"]) <= limit, max(results["after"])
+    saved = 1 - sum(results["after"]) / sum(results["before"])
+    print(f"{turns} turns, replies up to {max_reply_tokens} tokens: {saved:.0%} fewer context tokens sent")
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    max_reply_tokens = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    main(turns, max_reply_tokens)
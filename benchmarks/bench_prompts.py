@@ -0,0 +1,80 @@
+# benchmarks/bench_prompts.py
+
+"""Prompt construction cost and prefix stability with the prompt registry.
+
+Times building the system message the old way (an f-string per call) and
+through PromptRegistry. It then replays conversations from learners who
+type their target language differently, and checks that every turn in a
+scene starts with the same prefix, byte for byte and by hash.
+Usage: python benchmarks/bench_prompts.py [calls] [learners] [turns]
+"""
+
+import hashlib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_builder import build_context_prompt
+from prompts import PromptRegistry
+from sessions import ConversationWindow
+
+SCENE_OPTIONS = {
+    "Beginner": ["ordering food at a restaurant", "greeting someone", "asking for directions"],
+    "Intermediate": ["booking a hotel", "visiting a doctor", "chatting with a local"],
+    "Advanced": ["debating social issues", "job interview", "discussing politics"]
+}
+
+def old_system_message(target_lang, scene, context_prompt):
+    return (
+        f"You are Chatalyst, a friendly language guide. "
+        f"Help the user learn {target_lang} in a simple way. "
+        f"Use short sentences and easy words. "
+        f"Encourage them and provide examples. "
+        f"Current scene: {scene}.\n\n"
+        f"{context_prompt}"
+    )
+
+def timed(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+def main(calls, learners, turns):
+    start = time.perf_counter()
+    registry = PromptRegistry(SCENE_OPTIONS)
+    print(f"registry built in {(time.perf_counter() - start) * 1000:.2f}ms ({len(registry)} prefixes)")
+
+    context = "Previous conversation:\nUser: hola\nAssistant: ¡Hola! ¿Cómo estás?\n\n"
+    before = timed(lambda: old_system_message("Spanish", "greeting someone", context), calls)
+    after = timed(lambda: registry.system_message("Spanish", "Beginner", "greeting someone", context), calls)
+    print(f"system message build: f-string={before:.0f}ns registry={after:.0f}ns per call")
+
+    rng = random.Random(5)
+    spellings = ["Spanish", "spanish", " Spanish ", "SPANISH"]
+    prefix_hashes = {}
+    for learner in range(learners):
+        target_lang = rng.choice(spellings)
+        level = rng.choice(list(SCENE_OPTIONS))
+        scene = rng.choice(SCENE_OPTIONS[level])
+        prefix = registry.prefix(target_lang, level, scene)
+        window = ConversationWindow()
+        for turn in range(turns):
+            message = registry.system_message(target_lang, level, scene, build_context_prompt(window))
+            assert message.startswith(prefix), "static prefix must come first"
+            digest = hashlib.sha1(message[:len(prefix)].encode()).hexdigest()[:16]
+            assert digest == registry.prefix_hash(target_lang, level, scene)
+            prefix_hashes.setdefault((level, scene), set()).add(digest)
+            window.add(f"learner {learner} turn {turn}", "Muy bien. " * rng.randint(5, 60))
+    assert all(len(digests) == 1 for digests in prefix_hashes.values())
+    print(f"{learners} learners x {turns} turns, {len(spellings)} spellings of the language: "
+          f"{len(prefix_hashes)} scenes, 1 prefix hash each")
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    learners = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    turns = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    main(calls, learners, turns)
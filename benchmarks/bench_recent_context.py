@@ -0,0 +1,54 @@
+# benchmarks/bench_recent_context.py
+
+"""Show that recent-context lookup cost stays flat as the chats table grows.
+
+Fills a throwaway database in steps up to the largest size and times
+Storage.recent_context at each step. Pass 10000000 for the 10M-row check
+(it needs a few GB of disk and several minutes).
+Usage: python benchmarks/bench_recent_context.py [max_rows] [sessions]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import Storage, SELECT_RECENT_CONTEXT
+
+FILL = """
+    WITH RECURSIVE n(i) AS (SELECT ? UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+    INSERT INTO chats (session_id, user_input, bot_response, sentiment_score, scene, timestamp)
+    SELECT 'session-' || (i % ?), 'user input ' || i, 'bot response ' || i, 0.0,
+           'greeting someone', 1700000000 + i
+    FROM n
+"""
+
+def time_lookups(store, sessions, lookups=2000):
+    start = time.perf_counter()
+    for i in range(lookups):
+        store.recent_context(3, f"session-{i % sessions}")
+    return (time.perf_counter() - start) / lookups * 1e6
+
+def main(max_rows, sessions):
+    store = Storage(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    store.migrate()
+    with store.pool.connection() as conn:
+        plan = conn.execute("EXPLAIN QUERY PLAN " + SELECT_RECENT_CONTEXT, ("session-0", 3)).fetchall()
+    print("plan:", "; ".join(row[-1] for row in plan))
+
+    filled = 0
+    size = 10000
+    while filled < max_rows:
+        target = min(size, max_rows)
+        with store.pool.transaction() as conn:
+            conn.execute(FILL, (filled + 1, target, sessions))
+        filled = target
+        print(f"rows={filled:>10,}  recent_context={time_lookups(store, sessions):7.1f}us/lookup")
+        size *= 10
+
+if __name__ == "__main__":
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    main(max_rows, sessions)
@@ -0,0 +1,66 @@
+# benchmarks/bench_response_cache.py
+
+"""Upstream calls and latency for repetitive beginner prompts, with the response cache.
+
+Each simulated learner opens a fresh session in a Beginner scene and sends
+one of a handful of common openers, the pattern the cache is meant for.
+Runs against a throwaway database in a temporary directory.
+Usage: python benchmarks/bench_response_cache.py [learners] [upstream_latency_s]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openrouter import FakeOpenRouter
+from llm_client import llm_client
+
+OPENERS = ["hola", "Hola!", "how do I say thank you", "How do I say thank you?",
+           "buenos dias", "where is the bathroom", "I would like a coffee"]
+
+async def learner(chatbot_ui, learner_id):
+    request = SimpleNamespace(session_hash=f"learner-{learner_id}")
+    chatbot_ui.setup_user("English", "Spanish", "Beginner",
+                          random.choice(chatbot_ui.SCENE_OPTIONS["Beginner"]), request=request)
+    start = time.perf_counter()
+    async for _ in chatbot_ui.turn_pipeline.run(random.choice(OPENERS), [], request=request, refresh_view=False):
+        pass
+    return time.perf_counter() - start
+
+def main(learners, latency):
+    os.chdir(tempfile.mkdtemp())
+    import chatbot_ui
+    chatbot_ui.create_app()
+    random.seed(7)
+
+    with FakeOpenRouter(latency=latency) as server:
+        llm_client.url = server.url
+
+        async def run_all():
+            # Arrive in waves so later learners can reuse earlier replies
+            latencies = []
+            for wave in range(0, learners, 50):
+                batch = range(wave, min(wave + 50, learners))
+                latencies += await asyncio.gather(*(learner(chatbot_ui, i) for i in batch))
+            return latencies
+
+        latencies = sorted(asyncio.run(run_all()))
+        upstream = server.request_count
+
+    stats = chatbot_ui.response_cache.stats()
+    print(f"learners={learners} upstream requests={upstream} (without cache: {learners})")
+    print(f"cache hits={stats['hits']} misses={stats['misses']} evictions={stats['evictions']} "
+          f"entries={stats['entries']}")
+    print(f"turn latency p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    learners = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    main(learners, latency)
@@ -0,0 +1,95 @@
+# benchmarks/bench_review.py
+
+"""Spaced-repetition review over a learner with a long mistake history.
+
+Seeds one session with many mistakes and times the lazy heap load. It then
+runs a review session against the heap and against an ORDER BY due_at
+query, grading every drill. Last, it fast-forwards through review days
+and checks that "% mastered" in the stats climbs as drills are answered
+correctly.
+Runs against a throwaway database in a temporary directory.
+Usage: python benchmarks/bench_review.py [mistakes] [drills]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from review import GRADES, ReviewQueue
+from storage import Storage
+
+SESSION = "learner"
+DAY = 86400
+
+SELECT_DUE = """
+    SELECT id FROM mistakes WHERE session_id = ? AND due_at <= ? ORDER BY due_at LIMIT ?
+"""
+
+def seed(store, mistakes, now):
+    rng = random.Random(3)
+    turns = [
+        (SESSION, f"mistake {i}", f"Check the {rng.choice(['tense', 'word choice', 'accent'])} here.", 0.0,
+         "greeting someone", rng.choice(["grammar", "vocabulary", "pronunciation"]), now - rng.randint(0, 365 * DAY))
+        for i in range(mistakes)
+    ]
+    # Another learner's history, which the session's queue must not see
+    turns += [("other", "x", "grammar", 0.0, "greeting someone", "grammar", now) for _ in range(mistakes // 10)]
+    for start in range(0, len(turns), 5000):
+        store.record_turns(turns[start:start + 5000])
+
+def sql_due(store, now, limit):
+    with store.pool.connection() as conn:
+        return [row[0] for row in conn.execute(SELECT_DUE, (SESSION, now, limit))]
+
+def mastered_share(store):
+    stats = store.mistake_stats(session_id=SESSION)
+    return sum(row[2] for row in stats) / sum(row[1] for row in stats) * 100
+
+def main(mistakes, drills):
+    store = Storage(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    store.migrate()
+    now = int(time.time())
+    seed(store, mistakes, now)
+
+    review = ReviewQueue(store, SESSION)
+    start = time.perf_counter()
+    assert len(review) == mistakes
+    print(f"{mistakes} mistakes: heap loaded in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # Each pass grades mistakes into the future, so both together need enough due ones
+    drills = min(drills, mistakes // 2)
+    rng = random.Random(7)
+    for name, next_due in (("heap", lambda: review.due(5, now)), ("sql", lambda: sql_due(store, now, 5))):
+        pick = grade = 0.0
+        for _ in range(drills):
+            start = time.perf_counter()
+            due = next_due()
+            pick += time.perf_counter() - start
+            if not due:
+                raise SystemExit(f"{name}: ran out of due mistakes")
+            mistake_id = due[0]
+            start = time.perf_counter()
+            review.grade(mistake_id, rng.choice(list(GRADES.values())), now)
+            grade += time.perf_counter() - start
+        print(f"{name:4} ({drills} drills) next 5 due: {pick / drills * 1e6:8.1f}us   grade + reschedule: {grade / drills * 1e6:8.1f}us")
+
+    # Every item due today is answered correctly; repeat on each day's due items
+    before = mastered_share(store)
+    day = now
+    for _ in range(8):
+        day += 30 * DAY
+        for mistake_id in review.due(mistakes, day):
+            review.grade(mistake_id, GRADES["Good"], day)
+    after = mastered_share(store)
+    print(f"mastered after 8 monthly rounds of correct answers: {before:.1f}% -> {after:.1f}%")
+    assert after > before and after > 90, "correct answers should master mistakes"
+    assert len(review) == mistakes
+
+if __name__ == "__main__":
+    mistakes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    drills = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    main(mistakes, drills)
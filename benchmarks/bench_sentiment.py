@@ -0,0 +1,56 @@
+# benchmarks/bench_sentiment.py
+
+"""Sentiment cost per turn: TextBlob twice per turn (old) vs. the memoized service.
+
+Also times analyze_many over a backfill-sized list and checks every score
+matches TextBlob(text).sentiment.polarity.
+Usage: python benchmarks/bench_sentiment.py [turns] [backfill_rows]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MESSAGES = ["hola", "I love this place!", "this is so hard, I hate grammar", "how do I say thank you",
+            "Can I have the menu please?", "I'm terrible at this", "great, thanks a lot",
+            "where is the train station", "I don't understand", "that was a wonderful lesson"]
+
+def main(turns, backfill_rows):
+    start = time.perf_counter()
+    import sentiment
+    print(f"import sentiment: {(time.perf_counter() - start) * 1000:.1f}ms (backend deferred)")
+
+    from textblob import TextBlob
+    TextBlob("warm up the lexicon").sentiment
+    random.seed(1)
+    inputs = [random.choice(MESSAGES) + f" {i % 50}" for i in range(turns)]
+
+    start = time.perf_counter()
+    for text in inputs:
+        TextBlob(text).sentiment.polarity
+        TextBlob(text).sentiment.polarity
+    before = (time.perf_counter() - start) / turns * 1e6
+
+    start = time.perf_counter()
+    for text in inputs:
+        sentiment.analyze_sentiment(text)
+    after = (time.perf_counter() - start) / turns * 1e6
+    print(f"per turn: before={before:.1f}us (2x TextBlob) after={after:.1f}us (once, memoized)")
+
+    rows = [random.choice(MESSAGES) + f" {i % 1000}" for i in range(backfill_rows)]
+    start = time.perf_counter()
+    scores = sentiment.analyze_many(rows)
+    elapsed = time.perf_counter() - start
+    print(f"analyze_many: {backfill_rows} rows in {elapsed:.2f}s ({backfill_rows / elapsed:,.0f} rows/sec)")
+
+    for text, score in zip(rows[:2000], scores):
+        assert score == TextBlob(text).sentiment.polarity, text
+    print("scores identical to TextBlob polarity")
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    backfill_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    main(turns, backfill_rows)
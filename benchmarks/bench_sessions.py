@@ -0,0 +1,86 @@
+# benchmarks/bench_sessions.py
+
+"""Load test for per-user sessions: context isolation and bounded memory.
+
+Many simulated learners chat concurrently, each in their own language and
+scene. The check then confirms that every session's stored context holds
+only its own turns, and that session memory stays flat when users churn.
+Runs against a throwaway database in a temporary directory.
+Usage: python benchmarks/bench_sessions.py [users] [turns_per_user] [churned_sessions]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openrouter import FakeOpenRouter
+from llm_client import llm_client
+from sessions import SessionManager
+
+LANGUAGES = ["Spanish", "French", "German", "Italian"]
+
+async def learner(chatbot_ui, user_id, turns):
+    request = SimpleNamespace(session_hash=f"user-{user_id}")
+    scenes = chatbot_ui.SCENE_OPTIONS["Beginner"]
+    chatbot_ui.setup_user("English", LANGUAGES[user_id % len(LANGUAGES)], "Beginner",
+                          scenes[user_id % len(scenes)], request=request)
+    history = []
+    for turn in range(turns):
+        async for history, _, _ in chatbot_ui.turn_pipeline.run(
+                f"user-{user_id} says hello {turn}", history, request=request, refresh_view=False):
+            pass
+
+def check_isolation(chatbot_ui, users):
+    for user_id in range(users):
+        session_id = f"user-{user_id}"
+        context = chatbot_ui.storage.recent_context(3, session_id)
+        assert context, f"{session_id} has no stored context"
+        assert all(row[0].startswith(f"{session_id} ") for row in context), f"{session_id} sees other users' turns"
+        assert chatbot_ui.sessions.get(session_id)["target_lang"] == LANGUAGES[user_id % len(LANGUAGES)]
+
+def measure_churn(churned, max_sessions=1000):
+    manager = SessionManager(max_sessions=max_sessions)
+    tracemalloc.start()
+    samples = []
+    for i in range(churned):
+        manager.get(f"churn-{i}")["scene"] = "greeting someone"
+        if (i + 1) % (churned // 5) == 0:
+            samples.append(tracemalloc.get_traced_memory()[0])
+    tracemalloc.stop()
+    return len(manager), manager.evictions, samples
+
+def main(users, turns, churned):
+    os.chdir(tempfile.mkdtemp())
+    import chatbot_ui
+    chatbot_ui.create_app()
+
+    with FakeOpenRouter(latency=0.02) as server:
+        llm_client.url = server.url
+
+        async def run_all():
+            await asyncio.gather(*(learner(chatbot_ui, i, turns) for i in range(users)))
+
+        start = time.perf_counter()
+        asyncio.run(run_all())
+        elapsed = time.perf_counter() - start
+
+    chatbot_ui.turn_writer.flush()
+    check_isolation(chatbot_ui, users)
+    print(f"users={users} turns={users * turns} elapsed={elapsed:.2f}s "
+          f"throughput={users * turns / elapsed:.1f} turns/sec; context isolated for every session")
+
+    live, evicted, samples = measure_churn(churned)
+    print(f"churned sessions={churned} live={live} evicted={evicted}")
+    print("traced memory while churning (KB):", " ".join(f"{sample // 1024}" for sample in samples))
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    churned = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+    main(users, turns, churned)
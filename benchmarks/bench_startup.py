@@ -0,0 +1,98 @@
+# benchmarks/bench_startup.py
+
+"""Cold-start cost: import time, app creation and time until the server answers.
+
+Every measurement runs in a fresh Python process in a temporary directory,
+so nothing is cached between runs and the project database is never
+touched; medians over the runs are printed. Time to ready is measured from
+starting `chatbot_ui.serve()` until GET /metrics answers. Finally the
+schema check is timed while another connection holds the write lock; an
+up-to-date database shouldn't wait for it.
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storage import Storage
+
+IMPORT_GRADIO = "import time; start = time.perf_counter(); import gradio; print(time.perf_counter() - start)"
+IMPORT_APP = "import time; start = time.perf_counter(); import chatbot_ui; print(time.perf_counter() - start)"
+CREATE_APP = ("import time, chatbot_ui; start = time.perf_counter(); chatbot_ui.create_app(); "
+              "print(time.perf_counter() - start)")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def run(code, workdir):
+    """Seconds printed by code, run in a new interpreter."""
+    result = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=dict(os.environ, PYTHONPATH=ROOT),
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.split()[-1])
+
+def time_to_ready(workdir, timeout=60):
+    port = free_port()
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, "-c", f"import chatbot_ui; chatbot_ui.serve(port={port})"],
+                             cwd=workdir, env=dict(os.environ, PYTHONPATH=ROOT),
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            assert child.poll() is None, "the server exited during startup"
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError("the server didn't answer in time")
+    finally:
+        child.kill()
+        child.wait()
+
+def locked_schema_check(workdir):
+    """Seconds for migrate() on an up-to-date database while a writer holds the lock."""
+    path = os.path.join(workdir, "locked.db")
+    Storage(path).migrate()
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        store = Storage(path)
+        start = time.perf_counter()
+        store.migrate()
+        return time.perf_counter() - start
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+def median_ms(samples):
+    return statistics.median(samples) * 1000
+
+def main(runs):
+    print(f"medians over {runs} runs, each in a fresh process")
+    print(f"{'import gradio':<32}{median_ms([run(IMPORT_GRADIO, tempfile.mkdtemp()) for _ in range(runs)]):>9.0f}ms")
+    print(f"{'import chatbot_ui':<32}{median_ms([run(IMPORT_APP, tempfile.mkdtemp()) for _ in range(runs)]):>9.0f}ms")
+    print(f"{'create_app(), new database':<32}"
+          f"{median_ms([run(CREATE_APP, tempfile.mkdtemp()) for _ in range(runs)]):>9.0f}ms")
+    workdir = tempfile.mkdtemp()
+    run(CREATE_APP, workdir)
+    print(f"{'create_app(), migrated database':<32}{median_ms([run(CREATE_APP, workdir) for _ in range(runs)]):>9.0f}ms")
+    print(f"{'time to ready (GET /metrics)':<32}{median_ms([time_to_ready(workdir) for _ in range(runs)]):>9.0f}ms")
+    locked = median_ms([locked_schema_check(tempfile.mkdtemp()) for _ in range(runs)])
+    print(f"{'schema check, write lock held':<32}{locked:>9.2f}ms")
+    assert locked < 100, "an up-to-date schema shouldn't wait for the write lock"
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
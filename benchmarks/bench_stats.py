@@ -0,0 +1,80 @@
+# benchmarks/bench_stats.py
+
+"""Insight/dashboard stats: full-table GROUP BY vs. the trigger-maintained totals.
+
+Fills a throwaway database with the given number of mistakes and chats
+(the triggers keep the totals current during the fill), then times both
+ways of computing the stats and the per-turn write cost.
+Usage: python benchmarks/bench_stats.py [rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import Storage
+
+FILL_MISTAKES = """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+    INSERT INTO mistakes (session_id, user_input, mistake_type, correction, explanation, context, timestamp, mastered)
+    SELECT 'session-' || (i % 1000), 'input ' || i,
+           CASE i % 4 WHEN 0 THEN 'grammar' WHEN 1 THEN 'vocabulary' WHEN 2 THEN 'pronunciation' ELSE 'cultural' END,
+           'correction', 'Extracted from conversation', 'greeting someone', 1700000000 + i, i % 7 = 0
+    FROM n
+"""
+
+FILL_CHATS = """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+    INSERT INTO chats (session_id, user_input, bot_response, sentiment_score, scene, timestamp)
+    SELECT 'session-' || (i % 1000), 'input ' || i, 'response', 0.0,
+           CASE i % 3 WHEN 0 THEN 'greeting someone' WHEN 1 THEN 'asking for directions'
+                ELSE 'ordering food at a restaurant' END, 1700000000 + i
+    FROM n
+"""
+
+FULL_SCAN_QUERIES = [
+    """
+    SELECT mistake_type, COUNT(*) as count, SUM(CASE WHEN mastered THEN 1 ELSE 0 END) as mastered_count
+    FROM mistakes GROUP BY mistake_type ORDER BY count DESC
+    """,
+    "SELECT scene, COUNT(*) as count FROM chats GROUP BY scene ORDER BY count DESC LIMIT 3"
+]
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - start) / repeats * 1000, result
+
+def main(rows):
+    store = Storage(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    store.migrate()
+    start = time.perf_counter()
+    with store.pool.transaction() as conn:
+        conn.execute(FILL_MISTAKES, (rows,))
+        conn.execute(FILL_CHATS, (rows,))
+    print(f"filled {rows:,} mistakes + {rows:,} chats in {time.perf_counter() - start:.1f}s (triggers included)")
+
+    def full_scan():
+        with store.pool.connection() as conn:
+            return [conn.execute(query).fetchall() for query in FULL_SCAN_QUERIES]
+
+    def totals():
+        return [store.mistake_stats(), store.scene_stats()]
+
+    before, expected = timed(full_scan, 3)
+    after, actual = timed(totals, 1000)
+    assert expected == actual, (expected, actual)
+    print(f"stats per refresh: GROUP BY={before:.1f}ms totals={after:.3f}ms (identical results)")
+
+    turns = 2000
+    start = time.perf_counter()
+    for i in range(turns):
+        store.record_turn(f"turn {i}", "Check your grammar.", 0.0, "greeting someone", "grammar", f"session-{i % 10}")
+    print(f"record_turn with triggers: {(time.perf_counter() - start) / turns * 1e6:.0f}us/turn")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
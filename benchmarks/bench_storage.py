@@ -0,0 +1,97 @@
+# benchmarks/bench_storage.py
+
+"""Mixed read/write chat turns: per-call sqlite3.connect vs. the pooled WAL layer.
+
+Each simulated turn reads the recent context, writes the turn and renders
+the stats queries, like the chat pipeline does.
+Usage: python benchmarks/bench_storage.py [threads] [turns_per_thread]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage as storage_module
+from storage import Storage
+
+class PerCallStorage:
+    """The previous access pattern: a fresh rollback-journal connection per query."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _run(self, sql, params=(), commit=False):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        rows = conn.execute(sql, params).fetchall()
+        if commit:
+            conn.commit()
+        conn.close()
+        return rows
+
+    def record_turn(self, user_input, bot_response, sentiment_score, scene, mistake_type="general"):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        timestamp = int(time.time())
+        chat_id = conn.execute(
+            storage_module.INSERT_CHAT, ("", user_input, bot_response, sentiment_score, scene, timestamp)
+        ).lastrowid
+        if mistake_type != "general":
+            conn.execute(storage_module.INSERT_MISTAKE, ("", user_input, mistake_type, bot_response,
+                                                         "Extracted from conversation", scene, timestamp, timestamp,
+                                                         chat_id))
+        conn.commit()
+        conn.close()
+
+    def recent_context(self, limit=3):
+        return self._run(storage_module.SELECT_RECENT_CONTEXT, ("", limit))
+
+    def mistake_stats(self):
+        return self._run(storage_module.SELECT_MISTAKE_STATS)
+
+    def recent_mistakes(self, limit=5):
+        return self._run(storage_module.SELECT_RECENT_MISTAKES, (limit,))
+
+def simulate(store, thread_id, turns, latencies):
+    for turn in range(turns):
+        start = time.perf_counter()
+        store.recent_context(3)
+        store.record_turn(f"user {thread_id} turn {turn}", "Check the grammar here.", 0.1,
+                          "greeting someone", "grammar" if turn % 2 else "general")
+        store.mistake_stats()
+        store.recent_mistakes(5)
+        latencies.append(time.perf_counter() - start)
+
+def run(name, store, threads, turns):
+    latencies = []
+    workers = [threading.Thread(target=simulate, args=(store, i, turns, latencies)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{name:9} {len(latencies) / elapsed:8.1f} turns/sec  p50={p50:6.2f}ms  p99={p99:7.2f}ms")
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    print(f"threads={threads} turns_per_thread={turns}")
+    for name in ("per-call", "pooled"):
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        setup = Storage(path)
+        setup.migrate()
+        setup.pool.close()
+        store = PerCallStorage(path) if name == "per-call" else Storage(path)
+        if name == "per-call":
+            # Start from the default rollback journal the old code ran with
+            conn = sqlite3.connect(path)
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.close()
+        run(name, store, threads, turns)
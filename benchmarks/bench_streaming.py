@@ -0,0 +1,53 @@
+# benchmarks/bench_streaming.py
+
+"""Compare time-to-first-token and total latency, streamed vs. buffered.
+
+Usage: python benchmarks/bench_streaming.py [turns] [first_token_s] [per_token_s] [reply_tokens]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openrouter import FakeOpenRouter
+from llm_client import LLMClient
+
+PAYLOAD = {"model": "fake", "messages": [{"role": "user", "content": "hola"}]}
+
+async def buffered_turn(client):
+    start = time.perf_counter()
+    response = await client.complete(PAYLOAD)
+    response.json()
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+async def streamed_turn(client):
+    start = time.perf_counter()
+    first = None
+    async for _ in client.stream(PAYLOAD):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+async def run(turns, latency, token_latency, reply_words):
+    with FakeOpenRouter(latency=latency, token_latency=token_latency, reply_words=reply_words) as server:
+        client = LLMClient(url=server.url, headers={})
+        print(f"turns={turns} first_token={latency * 1000:.0f}ms "
+              f"per_token={token_latency * 1000:.1f}ms reply_tokens={reply_words + 1}")
+        for name, turn in (("buffered", buffered_turn), ("streamed", streamed_turn)):
+            results = [await turn(client) for _ in range(turns)]
+            ttft = statistics.median(r[0] for r in results) * 1000
+            total = statistics.median(r[1] for r in results) * 1000
+            print(f"{name:9} p50 ttft={ttft:8.1f}ms  p50 total={total:8.1f}ms")
+        await client.aclose()
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    token_latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.005
+    reply_words = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+    asyncio.run(run(turns, latency, token_latency, reply_words))
@@ -0,0 +1,62 @@
+# benchmarks/bench_turn_pipeline.py
+
+"""Drive full chat turns and check each one costs one upstream call and one row.
+
+Runs against a throwaway database in a temporary directory.
+Usage: python benchmarks/bench_turn_pipeline.py [turns]
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import DATABASE_PATH
+from fake_openrouter import FakeOpenRouter
+from llm_client import llm_client
+
+async def run_turns(chatbot_ui, turns):
+    history = []
+    for turn in range(turns):
+        async for history, _, _ in chatbot_ui.turn_pipeline.run(f"grammar question {turn}", history):
+            pass
+
+def main(turns):
+    os.chdir(tempfile.mkdtemp())
+    import chatbot_ui
+    demo = chatbot_ui.create_app()
+
+    send_btn = next(block for block in demo.blocks.values() if getattr(block, "elem_id", None) == "send-btn")
+    send_bindings = [
+        fn for fn in demo.fns.values()
+        if any(target[0] == send_btn._id for target in fn.targets)
+    ]
+    chatbot_ui.sessions.get("").update(target_lang="Spanish", scene="greeting someone")
+
+    with FakeOpenRouter() as server:
+        llm_client.url = server.url
+        start = time.perf_counter()
+        asyncio.run(run_turns(chatbot_ui, turns))
+        elapsed = time.perf_counter() - start
+        upstream = server.request_count
+
+    conn = sqlite3.connect(DATABASE_PATH)
+    chat_rows = conn.execute("SELECT COUNT(*) FROM chats").fetchone()[0]
+    mistake_rows = conn.execute("SELECT COUNT(*) FROM mistakes").fetchone()[0]
+    conn.close()
+
+    print(f"turns={turns} elapsed={elapsed:.2f}s ({elapsed / turns * 1000:.1f}ms/turn)")
+    print(f"send_btn bindings={len(send_bindings)} upstream requests={upstream} "
+          f"chat rows={chat_rows} mistake rows={mistake_rows}")
+    assert len(send_bindings) == 1, "send_btn should trigger exactly one handler"
+    assert upstream == turns, "each turn should make exactly one upstream request"
+    assert chat_rows == turns, "each turn should store exactly one chat row"
+    assert mistake_rows == turns, "each turn should store exactly one mistake row"
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
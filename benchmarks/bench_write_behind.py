@@ -0,0 +1,72 @@
+# benchmarks/bench_write_behind.py
+
+"""User-facing persistence cost: synchronous record_turn vs. the write-behind queue.
+
+Concurrent threads stand in for request handlers. Each one persists turns
+either directly or by submitting to the background writer, and the time
+spent on the request path is measured.
+Usage: python benchmarks/bench_write_behind.py [threads] [turns_per_thread]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mistakes import analyze_mistake
+from storage import Storage
+from write_behind import WriteBehindQueue
+
+REPLY = "Nice try! Watch the verb tense: it should be 'fui', not 'fue'."
+
+def handler(persist, thread_id, turns, latencies):
+    for turn in range(turns):
+        start = time.perf_counter()
+        persist(f"session-{thread_id}", f"yo fue al mercado {turn}", REPLY, -0.1, "asking for directions")
+        latencies.append(time.perf_counter() - start)
+
+def run(name, persist, threads, turns, drain=None):
+    latencies = []
+    workers = [threading.Thread(target=handler, args=(persist, i, turns, latencies)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if drain:
+        drain()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    print(f"{name:12} request path p50={p50:7.0f}us p99={p99:8.0f}us  "
+          f"{len(latencies) / elapsed:8.0f} rows/sec end to end")
+
+def main(threads, turns):
+    print(f"threads={threads} turns_per_thread={turns}")
+
+    store = Storage(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    store.migrate()
+
+    def synchronous(session_id, user_input, bot_response, sentiment_score, scene):
+        store.record_turn(user_input, bot_response, sentiment_score, scene,
+                          analyze_mistake(user_input, bot_response), session_id)
+
+    run("synchronous", synchronous, threads, turns)
+
+    store = Storage(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    store.migrate()
+    writer = WriteBehindQueue(store)
+    run("write-behind", writer.submit, threads, turns, drain=writer.flush)
+    metrics = writer.metrics()
+    print(f"writer: batches={metrics['batches']} rows={metrics['rows']} overflows={metrics['overflows']} "
+          f"avg flush={metrics['avg_flush_ms']:.1f}ms max flush={metrics['max_flush_ms']:.1f}ms")
+    writer.stop()
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    main(threads, turns)
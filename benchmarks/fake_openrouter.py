@@ -0,0 +1,214 @@
+# benchmarks/fake_openrouter.py
+
+"""Local stand-in for the OpenRouter chat-completions endpoint.
+
+The server runs in a child process so its handler threads don't compete with
+the client under test for the GIL, and benchmarks need no network access.
+"""
+
+import json
+import multiprocessing
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+def sample_latency(distribution, latency, rng=random):
+    """One time-to-first-token draw, in seconds, with the given mean (median for lognormal).
+
+    uniform spreads +/-50% around latency, exponential has a long tail, and
+    lognormal (sigma 0.75) looks like a real provider: mostly near the
+    median with occasional replies several times slower.
+    """
+    if not latency or distribution == "fixed":
+        return latency
+    if distribution == "uniform":
+        return rng.uniform(0.5 * latency, 1.5 * latency)
+    if distribution == "exponential":
+        return rng.expovariate(1 / latency)
+    if distribution == "lognormal":
+        return latency * rng.lognormvariate(0, 0.75)
+    raise ValueError(f"Unknown latency distribution: {distribution}")
+
+class FakeOpenRouterHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is measurable
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.connection_count.get_lock():
+            self.server.connection_count.value += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        with server.request_count.get_lock():
+            server.request_count.value += 1
+            server.active_count.value += 1
+            server.peak_active.value = max(server.peak_active.value, server.active_count.value)
+        try:
+            self._reply(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on this request
+            self.close_connection = True
+        finally:
+            with server.request_count.get_lock():
+                server.active_count.value -= 1
+
+    def _reply(self, payload):
+        server = self.server
+        if server.latency:
+            time.sleep(sample_latency(server.latency_distribution, server.latency))
+        if server.extra_latency.value:
+            time.sleep(server.extra_latency.value)
+        if random.random() < server.error_rate.value:
+            self._send_error(server.error_status.value, server.retry_after.value)
+            return
+
+        user_input = payload.get("messages", [{}])[-1].get("content", "")
+        tokens = [f"Echo: {user_input}"] + [" word"] * server.reply_words
+        if payload.get("stream"):
+            self._send_stream(tokens)
+        else:
+            time.sleep(server.token_latency * len(tokens))
+            self._send_json({
+                "choices": [{"message": {"role": "assistant", "content": "".join(tokens)}}]
+            })
+
+    def _send_error(self, status, retry_after):
+        body = json.dumps({"error": {"code": status, "message": "Injected failure"}}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if retry_after:
+            self.send_header("Retry-After", f"{retry_after:g}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            event = {"choices": [{"delta": {"content": token}}]}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            if self.server.token_latency:
+                time.sleep(self.server.token_latency)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+def _serve(latency, latency_distribution, token_latency, reply_words, request_count, connection_count,
+           active_count, peak_active, faults, port_value, ready):
+    server = _Server(("127.0.0.1", 0), FakeOpenRouterHandler)
+    server.latency = latency
+    server.latency_distribution = latency_distribution
+    server.token_latency = token_latency
+    server.reply_words = reply_words
+    server.request_count = request_count
+    server.connection_count = connection_count
+    server.active_count = active_count
+    server.peak_active = peak_active
+    server.extra_latency, server.error_rate, server.error_status, server.retry_after = faults
+    port_value.value = server.server_address[1]
+    ready.set()
+    server.serve_forever()
+
+class FakeOpenRouter:
+    """Context manager that runs the fake endpoint and exposes hit counters.
+
+    latency is the delay before the first token, drawn per request from
+    latency_distribution (see sample_latency), token_latency the delay per
+    generated token and reply_words the number of filler tokens per reply.
+    inject_faults() adds latency and error responses while the server runs.
+    """
+
+    def __init__(self, latency=0.0, token_latency=0.0, reply_words=0, latency_distribution="fixed"):
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.latency = latency
+        self.latency_distribution = latency_distribution
+        self.token_latency = token_latency
+        self.reply_words = reply_words
+        self._request_count = multiprocessing.Value("i", 0)
+        self._connection_count = multiprocessing.Value("i", 0)
+        self._active_count = multiprocessing.Value("i", 0)
+        self._peak_active = multiprocessing.Value("i", 0)
+        self._faults = (
+            multiprocessing.Value("d", 0.0),  # extra latency
+            multiprocessing.Value("d", 0.0),  # error rate
+            multiprocessing.Value("i", 503),  # error status
+            multiprocessing.Value("d", 0.0)  # Retry-After seconds, 0 for none
+        )
+        self._port = multiprocessing.Value("i", 0)
+        self._process = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._port.value}/api/v1/chat/completions"
+
+    @property
+    def request_count(self):
+        return self._request_count.value
+
+    @property
+    def connection_count(self):
+        return self._connection_count.value
+
+    @property
+    def peak_concurrency(self):
+        """Most requests the server was handling at the same moment."""
+        return self._peak_active.value
+
+    def inject_faults(self, latency=0.0, error_rate=0.0, error_status=503, retry_after=0.0):
+        """Delay every request by latency and fail error_rate of them with error_status."""
+        for value, setting in zip(self._faults, (latency, error_rate, error_status, retry_after)):
+            value.value = setting
+
+    def start(self):
+        ready = multiprocessing.Event()
+        self._process = multiprocessing.Process(
+            target=_serve,
+            args=(
+                self.latency, self.latency_distribution, self.token_latency, self.reply_words,
+                self._request_count, self._connection_count, self._active_count, self._peak_active,
+                self._faults, self._port, ready
+            ),
+            daemon=True
+        )
+        self._process.start()
+        ready.wait(10)
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
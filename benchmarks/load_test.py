@@ -0,0 +1,350 @@
+# benchmarks/load_test.py
+
+"""End-to-end load test: simulated learners chatting against a fake OpenRouter.
+
+Each learner has its own session: it sets up a scene and then sends turns
+one after another, with optional think time in between. The latency of
+the fake upstream is drawn per request from a distribution.
+
+Two modes are available:
+- "chat" calls chatbot_ui.chat directly on one event loop.
+- "queue" launches the Gradio app and goes through its queue over HTTP
+  with gradio_client, the same path a browser uses. The clients run in a
+  child process, so they don't compete with the app for the GIL.
+
+The report covers turns/sec, p50/p95/p99 for time to first token and for
+the whole turn, chat rows committed per second, RSS, the write-behind
+counters and the per-stage timings from metrics.py. It is saved as JSON.
+Pass --baseline with an earlier JSON file to compare against it. The run
+exits non-zero if a headline number got worse by more than --tolerance.
+
+Runs against a throwaway database in a temporary directory.
+Usage: python benchmarks/load_test.py [--learners N] [--turns N] [--mode chat|queue]
+       [--latency S] [--distribution fixed|uniform|exponential|lognormal]
+       [--output results.json] [--baseline previous.json]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import DATABASE_PATH, SCENE_OPTIONS
+from fake_openrouter import FakeOpenRouter, LATENCY_DISTRIBUTIONS
+from llm_client import llm_client
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LANGUAGES = ["Spanish", "French", "German", "Italian"]
+MESSAGES = [
+    "Hola, ¿cómo estás?", "I want to order a coffee please", "¿Dónde está la estación?",
+    "How do I say 'thank you very much'?", "Je suis allé au marché hier", "I am happy to practice today",
+    "Can you correct my sentence: yo tener dos hermanos", "What is the past tense of ir?",
+    "This is hard, I keep making mistakes", "Ich möchte ein Zimmer buchen"
+]
+
+# Headline numbers compared against a baseline: (key, higher is better)
+HEADLINE = [
+    ("turns_per_sec", True),
+    ("turn_p50_ms", False),
+    ("turn_p99_ms", False),
+    ("first_token_p50_ms", False),
+    ("db_rows_per_sec", True),
+    ("peak_rss_mb", False)
+]
+
+def percentile(values, q):
+    """Nearest-rank percentile of values (q in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+def rss_mb():
+    """Current resident set size, from /proc where available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def learner_profile(learner, seed):
+    rng = random.Random(seed * 100003 + learner)
+    level = rng.choice(list(SCENE_OPTIONS))
+    return rng, ("English", rng.choice(LANGUAGES), level, rng.choice(SCENE_OPTIONS[level]))
+
+class Recorder:
+    """Collects per-turn timings from all learners.
+
+    Throughput is measured from the first turn's start to the last turn's
+    end, so connecting and setting up learners isn't counted.
+    """
+
+    def __init__(self):
+        self.turns = []  # (first_token_s, total_s)
+        self.errors = 0
+        self.first_start = None
+        self.last_end = None
+        self._lock = threading.Lock()
+
+    def add(self, start, first_token, end, failed):
+        with self._lock:
+            total = end - start
+            self.turns.append((first_token if first_token is not None else total, total))
+            self.errors += failed
+            self.first_start = start if self.first_start is None else min(self.first_start, start)
+            self.last_end = end if self.last_end is None else max(self.last_end, end)
+
+    @property
+    def elapsed(self):
+        return self.last_end - self.first_start if self.turns else 0.0
+
+def is_error_reply(text, error_markers):
+    return not text or any(marker in text for marker in error_markers)
+
+async def chat_learner(chatbot_ui, learner, args, recorder):
+    rng, profile = learner_profile(learner, args.seed)
+    request = SimpleNamespace(session_hash=f"learner-{learner}")
+    chatbot_ui.setup_user(*profile, request=request)
+    history = []
+    for _ in range(args.turns):
+        message = rng.choice(MESSAGES)
+        start = time.perf_counter()
+        first_token = None
+        async for history, _ in chatbot_ui.chat(message, history, request=request):
+            if first_token is None and history[-1]["content"]:
+                first_token = time.perf_counter() - start
+        reply = history[-1]["content"]
+        recorder.add(start, first_token, time.perf_counter(), is_error_reply(reply, chatbot_ui.ERROR_MARKERS))
+        if args.think_time:
+            await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+async def run_chat_mode(chatbot_ui, args, recorder):
+    # Learners arrive over the ramp-up period instead of all at once
+    async def arrive(learner):
+        await asyncio.sleep(args.ramp_up * learner / max(1, args.learners))
+        await chat_learner(chatbot_ui, learner, args, recorder)
+
+    await asyncio.gather(*(arrive(learner) for learner in range(args.learners)))
+    await llm_client.aclose()
+    return recorder.elapsed
+
+def queue_learner(url, learner, args, recorder, error_markers, ready):
+    from gradio_client import Client
+
+    rng, profile = learner_profile(learner, args.seed)
+    client = Client(url, verbose=False)  # its own session hash, like a browser tab
+    client.predict(profile[2], api_name="/update_scene_options")  # as picking the level in the form does
+    client.predict(*profile, api_name="/setup_user")
+    ready.wait()
+    time.sleep(args.ramp_up * learner / max(1, args.learners))
+    for _ in range(args.turns):
+        message = rng.choice(MESSAGES)
+        start = time.perf_counter()
+        first_token = None
+        job = client.submit(message, api_name="/run")
+        for update in job:
+            if first_token is None and update[0] and update[0][-1]["content"]:
+                first_token = time.perf_counter() - start
+        outputs = job.outputs()
+        reply = outputs[-1][0][-1]["content"] if outputs and outputs[-1][0] else ""
+        recorder.add(start, first_token, time.perf_counter(), is_error_reply(reply, error_markers))
+        if args.think_time:
+            time.sleep(rng.expovariate(1 / args.think_time))
+    client.close()
+
+def queue_clients(url, args, error_markers, results):
+    """Child process: run every learner in its own thread and send back the timings."""
+    recorder = Recorder()
+    ready = threading.Barrier(args.learners)
+    with ThreadPoolExecutor(max_workers=args.learners) as pool:
+        for future in [pool.submit(queue_learner, url, learner, args, recorder, error_markers, ready)
+                       for learner in range(args.learners)]:
+            future.result()
+    results.put((recorder.turns, recorder.errors, recorder.elapsed))
+
+def run_queue_mode(chatbot_ui, args, recorder):
+    port = free_port()
+    chatbot_ui.demo.launch(server_name="127.0.0.1", server_port=port, prevent_thread_lock=True, quiet=True,
+                           show_api=False, app_kwargs={"routes": chatbot_ui.metrics_routes()})
+    try:
+        context = multiprocessing.get_context("spawn")  # no copy of the running app's threads
+        results = context.Queue()
+        clients = context.Process(target=queue_clients, daemon=True, args=(
+            f"http://127.0.0.1:{port}/", args, list(chatbot_ui.ERROR_MARKERS), results
+        ))
+        clients.start()
+        recorder.turns, recorder.errors, elapsed = results.get()
+        clients.join()
+        return elapsed
+    finally:
+        chatbot_ui.demo.close()
+
+def summarize(args, recorder, elapsed, drained, chat_rows, upstream, chatbot_ui):
+    first_tokens = [first * 1000 for first, _ in recorder.turns]
+    totals = [total * 1000 for _, total in recorder.turns]
+    return {
+        "turns": len(totals),
+        "errors": recorder.errors,
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_sec": round(len(totals) / elapsed, 2),
+        "first_token_p50_ms": round(percentile(first_tokens, 50), 2),
+        "first_token_p99_ms": round(percentile(first_tokens, 99), 2),
+        "turn_p50_ms": round(percentile(totals, 50), 2),
+        "turn_p95_ms": round(percentile(totals, 95), 2),
+        "turn_p99_ms": round(percentile(totals, 99), 2),
+        "turn_max_ms": round(max(totals, default=0.0), 2),
+        "chat_rows": chat_rows,
+        "db_rows_per_sec": round(chat_rows / drained, 2) if drained else 0.0,
+        "upstream_requests": upstream,
+        "rss_mb": round(rss_mb() or 0.0, 1),
+        "peak_rss_mb": round(peak_rss_mb() or 0.0, 1),
+        "write_behind": chatbot_ui.turn_writer.metrics(),
+        "response_cache": chatbot_ui.response_cache.stats(),
+        "stages": chatbot_ui.metrics.stage_summaries()
+    }
+
+def compare(report, baseline, tolerance):
+    """Print headline changes against a baseline run; return the regressed keys."""
+    results = report["results"]
+    regressions = []
+    print(f"\nvs baseline {baseline.get('revision') or '?'} ({baseline.get('timestamp', '?')}):")
+    for key, higher_is_better in HEADLINE:
+        before, after = baseline["results"].get(key), results.get(key)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > tolerance else ""
+        print(f"  {key:<20}{before:>12.2f} -> {after:>12.2f}  {change:+7.1%}  {flag}")
+        if flag:
+            regressions.append(key)
+    if baseline.get("config") != report["config"]:
+        print("  note: the baseline was run with different settings")
+    return regressions
+
+def main(args):
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    start_rss = rss_mb()
+    import chatbot_ui
+    chatbot_ui.create_app()
+
+    server = FakeOpenRouter(latency=args.latency, token_latency=args.token_latency,
+                            reply_words=args.reply_words, latency_distribution=args.distribution)
+    with server:
+        llm_client.url = server.url
+        if args.error_rate:
+            server.inject_faults(error_rate=args.error_rate)
+        print(f"mode={args.mode} learners={args.learners} turns={args.turns} "
+              f"latency={args.latency * 1000:.0f}ms ({args.distribution}) think_time={args.think_time}s")
+
+        recorder = Recorder()
+        if args.mode == "chat":
+            elapsed = asyncio.run(run_chat_mode(chatbot_ui, args, recorder))
+        else:
+            elapsed = run_queue_mode(chatbot_ui, args, recorder)
+        # Rows per second counts until the writer has committed the last turn
+        flush_start = time.perf_counter()
+        chatbot_ui.turn_writer.flush(60)
+        drained = elapsed + time.perf_counter() - flush_start
+        upstream = server.request_count
+
+    conn = sqlite3.connect(os.path.join(workdir, DATABASE_PATH))
+    chat_rows = conn.execute("SELECT COUNT(*) FROM chats").fetchone()[0]
+    conn.close()
+
+    results = summarize(args, recorder, elapsed, drained, chat_rows, upstream, chatbot_ui)
+    results["start_rss_mb"] = round(start_rss or 0.0, 1)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "tolerance")},
+        "results": results
+    }
+
+    print(f"turns={results['turns']} errors={results['errors']} elapsed={results['elapsed_s']:.2f}s "
+          f"throughput={results['turns_per_sec']:.1f} turns/s upstream requests={upstream}")
+    print(f"first token p50={results['first_token_p50_ms']:.1f}ms p99={results['first_token_p99_ms']:.1f}ms | "
+          f"turn p50={results['turn_p50_ms']:.1f}ms p95={results['turn_p95_ms']:.1f}ms "
+          f"p99={results['turn_p99_ms']:.1f}ms")
+    print(f"db rows={chat_rows} ({results['db_rows_per_sec']:.1f} rows/s) "
+          f"write batches={results['write_behind']['batches']} | "
+          f"rss={results['rss_mb']:.0f}MB peak={results['peak_rss_mb']:.0f}MB")
+    print("stage p50/p99 (ms): " + ", ".join(
+        f"{stage} {summary['p50_ms']:.2f}/{summary['p99_ms']:.2f}" for stage, summary in results["stages"].items()
+    ))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"results saved to {args.output}")
+    return 1 if regressions else 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end load test for the chat pipeline.")
+    parser.add_argument("--learners", type=int, default=50, help="concurrent simulated learners")
+    parser.add_argument("--turns", type=int, default=10, help="turns per learner")
+    parser.add_argument("--mode", choices=("chat", "queue"), default="chat",
+                        help="call chat() directly, or go through the Gradio queue over HTTP")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean upstream time to first token (s)")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="upstream delay per token (s)")
+    parser.add_argument("--reply-words", type=int, default=40, help="filler tokens per reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of upstream requests that fail")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a learner's turns (s)")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="seconds over which learners arrive")
+    parser.add_argument("--seed", type=int, default=1, help="seed for learner profiles and messages")
+    parser.add_argument("--output", default=os.path.abspath("load_test_results.json"))
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative change in a headline number counted as a regression")
+    args = parser.parse_args(argv)
+    args.output = os.path.abspath(args.output)
+    if args.baseline:
+        args.baseline = os.path.abspath(args.baseline)
+    return args
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -0,0 +1,195 @@
+# challenges.py
+
+import asyncio
+import difflib
+import json
+import random
+import re
+import threading
+import time
+
+import httpx
+
+from backends import BACKEND_ERRORS
+from config import (
+    CHALLENGE_DAILY_LIMIT, CHALLENGE_BANK_SIZE, CHALLENGE_GENERATION_CONCURRENCY, CHALLENGE_MATCH_RATIO
+)
+from logs import fields, get_logger
+
+log = get_logger("challenges")
+
+GENERATION_PROMPT = (
+    "Write {count} short translation challenges for a {difficulty} learner of {target_lang} "
+    "practicing this scene: {scene}. Each challenge gives an English sentence someone might say "
+    "in the scene; the learner translates it into {target_lang}. "
+    'Reply with only a JSON array of objects with the keys "prompt" (the English sentence), '
+    '"answer" (the {target_lang} translation) and "hint" (one key word or grammar tip).'
+)
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+def challenge_key(target_lang, difficulty, scene):
+    """Normalized (target_lang, difficulty, scene), as stored in the challenges table."""
+    return " ".join(target_lang.split()).title(), difficulty.strip().lower(), " ".join(scene.split())
+
+def parse_challenges(text):
+    """(prompt, answer, hint) tuples from a reply holding a JSON array of challenges.
+
+    Text around the array, such as a code fence, is ignored, and so are
+    items without a prompt or an answer.
+    """
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end < start:
+        return []
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return []
+    found = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        prompt, answer = str(item.get("prompt") or "").strip(), str(item.get("answer") or "").strip()
+        if prompt and answer:
+            found.append((prompt, answer, str(item.get("hint") or "").strip()))
+    return found
+
+def normalize_answer(text):
+    return " ".join(PUNCTUATION.sub(" ", text.casefold()).split())
+
+def check_answer(answer, expected, match_ratio=CHALLENGE_MATCH_RATIO):
+    """True if answer matches expected, ignoring case and punctuation and allowing small typos."""
+    answer, expected = normalize_answer(answer), normalize_answer(expected)
+    if not answer:
+        return False
+    return answer == expected or difflib.SequenceMatcher(None, answer, expected).ratio() >= match_ratio
+
+async def generate_challenges(router, target_lang, difficulty, scene, count, max_calls=3):
+    """Ask the LLM for count new challenges for one key; returns (prompt, answer, hint) tuples.
+
+    Models often return fewer items than asked for, so up to max_calls
+    requests are made. Replies from backends that aren't cacheable (the
+    offline templates) are not real challenges and are skipped.
+    """
+    found = {}
+    for _ in range(max_calls):
+        if len(found) >= count:
+            break
+        payload = {
+            "messages": [{"role": "user", "content": GENERATION_PROMPT.format(
+                count=count - len(found), target_lang=target_lang, difficulty=difficulty, scene=scene
+            )}],
+            "temperature": 0.9,
+            "max_tokens": 1500
+        }
+        backend, text = await router.complete(payload)
+        if not backend.cacheable:
+            break
+        for prompt, answer, hint in parse_challenges(text):
+            found.setdefault(prompt, (prompt, answer, hint))
+    return list(found.values())[:count]
+
+async def build_bank(store, router, keys, count=CHALLENGE_BANK_SIZE, concurrency=CHALLENGE_GENERATION_CONCURRENCY,
+                     progress=None):
+    """Fill the bank up to count challenges for each (target_lang, difficulty, scene) in keys.
+
+    Keys that already hold count challenges are skipped, so an interrupted
+    run can simply be started again. progress(key, added) is called as
+    each key finishes. Returns the number of challenges added per key.
+    """
+    existing = store.challenge_counts()
+    semaphore = asyncio.Semaphore(concurrency)
+    added = {}
+
+    async def fill(key):
+        missing = count - existing.get(key, 0)
+        if missing <= 0:
+            added[key] = 0
+        else:
+            async with semaphore:
+                try:
+                    items = await generate_challenges(router, *key, missing)
+                except (*BACKEND_ERRORS, httpx.HTTPError) as e:
+                    log.warning("challenge_generation_failed", extra=fields(key="/".join(key), error=repr(e)))
+                    items = []
+            now = int(time.time())
+            added[key] = store.store_challenges([(*key, prompt, answer, hint, now) for prompt, answer, hint in items])
+        if progress:
+            progress(key, added[key])
+
+    await asyncio.gather(*(fill(challenge_key(*key)) for key in keys))
+    return added
+
+class DailyLimiter:
+    """Per-user counters of actions taken today (UTC), capped at limit.
+
+    One dict lookup per check. The counters are dropped together when the
+    day changes, so they never hold more than a day's users. Counters live
+    in memory and are keyed by whatever id the caller passes; the UI has
+    no login, so it passes the browser's persistent learner id.
+    """
+
+    def __init__(self, limit=CHALLENGE_DAILY_LIMIT):
+        self.limit = limit
+        self._day = None
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _roll(self, now):
+        day = int(now // 86400)
+        if day != self._day:
+            self._day = day
+            self._counts = {}
+
+    def try_acquire(self, user_id, now=None):
+        """Count one action for user_id; False once today's limit is used up."""
+        with self._lock:
+            self._roll(now or time.time())
+            used = self._counts.get(user_id, 0)
+            if used >= self.limit:
+                return False
+            self._counts[user_id] = used + 1
+            return True
+
+    def remaining(self, user_id, now=None):
+        with self._lock:
+            self._roll(now or time.time())
+            return self.limit - self._counts.get(user_id, 0)
+
+class ChallengeBank:
+    """The pre-generated challenges, served from memory.
+
+    Each key is read from the database on first use and then kept, so a
+    round costs a dict lookup and a random choice with no upstream call.
+    A key with no challenges is not kept, so it is found once a generation
+    run fills it.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._items = {}  # challenge_key(...) -> ((id, prompt, answer, hint), ...)
+        self._lock = threading.Lock()
+
+    def items(self, target_lang, difficulty, scene):
+        key = challenge_key(target_lang, difficulty, scene)
+        items = self._items.get(key)
+        if items is None:
+            items = tuple(self.store.challenges(*key))
+            if items:
+                with self._lock:
+                    self._items[key] = items
+        return items
+
+    def pick(self, target_lang, difficulty, scene, exclude=None, rng=random):
+        """A random challenge for the key other than exclude (an id), or None if there are none."""
+        items = self.items(target_lang, difficulty, scene)
+        if not items:
+            return None
+        item = rng.choice(items)
+        if item[0] == exclude and len(items) > 1:
+            item = rng.choice([other for other in items if other[0] != exclude])
+        return item
+
+    def clear(self):
+        with self._lock:
+            self._items = {}
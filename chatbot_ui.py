@@ -1,109 +1,74 @@
 # chatbot_ui.py
 
-import gradio as gr
-import random
-import requests
-from datetime import datetime
-from textblob import TextBlob
-import json
-from config import DATABASE_PATH, OPENROUTER_API_KEY, CHALLENGE_DAILY_LIMIT, CHALLENGE_DIFFICULTY_LEVELS, SENTIMENT_THRESHOLD
-import sqlite3  # Use SQLite instead of psycopg2
-
-# Setup DB
-conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)  # Connect to SQLite database
-cursor = conn.cursor()
-
-# Drop existing tables to ensure clean schema
-cursor.execute("DROP TABLE IF EXISTS chats")
-cursor.execute("DROP TABLE IF EXISTS mistakes")
-cursor.execute("DROP TABLE IF EXISTS user_progress")
-
-# Create enhanced tables for better tracking
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS chats (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_input TEXT,
-    bot_response TEXT,
-    sentiment_score REAL,
-    scene TEXT,
-    timestamp TEXT
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS mistakes (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_input TEXT,
-    mistake_type TEXT,
-    correction TEXT,
-    explanation TEXT,
-    context TEXT,
-    timestamp TEXT,
-    review_count INTEGER DEFAULT 0,
-    mastered BOOLEAN DEFAULT FALSE
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS user_progress (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    session_date TEXT,
-    scene TEXT,
-    total_interactions INTEGER,
-    correct_responses INTEGER,
-    mistakes_made INTEGER,
-    confidence_score REAL
-)
-""")
-conn.commit()
-
-# OpenRouter API Setup
-API_KEY = OPENROUTER_API_KEY
-HEADERS = {
-    "Authorization": f"Bearer {API_KEY}",
-    "Content-Type": "application/json"
-}
-MODEL = "mistralai/mistral-7b-instruct"
-
-# Globals for Gradio
-session_data = {
-    "known_lang": "",
-    "target_lang": "",
-    "level": "",
-    "scene": "",
-    "chat_history": [],
-    "current_challenge": None,
-    "challenge_score": 0
-}
-
-# Scene options for each level
-SCENE_OPTIONS = {
-    "Beginner": ["ordering food at a restaurant", "greeting someone", "asking for directions"],
-    "Intermediate": ["booking a hotel", "visiting a doctor", "chatting with a local"],
-    "Advanced": ["debating social issues", "job interview", "discussing politics"]
-}
-
-def analyze_sentiment(text):
-    analysis = TextBlob(text)
-    return analysis.sentiment.polarity
-
-def analyze_mistake(user_input, bot_response):
-    """Analyze the type of mistake and provide structured feedback."""
-    mistake_types = {
-        "grammar": ["grammar", "tense", "conjugation", "structure", "incorrect"],
-        "vocabulary": ["word choice", "meaning", "vocabulary", "wrong word"],
-        "pronunciation": ["pronunciation", "accent", "sound", "pronounce"],
-        "cultural": ["cultural context", "formal", "informal", "politeness"]
-    }
-    
-    lower_response = bot_response.lower()
-    for category, keywords in mistake_types.items():
-        if any(keyword in lower_response for keyword in keywords):
-            return category
-    return "general"
+"""Gradio UI and chat handlers.
 
-def get_emotion_aware_response(sentiment_score, response):
-    """Generate more natural, emotion-aware responses."""
+Importing this module is cheap: it opens no database and builds no UI.
+create_app() does the startup work once, and Gradio itself is imported
+when the UI is built or a handler first needs it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import httpx
+import threading
+import time
+from config import SERVER_HOST, SERVER_PORT, CHALLENGE_DAILY_LIMIT, CHALLENGE_DIFFICULTY_LEVELS, STREAM_RESPONSES, CONTEXT_MAX_TURNS, RESPONSE_CACHE_PERSIST, QUEUE_CONCURRENCY_LIMIT, QUEUE_MAX_SIZE, REVIEW_BATCH_SIZE, SCENE_OPTIONS
+from storage import storage
+from sentiment import analyze_sentiment, missing_corpora
+from write_behind import WriteBehindQueue
+from sessions import sessions, assign_learner, session_for, session_id_for
+from context_builder import build_context_prompt
+from prompts import PromptRegistry
+from review import GRADES, ReviewQueue
+from challenges import ChallengeBank, DailyLimiter, check_answer
+from llm_client import UpstreamError, llm_client
+from backends import llm_router
+from flow_control import CircuitOpenError
+from response_cache import ResponseCache, cache_key
+from dashboard import DashboardRenderer, ERROR as DASHBOARD_ERROR
+from logs import configure_logging, fields, get_logger
+from metrics import metrics
+from lazy import lazy_import
+
+# Gradio takes seconds to import; handler annotations and gr.update() load it
+gr = lazy_import("gradio")
+
+log = get_logger("chatbot")
+
+# Chat turns are persisted in batches by a background writer thread
+turn_writer = WriteBehindQueue(storage)
+
+# Replies to repeated learner prompts, optionally persisted in the database
+response_cache = ResponseCache(storage if RESPONSE_CACHE_PERSIST else None)
+
+# Progress dashboard HTML, cached until the stored mistakes change
+dashboard = DashboardRenderer(storage)
+
+# Point-in-time values, read when /metrics is scraped
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+metrics.gauge("write_queue_depth", lambda: turn_writer.metrics()["queue_depth"],
+              "Turns waiting for the background writer.")
+metrics.gauge("sessions", lambda: len(sessions), "Live learner sessions.")
+metrics.gauge("response_cache_entries", lambda: response_cache.stats()["entries"],
+              "Replies held in the in-memory response cache.")
+metrics.gauge("response_cache_hits", lambda: response_cache.stats()["hits"],
+              "Replies served from the response cache since startup.")
+metrics.gauge("upstream_breaker_state",
+              lambda: BREAKER_STATES[llm_client.breaker.state] if llm_client.breaker else 0,
+              "Circuit breaker on the OpenRouter client: 0 closed, 1 half-open, 2 open.")
+
+# Pre-generated challenges (see generate_challenges.py) and the daily allowance,
+# counted per browser (its learner id) since learners don't log in
+challenge_bank = ChallengeBank(storage)
+challenge_limiter = DailyLimiter(CHALLENGE_DAILY_LIMIT)
+
+# System-message prefixes for every scene, built once at startup
+prompt_registry = PromptRegistry(SCENE_OPTIONS)
+
+def get_emotion_wrappers(sentiment_score):
+    """Return the (prefix, suffix) placed around a reply for the given sentiment."""
     if sentiment_score < -0.3:
         encouragements = [
             "Don't worry! Everyone makes mistakes while learning. ",
@@ -111,9 +76,9 @@ def get_emotion_aware_response(sentiment_score, response):
             "Learning a language takes time, and you're making progress! ",
             "Keep going! Making mistakes is how we learn. "
         ]
-        return f"{random.choice(encouragements)}{response} 💪"
+        return random.choice(encouragements), " 💪"
     elif sentiment_score < 0:
-        return f"Keep going! {response} You're getting better with every conversation! 🌟"
+        return "Keep going! ", " You're getting better with every conversation! 🌟"
     elif sentiment_score > 0.3:
         celebrations = [
             "Fantastic! ",
@@ -121,35 +86,20 @@ def get_emotion_aware_response(sentiment_score, response):
             "Excellent work! ",
             "You're really getting the hang of this! "
         ]
-        return f"{random.choice(celebrations)}{response} 🎉"
+        return random.choice(celebrations), " 🎉"
     elif sentiment_score > 0.1:
-        return f"Well done! {response} 👍"
-    return response
+        return "Well done! ", " 👍"
+    return "", ""
+
+def get_emotion_aware_response(sentiment_score, response):
+    """Generate more natural, emotion-aware responses."""
+    prefix, suffix = get_emotion_wrappers(sentiment_score)
+    return f"{prefix}{response}{suffix}"
 
 def get_learning_insights():
     """Get enhanced learning insights from the database."""
-    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)  # Connect to SQLite database
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT 
-            mistake_type,
-            COUNT(*) as count,
-            SUM(CASE WHEN mastered THEN 1 ELSE 0 END) as mastered_count
-        FROM mistakes 
-        GROUP BY mistake_type 
-        ORDER BY count DESC
-    """)
-    mistake_stats = cursor.fetchall()
-    
-    cursor.execute("""
-        SELECT scene, COUNT(*) as count
-        FROM chats
-        GROUP BY scene
-        ORDER BY count DESC
-        LIMIT 3
-    """)
-    scene_stats = cursor.fetchall()
+    mistake_stats = storage.mistake_stats()
+    scene_stats = storage.scene_stats()
     
     insights = "📊 Learning Progress Report\n\n"
     
@@ -164,161 +114,218 @@ def get_learning_insights():
         for scene, count in scene_stats:
             insights += f"- {scene}: {count} conversations\n"
     
-    conn.close()  # Close the connection
     return insights
 
-def query_openrouter(user_input, max_retries=3, retry_delay=1):
-    """Query OpenRouter API with retry mechanism"""
-    import time
-    
-    for attempt in range(max_retries):
-        try:
-            sentiment_score = analyze_sentiment(user_input)
-            
-            conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)  # Connect to SQLite database
-            cursor = conn.cursor()
-            
-            # Get conversation context from recent history
-            cursor.execute("""
-                SELECT user_input, bot_response 
-                FROM chats 
-                ORDER BY timestamp DESC 
-                LIMIT 3
-            """)
-            recent_context = cursor.fetchall()
-            conn.close()  # Close the connection
-            
-            context_prompt = ""
-            if recent_context:
-                context_prompt = "Previous conversation:\n" + "\n".join([
-                    f"User: {msg[0]}\nAssistant: {msg[1]}" 
-                    for msg in recent_context[::-1]
-                ]) + "\n\n"
-            
-            system_message = (
-                f"You are Chatalyst, a friendly language guide. "
-                f"Help the user learn {session_data['target_lang']} in a simple way. "
-                f"Use short sentences and easy words. "
-                f"Encourage them and provide examples. "
-                f"Current scene: {session_data['scene']}.\n\n"
-                f"{context_prompt}"
-            )
-
-            payload = {
-                "model": MODEL,
-                "messages": [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_input}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 500
-            }
+def get_recent_context(session):
+    """Return the session's recent (user_input, bot_response) turns, oldest first.
+
+    The database is only read the first time a session is used, to pick up
+    where a resumed conversation left off.
+    """
+    window = session["window"]
+    if not window.loaded:
+        with metrics.timer("context_query"):
+            window.load(storage.recent_context(CONTEXT_MAX_TURNS, session["learner_id"]))
+    return window.turns()
+
+async def stream_openrouter(user_input, session, sentiment_score=None, max_retries=3, retry_delay=1):
+    """Stream an OpenRouter reply for a session, yielding the full text received so far.
+
+    The emotion-aware prefix is yielded before the upstream request is made.
+    If the request fails, the last value yielded is a friendly error message
+    that replaces any partial text.
+    """
+    try:
+        if sentiment_score is None:
+            with metrics.timer("sentiment"):
+                sentiment_score = analyze_sentiment(user_input)
+        
+        # Get conversation context from the session's in-memory window:
+        # a running summary of older turns plus the latest ones, trimmed
+        with metrics.timer("context"):
+            recent_context = get_recent_context(session)
+            context_prompt = build_context_prompt(session["window"])
+        
+        # Prebuilt static instructions first, so the provider can reuse
+        # its cached prefix; the per-turn context follows
+        system_message = prompt_registry.system_message(
+            session["target_lang"], session["level"], session["scene"], context_prompt
+        )
 
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=HEADERS,
-                json=payload,
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                bot_response = response.json()["choices"][0]["message"]["content"]
-                
-                # Add motivational messages based on sentiment score
-                if sentiment_score < -0.3:
-                    bot_response = f"Don't worry! You're doing great! 😊 {bot_response}"
-                elif sentiment_score > 0.3:
-                    bot_response = f"Fantastic! Keep it up! 🎉 {bot_response}"
-                
-                return get_emotion_aware_response(sentiment_score, bot_response)
-            else:
-                print(f"OpenRouter API Error: {response.status_code} - {response.text}")
-                return "I'm having trouble connecting right now. Could you please try again in a moment? 😊"
-
-        except requests.exceptions.Timeout:
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-                continue
-            return "The response is taking longer than expected. Could you please try again? 🕒"
-        
-        except requests.exceptions.ConnectionError:
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-                continue
-            return "I'm having trouble connecting to my language services. Please check your internet connection and try again. 🌐"
-        
-        except Exception as e:
-            print(f"Error in query_openrouter: {str(e)}")
-            return "I seem to be having technical difficulties. Let's try that again! 🔄"
+        payload = {
+            "messages": [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_input}
+            ],
+            "temperature": 0.7,
+            "max_tokens": 500
+        }
+
+        prefix, suffix = get_emotion_wrappers(sentiment_score)
+        
+        # Add motivational messages based on sentiment score
+        if sentiment_score < -0.3:
+            prefix += "Don't worry! You're doing great! 😊 "
+        elif sentiment_score > 0.3:
+            prefix += "Fantastic! Keep it up! 🎉 "
+
+        # Repeated prompts are answered from the cache; the sentiment
+        # wrapping above is still applied to the cached body
+        key = cache_key(llm_router.cache_namespace, session["target_lang"], session["level"], session["scene"],
+                        user_input, recent_context + [("", session["window"].summary.text())])
+        cached_body = response_cache.get(key)
+        if cached_body is not None:
+            yield prefix + cached_body + suffix
+            return
+
+        text = prefix
+        if text:
+            yield text
+
+        backend = None
+        first_token = True
+        start = time.perf_counter()
+        if STREAM_RESPONSES:
+            # Routed to the fastest backend; failures before the first token
+            # are retried with jittered backoff, then passed to the next one
+            async for backend, delta in llm_router.stream(payload, max_retries=max_retries, retry_delay=retry_delay):
+                if first_token:
+                    metrics.observe("llm_first_token", time.perf_counter() - start)
+                    first_token = False
+                text += delta
+                yield text
+        else:
+            backend, body = await llm_router.complete(payload, max_retries=max_retries, retry_delay=retry_delay)
+            text += body
+        metrics.observe("llm", time.perf_counter() - start)
+
+        if backend is not None and backend.cacheable:
+            response_cache.put(key, text[len(prefix):])
+        yield text + suffix
+
+    except CircuitOpenError:
+        # OpenRouter has been failing; answer at once instead of waiting on it
+        metrics.increment("llm_errors", kind="circuit_open")
+        yield "I'm having trouble connecting right now. Could you please try again in a moment? 😊"
+
+    except UpstreamError as e:
+        metrics.increment("llm_errors", kind="upstream_status")
+        log.warning("upstream_error", extra=fields(status=e.status_code, body=e.text[:200]))
+        yield "I'm having trouble connecting right now. Could you please try again in a moment? 😊"
+
+    except httpx.TimeoutException:
+        metrics.increment("llm_errors", kind="timeout")
+        log.warning("upstream_timeout")
+        yield "The response is taking longer than expected. Could you please try again? 🕒"
+    
+    except httpx.TransportError as e:
+        metrics.increment("llm_errors", kind="transport")
+        log.warning("upstream_unreachable", extra=fields(error=repr(e)))
+        yield "I'm having trouble connecting to my language services. Please check your internet connection and try again. 🌐"
     
-    return "I'm sorry, I'm having trouble responding right now. Please try again in a few moments. 🙏"
+    except Exception:
+        metrics.increment("llm_errors", kind="internal")
+        log.exception("reply_failed")
+        yield "I seem to be having technical difficulties. Let's try that again! 🔄"
 
-def chat(user_input, history):
-    try:
-        response = query_openrouter(user_input)
-        sentiment_score = analyze_sentiment(user_input)
+async def query_openrouter(user_input, session_id="", max_retries=3, retry_delay=1):
+    """Query OpenRouter API with retry mechanism"""
+    response = ""
+    session = sessions.get(session_id)
+    async for response in stream_openrouter(user_input, session, max_retries=max_retries, retry_delay=retry_delay):
+        pass
+    return response
+
+# Replies containing these are friendly error messages and are not stored
+ERROR_MARKERS = [
+    "trouble connecting", 
+    "taking longer than expected",
+    "technical difficulties",
+    "try again"
+]
+
+class TurnPipeline:
+    """Runs one chat turn: input -> sentiment -> LLM -> post-process -> persist -> UI refresh.
+
+    Each stage runs exactly once per message, so a turn costs one upstream
+    request, one sentiment pass and one set of inserts.
+    """
+
+    async def run(self, user_input, history, profile=None, request: gr.Request = None, refresh_view=True):
+        """Yield (chatbot, state, db_view) updates while the reply streams in.
+
+        Gradio passes the request, whose session hash selects the user's
+        session, and the tab's profile, which restores its onboarding choices.
+        """
+        session = session_for(request, profile)
         
         # Initialize history if None
         history = history or []
         
         # Format messages according to Gradio's expected format
         user_message = {"role": "user", "content": user_input}
-        assistant_message = {"role": "assistant", "content": response}
+        assistant_message = {"role": "assistant", "content": ""}
         
         # Add formatted messages to history
         history.append(user_message)
         history.append(assistant_message)
         
-        # Store in database only if we got a valid response
-        if not any(error_msg in response for error_msg in [
-            "trouble connecting", 
-            "taking longer than expected",
-            "technical difficulties",
-            "try again"
-        ]):
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)  # Connect to SQLite database
-            cursor = conn.cursor()
+        start = time.perf_counter()
+        try:
+            with metrics.timer("sentiment"):
+                sentiment_score = analyze_sentiment(user_input)
             
-            # Insert chat data
-            cursor.execute("""
-                INSERT INTO chats (user_input, bot_response, sentiment_score, scene, timestamp) 
-                VALUES (?, ?, ?, ?, ?)
-            """, (user_input, response, sentiment_score, session_data['scene'], timestamp))
+            response = ""
+            async for response in stream_openrouter(user_input, session, sentiment_score):
+                assistant_message["content"] = response
+                yield history, history, gr.update()
             
-            # Check for mistakes in the response
-            mistake_type = analyze_mistake(user_input, response)
-            if mistake_type != "general":  # Only store if a specific mistake type is found
-                cursor.execute("""
-                    INSERT INTO mistakes (user_input, mistake_type, correction, explanation, 
-                    context, timestamp) VALUES (?, ?, ?, ?, ?, ?)
-                """, (user_input, mistake_type, response, "Extracted from conversation", 
-                      session_data['scene'], timestamp))
+            # Store in database only if we got a valid response
+            stored = None
+            if not any(error_msg in response for error_msg in ERROR_MARKERS):
+                stored = self.persist(session, user_input, response, sentiment_score)
             
-            conn.commit()  # Commit changes to the database
-            conn.close()   # Close the connection
-        
-        return history, history
-        
-    except Exception as e:
-        print(f"Error in chat function: {str(e)}")
-        error_message = {"role": "assistant", "content": "I'm having trouble processing that. Let's try again! 🔄"}
-        history = history or []
-        history.append({"role": "user", "content": user_input})
-        history.append(error_message)
-        return history, history
+            # Time to the full reply on screen; the dashboard refresh is its own stage
+            metrics.observe("turn", time.perf_counter() - start)
+            metrics.increment("turns")
+
+            if refresh_view:
+                # The reply is already on screen; only the dashboard waits for the commit
+                if stored is not None:
+                    with metrics.timer("db_commit_wait"):
+                        await asyncio.wrap_future(stored)
+                yield history, history, view_database_contents()
+            
+        except Exception:
+            log.exception("turn_failed", extra=fields(session_id=session["session_id"]))
+            assistant_message["content"] = "I'm having trouble processing that. Let's try again! 🔄"
+            yield history, history, gr.update()
+
+    def persist(self, session, user_input, response, sentiment_score):
+        """Queue the turn for the background writer, which also classifies the mistake.
+
+        Returns a Future that resolves once the turn is committed.
+        """
+        session["window"].add(user_input, response)
+        return turn_writer.submit(session["learner_id"], user_input, response, sentiment_score, session['scene'])
+
+turn_pipeline = TurnPipeline()
 
-def setup_user(known, target, level, scene):
+async def chat(user_input, history, profile=None, request=None):
+    """Stream the reply into the chat history without refreshing the dashboard."""
+    async for history, state, _ in turn_pipeline.run(user_input, history, profile, request, refresh_view=False):
+        yield history, state
+
+def setup_user(known, target, level, scene, profile=None, request: gr.Request = None):
+    """Store the onboarding choices; returns the greeting and the tab's new profile."""
     if not known or not target or not level or not scene:
-        return "Please fill in all fields before starting the chat."
+        return "Please fill in all fields before starting the chat.", profile or {}
         
-    session_data["known_lang"] = known
-    session_data["target_lang"] = target
-    session_data["level"] = level.capitalize()
-    session_data["scene"] = scene
+    profile = dict(profile or {}, known_lang=known, target_lang=target, level=level.capitalize(), scene=scene)
+    session_for(request, profile)
 
     greeting = f"Great! You're practicing {scene} in a {target}-speaking country. Let's begin!"
-    return greeting
+    return greeting, profile
 
 def update_scene_options(level):
     if not level:
@@ -328,373 +335,469 @@ def update_scene_options(level):
                       value=SCENE_OPTIONS.get(level, SCENE_OPTIONS["Beginner"])[0])
 
 def view_database_contents():
-    """View contents of all tables in the database with improved formatting"""
+    """Learning progress dashboard, re-rendered only when new mistakes are stored"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)  # Connect to SQLite database
-        cursor = conn.cursor()
-        
-        # Get mistake statistics
-        cursor.execute("""
-            SELECT 
-                mistake_type,
-                COUNT(*) as count
-            FROM mistakes 
-            GROUP BY mistake_type 
-            ORDER BY count DESC
-        """)
-        mistake_stats = cursor.fetchall()
-        
-        # Get recent mistakes
-        cursor.execute("""
-            SELECT user_input, correction, mistake_type, timestamp 
-            FROM mistakes 
-            ORDER BY timestamp DESC 
-            LIMIT 5
-        """)
-        recent_mistakes = cursor.fetchall()
-        
-        output = """
-        <div style="padding: 20px; background: white; border-radius: 15px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
-            <h3 style="color: #1f2937; font-size: 1.5rem; margin-bottom: 20px;">
-                🎯 Your Learning Progress
-            </h3>
-            <div style="display: flex; flex-wrap: wrap; gap: 15px;">
-        """
-        
-        # Add mistake type cards
-        for mistake_type, count in mistake_stats:
-            color = {
-                "grammar": "#4f46e5",
-                "vocabulary": "#059669",
-                "pronunciation": "#db2777",
-                "cultural": "#9333ea",
-                "general": "#475569"
-            }.get(mistake_type.lower(), "#475569")
-            
-            output += f"""
-                <div style="background: {color}; color: white; padding: 15px; border-radius: 12px; flex: 1 1 150px; text-align: center;">
-                    <h4 style="margin: 0;">{mistake_type.title()}</h4>
-                    <p style="margin: 0;">{count} {'time' if count == 1 else 'times'}</p>
-                </div>
-            """
-        
-        output += """
-            </div>
-        </div>
-        <div style="margin-top: 30px;">
-            <h3 style="color: #1f2937; font-size: 1.5rem; margin-bottom: 20px;">
-                💡 Recent Learning Opportunities
-            </h3>
-            <table style="width: 100%; border-collapse: collapse;">
-                <thead>
-                    <tr style="background: #f8fafc;">
-                        <th style="padding: 10px; border: 1px solid #e5e7eb;">You Said</th>
-                        <th style="padding: 10px; border: 1px solid #e5e7eb;">Correction</th>
-                        <th style="padding: 10px; border: 1px solid #e5e7eb;">Mistake Type</th>
-                        <th style="padding: 10px; border: 1px solid #e5e7eb;">Timestamp</th>
-                    </tr>
-                </thead>
-                <tbody>
-        """
-        
-        # Check if there are recent mistakes
-        if not recent_mistakes:
-            output += """
-                <tr>
-                    <td colspan="4" style="padding: 10px; border: 1px solid #e5e7eb; text-align: center;">No recent mistakes recorded.</td>
-                </tr>
-            """
-        else:
-            # Add recent mistakes to the table
-            for user_input, correction, mistake_type, timestamp in recent_mistakes:
-                output += f"""
-                    <tr>
-                        <td style="padding: 10px; border: 1px solid #e5e7eb;">{user_input}</td>
-                        <td style="padding: 10px; border: 1px solid #e5e7eb;">{correction}</td>
-                        <td style="padding: 10px; border: 1px solid #e5e7eb;">{mistake_type.title()}</td>
-                        <td style="padding: 10px; border: 1px solid #e5e7eb;">{timestamp}</td>
-                    </tr>
-                """
-        
-        output += """
-                </tbody>
-            </table>
-        </div>
-        </div>
-        """
-        
-        conn.close()  # Close the connection
-        return output
-        
-    except Exception as e:
-        return f"""
-        <div style="padding: 20px; background: white; border-radius: 15px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
-            <p style="color: #dc2626;">Unable to load learning progress. Please try again.</p>
-        </div>
-        """
-
-# Update the Gradio interface layout
-with gr.Blocks(
-    title="Chatalyst - Your Language Learning Companion",
-    theme=gr.themes.Soft(
-        primary_hue="slate",
-        secondary_hue="gray",
-        neutral_hue="stone",
-        font=["sans-serif", "ui-sans-serif", "system-ui"]
-    ),
-    css="container"
-) as demo:
-    with gr.Row(equal_height=True):
-        with gr.Column(scale=1):
-            gr.Markdown(
-                """
-                <div style='text-align: center; padding: 2rem 0;'>
-                    <h1 style='font-size: 2.5rem; margin-bottom: 1rem;'>🌍 Chatalyst</h1>
-                    <p style='color: #94a3b8; font-size: 1.2rem;'>Your Smart Language Learning Companion</p>
-                </div>
-                """
-            )
+        with metrics.timer("dashboard"):
+            return dashboard.render()
+    except Exception:
+        log.exception("dashboard_render_failed")
+        return DASHBOARD_ERROR
+
+def review_queue_for(session):
+    """The learner's review queue, loaded from the database on first use."""
+    if session["review"] is None or session["review"].session_id != session["learner_id"]:
+        session["review"] = ReviewQueue(storage, session["learner_id"])
+    return session["review"]
+
+def format_wait(seconds):
+    if seconds < 3600:
+        return f"{max(1, round(seconds / 60))} min"
+    if seconds < 86400:
+        return f"{round(seconds / 3600)} h"
+    return f"{round(seconds / 86400)} days"
+
+def render_review(session):
+    """Markdown for the review panel: the mistake to drill now and what else is due."""
+    review = review_queue_for(session)
+    with metrics.timer("review"):
+        due = review.due(REVIEW_BATCH_SIZE)
+    cards = storage.review_cards(due)
+    session["review_item"] = cards[0][0] if cards else None
+    if not cards:
+        next_due_at = review.next_due_at()
+        if next_due_at is None:
+            return "No mistakes to review yet. Keep chatting and they'll show up here! 🌱"
+        return f"All caught up! 🎉 Next review in {format_wait(next_due_at - time.time())}."
+
+    _, user_input, mistake_type, correction, review_count, mastered = cards[0]
+    text = (
+        f"### 🔁 Review: {(mistake_type or 'general').title()}\n\n"
+        f"**You wrote:** {user_input}\n\n"
+        f"**Feedback:** {correction}\n\n"
+        f"_Reviewed {review_count} times{' · mastered' if mastered else ''}._ "
+        f"How well did you remember this?"
+    )
+    if len(cards) > 1:
+        text += "\n\n**Also due:**\n" + "\n".join(f"- {card[1]}" for card in cards[1:])
+    return text
+
+def show_review(profile=None, request: gr.Request = None):
+    session = session_for(request, profile)
+    return render_review(session)
+
+def grade_review(grade, profile=None, request: gr.Request = None):
+    """Reschedule the mistake on screen by the learner's grade, then show the next one."""
+    session = session_for(request, profile)
+    if session["review_item"] is not None and grade in GRADES:
+        review_queue_for(session).grade(session["review_item"], GRADES[grade])
+    return render_review(session)
+
+def new_challenge(profile=None, request: gr.Request = None):
+    """Start a challenge round from the bank; no LLM call is made."""
+    session = session_for(request, profile)
+    difficulty = session["level"].lower()
+    if not session["target_lang"] or not session["scene"] or difficulty not in CHALLENGE_DIFFICULTY_LEVELS:
+        return "Begin a practice session first, then come back for a challenge! 🎯"
+
+    current = session["current_challenge"]
+    challenge = challenge_bank.pick(session["target_lang"], difficulty, session["scene"],
+                                    exclude=current[0] if current else None)
+    if challenge is None:
+        return (f"No {session['target_lang']} challenges for {session['scene']} yet. "
+                f"Run generate_challenges.py to build the challenge bank.")
+    if not challenge_limiter.try_acquire(session["learner_id"]):
+        return f"You've done all {CHALLENGE_DAILY_LIMIT} challenges for today. Come back tomorrow! 🌙"
+
+    session["current_challenge"] = challenge
+    _, prompt, _, hint = challenge
+    text = (f"### 🏆 Challenge ({challenge_limiter.remaining(session['learner_id'])} left today)\n\n"
+            f"Say this in {session['target_lang']}: **{prompt}**")
+    if hint:
+        text += f"\n\n_Hint: {hint}_"
+    return text
+
+def submit_challenge(answer, profile=None, request: gr.Request = None):
+    """Check the answer to the current challenge; returns the result and clears the answer box."""
+    session = session_for(request, profile)
+    challenge = session["current_challenge"]
+    if challenge is None:
+        return "Press **New Challenge** to get one! 🏆", answer
+    session["current_challenge"] = None
+    expected = challenge[2]
+    if check_answer(answer, expected):
+        session["challenge_score"] += 1
+        result = f"✅ Correct! **{expected}**"
+    else:
+        result = f"❌ Not quite. A good answer is: **{expected}**"
+    return f"{result}\n\nChallenge score: {session['challenge_score']}", ""
+
+def build_demo():
+    """The Gradio Blocks UI with its event handlers and queue."""
+    with gr.Blocks(
+        title="Chatalyst - Your Language Learning Companion",
+        theme=gr.themes.Soft(
+            primary_hue="slate",
+            secondary_hue="gray",
+            neutral_hue="stone",
+            font=["sans-serif", "ui-sans-serif", "system-ui"]
+        ),
+        css="container"
+    ) as demo:
+        with gr.Row(equal_height=True):
+            with gr.Column(scale=1):
+                gr.Markdown(
+                    """
+                    <div style='text-align: center; padding: 2rem 0;'>
+                        <h1 style='font-size: 2.5rem; margin-bottom: 1rem;'>🌍 Chatalyst</h1>
+                        <p style='color: #94a3b8; font-size: 1.2rem;'>Your Smart Language Learning Companion</p>
+                    </div>
+                    """
+                )
     
-    with gr.Row(equal_height=True):
-        # Setup Section in left column
-        with gr.Column(scale=1):
-            with gr.Group():
-                gr.Markdown("### 🎯 Start Your Journey")
+        with gr.Row(equal_height=True):
+            # Setup Section in left column
+            with gr.Column(scale=1):
                 with gr.Group():
-                    known_input = gr.Textbox(
-                        label="Your Known Language",
-                        placeholder="e.g., English",
-                        info="The language you're comfortable with"
-                    )
-                    target_input = gr.Textbox(
-                        label="Target Language to Learn",
-                        placeholder="e.g., Spanish",
-                        info="The language you want to practice"
-                    )
-                    level_input = gr.Dropdown(
-                        choices=["Beginner", "Intermediate", "Advanced"],
-                        label="Your Level",
-                        value="Beginner",
-                        info="Select your proficiency level"
+                    gr.Markdown("### 🎯 Start Your Journey")
+                    with gr.Group():
+                        known_input = gr.Textbox(
+                            label="Your Known Language",
+                            placeholder="e.g., English",
+                            info="The language you're comfortable with"
+                        )
+                        target_input = gr.Textbox(
+                            label="Target Language to Learn",
+                            placeholder="e.g., Spanish",
+                            info="The language you want to practice"
+                        )
+                        level_input = gr.Dropdown(
+                            choices=["Beginner", "Intermediate", "Advanced"],
+                            label="Your Level",
+                            value="Beginner",
+                            info="Select your proficiency level"
+                        )
+                        scene_input = gr.Dropdown(
+                            choices=SCENE_OPTIONS["Beginner"],
+                            label="Select a Scene",
+                            info="Choose a conversation scenario"
+                        )
+                        start_btn = gr.Button(
+                            "Begin Practice",
+                            variant="primary",
+                            size="lg"
+                        )
+                    scene_output = gr.Markdown(
+                        label="Session Info",
+                        elem_classes=["session-info"]
                     )
-                    scene_input = gr.Dropdown(
-                        choices=SCENE_OPTIONS["Beginner"],
-                        label="Select a Scene",
-                        info="Choose a conversation scenario"
-                    )
-                    start_btn = gr.Button(
-                        "Begin Practice",
-                        variant="primary",
-                        size="lg"
-                    )
-                scene_output = gr.Markdown(
-                    label="Session Info",
-                    elem_classes=["session-info"]
-                )
         
-        # Chat Section in right column
-        with gr.Column(scale=2):
-            with gr.Group():
-                gr.Markdown("### 💬 Practice Conversation")
-                chatbot = gr.Chatbot(
-                    height=600,
-                    show_label=False,
-                    bubble_full_width=False,
-                    type="messages",
-                    elem_classes=["chatbot"],
-                    render=True,
-                    avatar_images=["👤", "🤖"]
-                )
-                with gr.Row():
-                    msg = gr.Textbox(
-                        label="",
-                        placeholder="Type your message here...",
+            # Chat Section in right column
+            with gr.Column(scale=2):
+                with gr.Group():
+                    gr.Markdown("### 💬 Practice Conversation")
+                    chatbot = gr.Chatbot(
+                        height=600,
                         show_label=False,
-                        container=False,
-                        scale=9,
-                        autofocus=True
-                    )
-                    send_btn = gr.Button(
-                        "Send",
-                        variant="primary",
-                        scale=1
+                        bubble_full_width=False,
+                        type="messages",
+                        elem_classes=["chatbot"],
+                        render=True,
+                        avatar_images=["👤", "🤖"]
                     )
-
-    # Learning Insights and Database View in expandable sections
-    with gr.Row():
-        with gr.Column():
-            with gr.Accordion("📊 Learning Insights", open=False):
-                insights = gr.Markdown()
-                refresh_insights = gr.Button("Refresh Insights")
+                    with gr.Row():
+                        msg = gr.Textbox(
+                            label="",
+                            placeholder="Type your message here...",
+                            show_label=False,
+                            container=False,
+                            scale=9,
+                            autofocus=True
+                        )
+                        send_btn = gr.Button(
+                            "Send",
+                            variant="primary",
+                            scale=1,
+                            elem_id="send-btn"
+                        )
+
+        # Learning Insights and Database View in expandable sections
+        with gr.Row():
+            with gr.Column():
+                with gr.Accordion("📊 Learning Insights", open=False):
+                    insights = gr.Markdown()
+                    refresh_insights = gr.Button("Refresh Insights")
             
-            with gr.Accordion("🔍 Database Contents", open=False):
-                db_viewer = gr.Markdown()
-                refresh_db = gr.Button("Refresh Database View")
-
-    state = gr.State([])
-
-    # Custom CSS
-    gr.Markdown("""
-    <style>
-        .gradio-container {
-            max-width: 1400px !important;
-            margin: 0 auto;
-            padding: 2rem;
-        }
+                with gr.Accordion("🔁 Review Mistakes", open=False):
+                    review_card = gr.Markdown()
+                    with gr.Row():
+                        review_grade = gr.Radio(
+                            choices=list(GRADES),
+                            value="Good",
+                            label="How well did you remember it?",
+                            scale=3
+                        )
+                        grade_btn = gr.Button("Next", variant="primary", scale=1)
+                    start_review_btn = gr.Button("Start Review")
+
+                with gr.Accordion("🏆 Challenge Mode", open=False):
+                    challenge_card = gr.Markdown()
+                    with gr.Row():
+                        challenge_answer = gr.Textbox(
+                            placeholder="Type your answer...",
+                            show_label=False,
+                            container=False,
+                            scale=3
+                        )
+                        submit_challenge_btn = gr.Button("Submit Answer", variant="primary", scale=1)
+                    new_challenge_btn = gr.Button("New Challenge")
+
+                with gr.Accordion("🔍 Database Contents", open=False):
+                    db_viewer = gr.Markdown()
+                    refresh_db = gr.Button("Refresh Database View")
+
+        state = gr.State([])
+        # Onboarding choices, kept by the tab itself so they outlive an evicted session
+        profile = gr.State({})
+        # Persistent per-browser id: history, reviews and the challenge allowance
+        # survive page reloads, which give the tab a new session hash
+        learner = gr.BrowserState("", storage_key="learner_id")
+
+        # Custom CSS
+        gr.Markdown("""
+        <style>
+            .gradio-container {
+                max-width: 1400px !important;
+                margin: 0 auto;
+                padding: 2rem;
+            }
         
-        .gr-group {
-            border: 1px solid #e2e8f0;
-            border-radius: 12px;
-            padding: 1.5rem;
-            margin: 1rem 0;
-            background: #ffffff;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-        }
+            .gr-group {
+                border: 1px solid #e2e8f0;
+                border-radius: 12px;
+                padding: 1.5rem;
+                margin: 1rem 0;
+                background: #ffffff;
+                box-shadow: 0 1px 3px rgba(0,0,0,0.1);
+            }
         
-        .session-info {
-            padding: 1.5rem;
-            background: #f8fafc;
-            border-radius: 12px;
-            margin: 1.5rem 0;
-            color: #475569;
-        }
+            .session-info {
+                padding: 1.5rem;
+                background: #f8fafc;
+                border-radius: 12px;
+                margin: 1.5rem 0;
+                color: #475569;
+            }
         
-        .chatbot {
-            min-height: 600px;
-            border: 1px solid #e2e8f0;
-            border-radius: 12px;
-            background: #f8fafc;
-            margin: 1.5rem 0;
-            padding: 1rem;
-        }
+            .chatbot {
+                min-height: 600px;
+                border: 1px solid #e2e8f0;
+                border-radius: 12px;
+                background: #f8fafc;
+                margin: 1.5rem 0;
+                padding: 1rem;
+            }
         
-        .gr-button-primary {
-            background: #475569 !important;
-            color: white !important;
-            padding: 0.75rem 1.5rem !important;
-            border-radius: 8px !important;
-        }
+            .gr-button-primary {
+                background: #475569 !important;
+                color: white !important;
+                padding: 0.75rem 1.5rem !important;
+                border-radius: 8px !important;
+            }
         
-        .gr-button-primary:hover {
-            background: #334155 !important;
-        }
+            .gr-button-primary:hover {
+                background: #334155 !important;
+            }
         
-        .gr-textbox, .gr-dropdown {
-            background: #f8fafc !important;
-            border-radius: 8px !important;
-            padding: 0.75rem !important;
-            margin: 0.5rem 0 !important;
-        }
+            .gr-textbox, .gr-dropdown {
+                background: #f8fafc !important;
+                border-radius: 8px !important;
+                padding: 0.75rem !important;
+                margin: 0.5rem 0 !important;
+            }
         
-        h1, h2, h3 {
-            color: #475569 !important;
-            margin: 1.5rem 0 1rem 0 !important;
-        }
+            h1, h2, h3 {
+                color: #475569 !important;
+                margin: 1.5rem 0 1rem 0 !important;
+            }
         
-        .gr-accordion {
-            margin: 1.5rem 0 !important;
-            border-radius: 12px !important;
-        }
+            .gr-accordion {
+                margin: 1.5rem 0 !important;
+                border-radius: 12px !important;
+            }
         
-        .gr-accordion-header {
-            padding: 1rem !important;
-        }
+            .gr-accordion-header {
+                padding: 1rem !important;
+            }
         
-        .database-content {
-            padding: 1.5rem;
-            background: #ffffff;
-            border-radius: 12px;
-            margin: 1rem 0;
-            line-height: 1.6;
-        }
+            .database-content {
+                padding: 1.5rem;
+                background: #ffffff;
+                border-radius: 12px;
+                margin: 1rem 0;
+                line-height: 1.6;
+            }
         
-        .database-section {
-            margin: 1.5rem 0;
-            padding: 1rem;
-            background: #f8fafc;
-            border-radius: 8px;
-        }
+            .database-section {
+                margin: 1.5rem 0;
+                padding: 1rem;
+                background: #f8fafc;
+                border-radius: 8px;
+            }
         
-        .database-entry {
-            margin: 1rem 0;
-            padding: 1rem;
-            border-left: 4px solid #475569;
-            background: #ffffff;
-        }
+            .database-entry {
+                margin: 1rem 0;
+                padding: 1rem;
+                border-left: 4px solid #475569;
+                background: #ffffff;
+            }
         
-        /* Add spacing between chat messages */
-        .message {
-            margin: 1rem 0 !important;
-            padding: 1rem !important;
-        }
-    </style>
-    """)
-
-    # Event Handlers
-    level_input.change(
-        fn=update_scene_options,
-        inputs=level_input,
-        outputs=scene_input
-    )
+            /* Add spacing between chat messages */
+            .message {
+                margin: 1rem 0 !important;
+                padding: 1rem !important;
+            }
+        </style>
+        """)
 
-    start_btn.click(
-        fn=setup_user,
-        inputs=[known_input, target_input, level_input, scene_input],
-        outputs=scene_output
-    )
+        # Event Handlers
+        level_input.change(
+            fn=update_scene_options,
+            inputs=level_input,
+            outputs=scene_input
+        )
 
-    send_btn.click(
-        fn=chat,
-        inputs=[msg, state],
-        outputs=[chatbot, state]
-    ).then(
-        lambda: "", None, msg
-    )
+        start_btn.click(
+            fn=setup_user,
+            inputs=[known_input, target_input, level_input, scene_input, profile],
+            outputs=[scene_output, profile]
+        )
 
-    refresh_insights.click(
-        fn=get_learning_insights,
-        outputs=insights
-    )
+        # One binding per message: the pipeline streams the reply and refreshes
+        # the database view itself once the turn is stored
+        send_btn.click(
+            fn=turn_pipeline.run,
+            inputs=[msg, state, profile],
+            outputs=[chatbot, state, db_viewer]
+        ).then(
+            lambda: "", None, msg
+        )
 
-    # Add event handler for database viewer
-    refresh_db.click(
-        fn=view_database_contents,
-        outputs=db_viewer
-    )
+        refresh_insights.click(
+            fn=get_learning_insights,
+            outputs=insights
+        )
 
-    # Update chat function to refresh database view after each message
-    def chat_with_db_update(user_input, history):
-        chat_result = chat(user_input, history)
-        db_contents = view_database_contents()
-        return chat_result[0], chat_result[1], db_contents
-
-    # Update the send button click handler
-    send_btn.click(
-        fn=chat_with_db_update,
-        inputs=[msg, state],
-        outputs=[chatbot, state, db_viewer]
-    ).then(
-        lambda: "", None, msg
-    )
+        start_review_btn.click(
+            fn=show_review,
+            inputs=profile,
+            outputs=review_card
+        )
 
-# Launch UI
-if __name__ == "__main__":
+        grade_btn.click(
+            fn=grade_review,
+            inputs=[review_grade, profile],
+            outputs=review_card
+        )
+
+        new_challenge_btn.click(
+            fn=new_challenge,
+            inputs=profile,
+            outputs=challenge_card
+        )
+
+        submit_challenge_btn.click(
+            fn=submit_challenge,
+            inputs=[challenge_answer, profile],
+            outputs=[challenge_card, challenge_answer]
+        )
+
+        # Add event handler for database viewer
+        refresh_db.click(
+            fn=view_database_contents,
+            outputs=db_viewer
+        )
+
+        # Free the session's state as soon as the browser tab goes away
+        def end_session(request: gr.Request):
+            sessions.discard(session_id_for(request))
+
+        demo.load(assign_learner, inputs=[learner, profile], outputs=[learner, profile])
+        demo.unload(end_session)
+
+    # Chat handlers are async and spend their time waiting on the LLM, so many
+    # learners' turns can share the event loop instead of queueing behind one
+    demo.queue(default_concurrency_limit=QUEUE_CONCURRENCY_LIMIT, max_size=QUEUE_MAX_SIZE)
+    return demo
+
+async def metrics_endpoint(request):
+    """Prometheus scrape target: stage latency histograms, counters and gauges."""
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def metrics_routes():
+    """Routes served by the same app as the UI, ahead of Gradio's own."""
+    from starlette.routing import Route
+    return [Route("/metrics", metrics_endpoint)]
+
+demo = None
+_app_lock = threading.Lock()
+
+def create_app():
+    """Do the startup work once and return the Gradio Blocks app.
+
+    Checks the sentiment corpora offline, brings the schema up to date
+    (a version check when it already is) and builds the UI. Later calls
+    return the same app.
+    """
+    global demo
+    with _app_lock:
+        if demo is None:
+            configure_logging()
+            start = time.perf_counter()
+            missing = missing_corpora()
+            if missing:
+                raise RuntimeError(f"missing corpora: {', '.join(missing)}; run python download_nltk_data.py")
+            schema_version = storage.migrate()
+            response_cache.prune()  # expired replies left by earlier runs
+            demo = build_demo()
+            log.info("app_created", extra=fields(
+                schema_version=schema_version, duration_ms=round((time.perf_counter() - start) * 1000, 1)
+            ))
+    return demo
+
+def warm_up():
+    """Load the sentiment backend, which is imported on first use, ahead of the first turn."""
+    start = time.perf_counter()
+    analyze_sentiment("warm up")
+    log.info("warm_up_done", extra=fields(duration_ms=round((time.perf_counter() - start) * 1000, 1)))
+
+def serve(host=SERVER_HOST, port=SERVER_PORT):
+    app = create_app()
     try:
-        print("Starting Chatalyst server...")
-        demo.launch(
-            server_name="127.0.0.1",  # Use localhost explicitly
-            server_port=8080,         # Use port 8080 instead
+        log.info("server_starting", extra=fields(host=host, port=port))
+        app.launch(
+            server_name=host,
+            server_port=port,
             share=False,              # Don't create a public link
             show_error=True,          # Show detailed errors
-            debug=True,               # Enable debug mode
+            prevent_thread_lock=True, # Return once serving, to warm up below
             auth=None,                # No authentication required
             root_path="",             # No root path
             ssl_keyfile=None,         # No SSL
             ssl_certfile=None,        # No SSL
             ssl_keyfile_password=None, # No SSL password
-            show_api=False            # Don't show API documentation
+            show_api=False,           # Don't show API documentation
+            app_kwargs={"routes": metrics_routes()}  # Prometheus metrics at /metrics
         )
-    except Exception as e:
-        print(f"Error starting server: {str(e)}")
-        print("Please check if port 8080 is available and not blocked by your firewall.") 
-        
\ No newline at end of file
+    except Exception:
+        log.exception("server_start_failed", extra=fields(
+            port=port, hint=f"check that port {port} is available and not blocked by your firewall"
+        ))
+        return
+    # Ready now; load the lazily imported backends while waiting for learners
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    app.block_thread()
+
+# Launch UI
+if __name__ == "__main__":
+    serve()
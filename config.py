@@ -2,13 +2,122 @@
 
 # Database settings
 DATABASE_PATH = "language_chatbot.db"
+DB_POOL_SIZE = 8  # Connections shared by all request handlers
+DB_BUSY_TIMEOUT = 5000  # Milliseconds a writer waits for a lock before failing
+DB_CACHE_SIZE_KB = 16000  # Page cache per connection
+DB_MMAP_SIZE = 268435456  # Bytes of the database file memory-mapped for reads
+WRITE_QUEUE_SIZE = 10000  # Turns waiting for the background writer before callers write directly
+WRITE_BATCH_SIZE = 200  # Turns committed per transaction at most
+WRITE_FLUSH_INTERVAL = 0.05  # Seconds the writer waits to fill a batch
 
 # API settings
 OPENROUTER_API_KEY = "API key here"
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_MODEL = "mistralai/mistral-7b-instruct"
+
+# LLM backends: "openrouter", "local" (any OpenAI-compatible server) or
+# "offline" (template replies, no network). Requests go to the listed
+# backend with the lowest recent median latency; the others are fallbacks.
+LLM_BACKENDS = ["openrouter"]
+LLM_FALLBACK_BACKEND = None  # Tried after every listed backend has failed, e.g. "offline"
+LLM_ROUTE_WINDOW = 50  # Recent requests per backend that latency routing looks at
+LLM_ROUTE_EXPLORE = 0.05  # Share of requests sent to a slower backend to keep its latency current
+LOCAL_LLM_URL = "http://localhost:11434/v1/chat/completions"  # e.g. Ollama, vLLM or llama.cpp server
+LOCAL_LLM_MODEL = "mistral"
+LOCAL_LLM_API_KEY = ""  # Sent as a bearer token when set
+
+# LLM client settings
+LLM_CONNECT_TIMEOUT = 5  # Seconds to open a connection to the provider
+LLM_READ_TIMEOUT = 30  # Seconds to wait for the next chunk of a reply
+LLM_MAX_CONNECTIONS = 128  # Upper bound on concurrent upstream connections
+LLM_POOL_SIZE = 16  # Connections per pooled client; the pool is sharded beyond this
+LLM_KEEPALIVE_EXPIRY = 60  # Seconds an idle connection stays in the pool
+LLM_BACKOFF_CAP = 8  # Maximum seconds to wait between retries
+LLM_RETRY_AFTER_CAP = 10  # Longest Retry-After (seconds) waited out before failing the turn
+LLM_MAX_IN_FLIGHT = 128  # Upstream requests in progress at once across all users
+LLM_RATE_LIMIT = 0  # Upstream requests per second, e.g. the account's quota; 0 disables
+LLM_RATE_BURST = 20  # Requests sent back to back before the rate limit applies
+LLM_COALESCE_REQUESTS = True  # Identical concurrent prompts share one upstream request
+STREAM_RESPONSES = True  # Stream tokens into the chat as they arrive
+
+# Circuit breaker around upstream calls
+LLM_BREAKER_ENABLED = True  # Fail turns at once while the provider is down
+LLM_BREAKER_FAILURE_RATE = 0.5  # Share of recent calls failing that opens the circuit
+LLM_BREAKER_WINDOW = 20  # Recent calls the failure rate is measured over
+LLM_BREAKER_MIN_CALLS = 5  # Calls needed in the window before the circuit can open
+LLM_BREAKER_RESET_TIMEOUT = 15  # Seconds the circuit stays open before a trial call
+
+# Session settings
+SESSION_MAX_COUNT = 10000  # Sessions held in memory before the least recent is evicted
+SESSION_IDLE_TIMEOUT = 1800  # Seconds of inactivity before a session is evicted
+CONTEXT_TOKEN_BUDGET = 400  # Tokens of recent turns sent verbatim with each prompt
+CONTEXT_MAX_TURNS = 20  # Turns kept in a session's in-memory window
+CONTEXT_MESSAGE_TOKENS = 80  # Each earlier message is cut to this many tokens in the prompt
+CONTEXT_SUMMARY_TOKENS = 150  # Running summary of the turns older than the verbatim window
+
+# Server settings
+SERVER_HOST = "127.0.0.1"  # Use localhost explicitly
+SERVER_PORT = 8080  # Use port 8080 instead
+
+# Gradio queue settings
+QUEUE_CONCURRENCY_LIMIT = 64  # Events each handler runs at once; Gradio's default of 1 serializes every chat turn
+QUEUE_MAX_SIZE = None  # Events waiting in the queue before new ones are refused, None for no limit
+
+# Prompt template settings
+PROMPT_PRELOAD_LANGUAGES = ["Spanish", "French", "German", "Italian", "Portuguese", "Japanese"]  # Prefixes built at startup
+PROMPT_CACHE_SIZE = 1024  # System-message prefixes kept, including ones for other languages
+
+# Response cache settings
+RESPONSE_CACHE_SIZE = 2048  # Replies kept in memory, least recently used evicted first
+RESPONSE_CACHE_TTL = 3600  # Seconds a cached reply stays valid
+RESPONSE_CACHE_PERSIST = False  # Also keep cached replies in the database
+RESPONSE_CACHE_PRUNE_INTERVAL = 500  # Stored replies between deletions of expired rows from the database
+
+# Mistake detection settings
+# Extra keywords per mistake category, merged into the built-in ones in
+# mistakes.py; new categories rank below the built-in ones.
+# e.g. {"spelling": ["spelling", "misspelled", "typo"]}
+MISTAKE_KEYWORDS_EXTRA = {}
+
+# Review mode settings (SM-2 spaced repetition over stored mistakes)
+REVIEW_BATCH_SIZE = 5  # Due mistakes listed in the review panel
+REVIEW_RELEARN_INTERVAL = 600  # Seconds before a mistake graded "Again" comes back
+REVIEW_FIRST_INTERVAL = 86400  # Seconds until the review after the first correct answer
+REVIEW_SECOND_INTERVAL = 518400  # Seconds until the review after the second in a row
+REVIEW_MIN_EASE = 1.3
+REVIEW_MASTERED_INTERVAL = 1814400  # A mistake counts as mastered once its interval reaches 21 days
+
+# Scene options for each level
+SCENE_OPTIONS = {
+    "Beginner": ["ordering food at a restaurant", "greeting someone", "asking for directions"],
+    "Intermediate": ["booking a hotel", "visiting a doctor", "chatting with a local"],
+    "Advanced": ["debating social issues", "job interview", "discussing politics"]
+}
 
 # Challenge mode settings
-CHALLENGE_DAILY_LIMIT = 5
+CHALLENGE_DAILY_LIMIT = 5  # Challenge rounds each learner can start per day
 CHALLENGE_DIFFICULTY_LEVELS = ["beginner", "intermediate", "advanced"]
+CHALLENGE_BANK_SIZE = 20  # Challenges generated per (language, difficulty, scene)
+CHALLENGE_GENERATION_CONCURRENCY = 4  # Generation requests sent to the LLM at once
+CHALLENGE_MATCH_RATIO = 0.85  # Similarity to the expected answer that still counts as correct
+
+# Backfill settings (backfill.py)
+BACKFILL_CHUNK_SIZE = 5000  # Chats read, analyzed and written back per transaction
+BACKFILL_CHECKPOINT = "backfill_checkpoint.json"  # Last committed chat id, for resuming
+BACKFILL_PROGRESS_INTERVAL = 5  # Seconds between progress lines
+
+# Export settings (export.py)
+EXPORT_CHUNK_SIZE = 10000  # Rows per read, per columnar row group and per import transaction
+EXPORT_COMPRESSION_LEVEL = 6  # zlib level for columnar and .gz exports
+EXPORT_DICTIONARY_COLUMNS = ("session_id", "scene", "mistake_type", "explanation", "context")  # Few distinct values
+EXPORT_WATERMARK = "export_watermark.json"  # Where each table's last export stopped, for incremental exports
+EXPORT_WATERMARK_LAG = 60  # Seconds re-exported by the next incremental run, covering turns still being written
+
+# Logging settings
+LOG_LEVEL = "INFO"
+LOG_FORMAT = "json"  # "json" for one object per line, "text" for plain lines
 
 # Sentiment analysis settings
-SENTIMENT_THRESHOLD = 0.2  # Threshold for determining positive/negative sentiment 
\ No newline at end of file
+SENTIMENT_THRESHOLD = 0.2  # Threshold for determining positive/negative sentiment 
+SENTIMENT_CACHE_SIZE = 4096  # Distinct messages whose scores are memoized
+NLTK_RESOURCES = ()  # NLTK data checked for at startup, e.g. "tokenizers/punkt"; the polarity lexicon ships with textblob
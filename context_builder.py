@@ -0,0 +1,86 @@
+# context_builder.py
+
+import re
+from collections import deque
+
+from config import CONTEXT_SUMMARY_TOKENS
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+# Per-exchange limits for summary lines
+SUMMARY_INPUT_TOKENS = 12
+SUMMARY_REPLY_TOKENS = 20
+
+def estimate_tokens(text):
+    """Rough token count (words and punctuation marks) used for context budgeting."""
+    return len(TOKEN_PATTERN.findall(text))
+
+def truncate_tokens(text, limit):
+    """Cut text after its first limit tokens, marking the cut with an ellipsis."""
+    for count, match in enumerate(TOKEN_PATTERN.finditer(text), 1):
+        if count == limit:
+            end = match.end()
+            return text if not text[end:].strip() else text[:end] + "…"
+    return text
+
+def lead_sentences(text, min_tokens=8):
+    """Opening sentences of text, enough to reach min_tokens ("Muy bien!" alone says little)."""
+    sentences = SENTENCE_END.split(text.strip())
+    lead = sentences[0]
+    for sentence in sentences[1:]:
+        if estimate_tokens(lead) >= min_tokens:
+            break
+        lead += " " + sentence
+    return lead
+
+class RunningSummary:
+    """Compact digest of exchanges that no longer fit in the verbatim window.
+
+    Each exchange becomes one short line: the learner's words and the
+    opening of the reply. Lines are kept within max_tokens, and the oldest
+    are dropped first, so the summary costs a fixed prompt budget however
+    long the conversation runs.
+    """
+
+    def __init__(self, max_tokens=CONTEXT_SUMMARY_TOKENS):
+        self.max_tokens = max_tokens
+        self._lines = deque()  # (line, tokens)
+        self._tokens = 0
+        self.exchanges = 0
+
+    def add(self, user_input, bot_response):
+        line = (f'- "{truncate_tokens(user_input, SUMMARY_INPUT_TOKENS)}" -> '
+                f"{truncate_tokens(lead_sentences(bot_response), SUMMARY_REPLY_TOKENS)}")
+        tokens = estimate_tokens(line)
+        self._lines.append((line, tokens))
+        self._tokens += tokens
+        self.exchanges += 1
+        while self._tokens > self.max_tokens and self._lines:
+            self._tokens -= self._lines.popleft()[1]
+
+    def text(self):
+        if not self._lines:
+            return ""
+        return f"Summary of earlier conversation ({self.exchanges} exchanges):\n" + "\n".join(
+            line for line, _ in self._lines
+        )
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+    def __bool__(self):
+        return bool(self._lines)
+
+def build_context_prompt(window):
+    """Context block for the system message: running summary, then recent turns verbatim."""
+    parts = []
+    if window.summary:
+        parts.append(window.summary.text() + "\n\n")
+    turns = window.turns()
+    if turns:
+        parts.append("Previous conversation:\n" + "\n".join(
+            f"User: {user_input}\nAssistant: {bot_response}" for user_input, bot_response in turns
+        ) + "\n\n")
+    return "".join(parts)
@@ -0,0 +1,125 @@
+# dashboard.py
+
+import html
+import threading
+from datetime import datetime
+
+MISTAKE_COLORS = {
+    "grammar": "#4f46e5",
+    "vocabulary": "#059669",
+    "pronunciation": "#db2777",
+    "cultural": "#9333ea",
+    "general": "#475569"
+}
+
+HEADER = """
+        <div style="padding: 20px; background: white; border-radius: 15px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
+            <h3 style="color: #1f2937; font-size: 1.5rem; margin-bottom: 20px;">
+                🎯 Your Learning Progress
+            </h3>
+            <div style="display: flex; flex-wrap: wrap; gap: 15px;">
+        """
+
+CARD = """
+                <div style="background: {color}; color: white; padding: 15px; border-radius: 12px; flex: 1 1 150px; text-align: center;">
+                    <h4 style="margin: 0;">{mistake_type}</h4>
+                    <p style="margin: 0;">{count} {unit}</p>
+                </div>
+            """
+
+TABLE_START = """
+            </div>
+        </div>
+        <div style="margin-top: 30px;">
+            <h3 style="color: #1f2937; font-size: 1.5rem; margin-bottom: 20px;">
+                💡 Recent Learning Opportunities
+            </h3>
+            <table style="width: 100%; border-collapse: collapse;">
+                <thead>
+                    <tr style="background: #f8fafc;">
+                        <th style="padding: 10px; border: 1px solid #e5e7eb;">You Said</th>
+                        <th style="padding: 10px; border: 1px solid #e5e7eb;">Correction</th>
+                        <th style="padding: 10px; border: 1px solid #e5e7eb;">Mistake Type</th>
+                        <th style="padding: 10px; border: 1px solid #e5e7eb;">Timestamp</th>
+                    </tr>
+                </thead>
+                <tbody>
+        """
+
+EMPTY_ROW = """
+                <tr>
+                    <td colspan="4" style="padding: 10px; border: 1px solid #e5e7eb; text-align: center;">No recent mistakes recorded.</td>
+                </tr>
+            """
+
+ROW = """
+                    <tr>
+                        <td style="padding: 10px; border: 1px solid #e5e7eb;">{user_input}</td>
+                        <td style="padding: 10px; border: 1px solid #e5e7eb;">{correction}</td>
+                        <td style="padding: 10px; border: 1px solid #e5e7eb;">{mistake_type}</td>
+                        <td style="padding: 10px; border: 1px solid #e5e7eb;">{timestamp}</td>
+                    </tr>
+                """
+
+TABLE_END = """
+                </tbody>
+            </table>
+        </div>
+        </div>
+        """
+
+ERROR = """
+        <div style="padding: 20px; background: white; border-radius: 15px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
+            <p style="color: #dc2626;">Unable to load learning progress. Please try again.</p>
+        </div>
+        """
+
+def render_dashboard(mistake_stats, recent_mistakes):
+    """Build the progress dashboard HTML; stored text is escaped before it is embedded."""
+    parts = [HEADER]
+    for mistake_type, count, _ in mistake_stats:
+        parts.append(CARD.format(
+            color=MISTAKE_COLORS.get(mistake_type.lower(), "#475569"),
+            mistake_type=html.escape(mistake_type.title()),
+            count=count,
+            unit="time" if count == 1 else "times"
+        ))
+    parts.append(TABLE_START)
+    if not recent_mistakes:
+        parts.append(EMPTY_ROW)
+    for user_input, correction, mistake_type, timestamp in recent_mistakes:
+        parts.append(ROW.format(
+            user_input=html.escape(user_input or ""),
+            correction=html.escape(correction or ""),
+            mistake_type=html.escape(mistake_type.title()),
+            timestamp=datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        ))
+    parts.append(TABLE_END)
+    return "".join(parts)
+
+class DashboardRenderer:
+    """Serves the rendered dashboard from cache until the mistakes data changes.
+
+    Triggers bump store.mistakes_version whenever mistake rows change, in
+    this process or any other (another worker, backfill.py, an import). A
+    refresh with an unchanged version costs one read and no rendering.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._version = None
+        self._html = None
+        self.renders = 0
+
+    def render(self):
+        version = self.store.mistakes_version
+        with self._lock:
+            if version == self._version:
+                return self._html
+        output = render_dashboard(self.store.mistake_stats(), self.store.recent_mistakes(5))
+        with self._lock:
+            self._version = version
+            self._html = output
+            self.renders += 1
+        return output
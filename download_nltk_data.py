@@ -1,6 +1,22 @@
+# download_nltk_data.py
+
+"""Download the NLTK data listed in config.NLTK_RESOURCES that isn't installed.
+
+The app checks for these offline at startup. Sentiment scoring only needs
+the lexicon bundled with textblob, so with the default empty list there is
+nothing to fetch.
+Usage: python download_nltk_data.py
+"""
+
 import nltk
 
-# Download required NLTK data
-nltk.download('punkt')
-nltk.download('averaged_perceptron_tagger')
-nltk.download('wordnet') 
\ No newline at end of file
+from config import NLTK_RESOURCES
+from sentiment import missing_corpora
+
+if __name__ == "__main__":
+    missing = missing_corpora()
+    for resource in missing:
+        if resource in NLTK_RESOURCES:
+            nltk.download(resource.rsplit("/", 1)[-1])
+    still_missing = missing_corpora()
+    print("All corpora are installed." if not still_missing else f"Still missing: {', '.join(still_missing)}")
@@ -0,0 +1,291 @@
+# export.py
+
+"""Export and import learner history: chats, mistakes and user_progress.
+
+Rows are streamed a chunk at a time in both directions, so memory stays
+flat however large the tables are. Two formats are supported:
+- JSON Lines (.jsonl, or .jsonl.gz for gzip), one row object per line
+- columnar (.lcol): each chunk of a table is stored column by column.
+  Integers are delta-encoded, so ids and timestamps shrink to small
+  numbers. Columns with few distinct values (scene, mistake_type, ...)
+  are dictionary-encoded, and every chunk is zlib-compressed.
+
+Incremental exports keep a watermark file holding where each table's
+last export stopped; the next run only exports rows written from there
+on, by their updated_at, so rows changed in place (review progress,
+backfilled sentiment, ...) go out again along with new ones. The last
+EXPORT_WATERMARK_LAG seconds are exported again, in case turns were
+still being written. Importing updates rows that are already stored, so
+the overlap is harmless.
+
+Rows keep their ids, so an export is only imported into the database it
+came from, a copy built by importing it into an empty database, or an
+empty database. Anything else would overwrite unrelated rows that happen
+to share ids, and is refused.
+Usage: python export.py export history.lcol [--tables chats mistakes] [--since EPOCH] [--watermark]
+       python export.py import history.lcol [--database language_chatbot.db]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+from config import (
+    DATABASE_PATH, EXPORT_CHUNK_SIZE, EXPORT_COMPRESSION_LEVEL, EXPORT_DICTIONARY_COLUMNS, EXPORT_WATERMARK,
+    EXPORT_WATERMARK_LAG
+)
+from migrations import LATEST_VERSION
+from storage import HISTORY_TABLES, Storage
+
+COLUMNAR_MAGIC = b"LCOL1\n"
+FRAME_LENGTH = struct.Struct("<I")
+
+def export_format(path):
+    if path.endswith(".lcol"):
+        return "columnar"
+    if path.endswith((".jsonl", ".jsonl.gz")):
+        return "jsonl"
+    raise ValueError(f"can't tell the format of {path}; use .lcol, .jsonl or .jsonl.gz")
+
+def _to_bytes(values):
+    # Buffers are little-endian on disk, whatever the machine
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+def _from_bytes(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def encode_column(name, values, dictionary_columns=EXPORT_DICTIONARY_COLUMNS):
+    """(description, buffer) for one column of a chunk."""
+    if name in dictionary_columns:
+        dictionary = list(dict.fromkeys(values))
+        codes = {value: code for code, value in enumerate(dictionary)}
+        typecode = "B" if len(dictionary) <= 0xFF else "H" if len(dictionary) <= 0xFFFF else "I"
+        return {"name": name, "encoding": "dictionary", "dictionary": dictionary, "typecode": typecode}, \
+            _to_bytes(array(typecode, [codes[value] for value in values]))
+    if all(type(value) is int for value in values):
+        try:
+            deltas = array("q", [values[0]] + [b - a for a, b in zip(values, values[1:])])
+        except OverflowError:
+            pass
+        else:
+            return {"name": name, "encoding": "delta"}, _to_bytes(deltas)
+    if all(type(value) is float for value in values):
+        return {"name": name, "encoding": "float"}, _to_bytes(array("d", values))
+    return {"name": name, "encoding": "json"}, json.dumps(values, ensure_ascii=False).encode()
+
+def decode_column(description, data):
+    encoding = description["encoding"]
+    if encoding == "dictionary":
+        dictionary = description["dictionary"]
+        return [dictionary[code] for code in _from_bytes(description["typecode"], data)]
+    if encoding == "delta":
+        values, total = [], 0
+        for delta in _from_bytes("q", data):
+            total += delta
+            values.append(total)
+        return values
+    if encoding == "float":
+        return _from_bytes("d", data).tolist()
+    if encoding == "json":
+        return json.loads(data)
+    raise ValueError(f"unknown column encoding: {encoding}")
+
+class ColumnarWriter:
+    """Writes frames: a length-prefixed, zlib-compressed JSON header plus column buffers."""
+
+    def __init__(self, file, level=EXPORT_COMPRESSION_LEVEL):
+        self.file = file
+        self.level = level
+        file.write(COLUMNAR_MAGIC)
+
+    def _frame(self, header, buffers=()):
+        header = json.dumps(header, ensure_ascii=False).encode()
+        frame = zlib.compress(FRAME_LENGTH.pack(len(header)) + header + b"".join(buffers), self.level)
+        self.file.write(FRAME_LENGTH.pack(len(frame)) + frame)
+
+    def begin(self, info):
+        self._frame(info)
+
+    def write(self, table, columns, rows):
+        descriptions, buffers = [], []
+        for name, values in zip(columns, zip(*rows)):
+            description, buffer = encode_column(name, values)
+            description["size"] = len(buffer)
+            descriptions.append(description)
+            buffers.append(buffer)
+        self._frame({"table": table, "rows": len(rows), "columns": descriptions}, buffers)
+
+class JsonlWriter:
+    def __init__(self, file):
+        self.file = file
+
+    def begin(self, info):
+        self.file.write(json.dumps(info, ensure_ascii=False) + "\n")
+
+    def write(self, table, columns, rows):
+        self.file.writelines(
+            json.dumps({"table": table, "row": dict(zip(columns, row))}, ensure_ascii=False) + "\n" for row in rows
+        )
+
+def read_columnar(file):
+    """Yield the file info, then a (table, columns, rows) batch per frame."""
+    if file.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("not a columnar export")
+    first = True
+    while True:
+        prefix = file.read(FRAME_LENGTH.size)
+        if not prefix:
+            return
+        payload = zlib.decompress(file.read(FRAME_LENGTH.unpack(prefix)[0]))
+        header_size = FRAME_LENGTH.unpack_from(payload)[0]
+        offset = FRAME_LENGTH.size + header_size
+        header = json.loads(payload[FRAME_LENGTH.size:offset])
+        if first:
+            first = False
+            yield header
+            continue
+        columns, values = [], []
+        for description in header["columns"]:
+            columns.append(description["name"])
+            values.append(decode_column(description, payload[offset:offset + description["size"]]))
+            offset += description["size"]
+        yield header["table"], tuple(columns), list(zip(*values))
+
+def read_jsonl(file, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the file info, then (table, columns, rows) batches of consecutive rows."""
+    yield json.loads(file.readline())
+    table, columns, rows = None, None, []
+    for line in file:
+        item = json.loads(line)
+        row = item["row"]
+        if item["table"] != table or tuple(row) != columns or len(rows) >= chunk_size:
+            if rows:
+                yield table, columns, rows
+            table, columns, rows = item["table"], tuple(row), []
+        rows.append(tuple(row.values()))
+    if rows:
+        yield table, columns, rows
+
+def open_export(path, mode):
+    """The file for an export path: binary for columnar, text (gzipped for .gz) for JSON Lines."""
+    if export_format(path) == "columnar":
+        return open(path, mode + "b")
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=EXPORT_COMPRESSION_LEVEL)
+    return open(path, mode, encoding="utf-8")
+
+def load_watermarks(path):
+    try:
+        with open(path) as watermarks:
+            return json.load(watermarks)
+    except FileNotFoundError:
+        return {}
+
+def save_watermarks(path, watermarks):
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump(watermarks, file)
+    os.replace(temporary, path)
+
+def export_history(store, path, tables=tuple(HISTORY_TABLES), since=None, chunk_size=EXPORT_CHUNK_SIZE, now=None):
+    """Stream tables to path and return {table: (rows exported, next watermark)}.
+
+    since maps each table to the lowest value of its HISTORY_TABLES column
+    to export; tables not in it are exported in full. The file is written
+    under a temporary name and renamed when complete, so a failed export
+    never leaves a truncated file behind. The source database is only read:
+    one that isn't migrated yet is refused rather than migrated.
+    """
+    since = since or {}
+    schema = store.schema_version()
+    if schema < LATEST_VERSION:
+        # Older schemas hold rows in older shapes (text timestamps, no session_id, ...)
+        raise ValueError(f"exports need schema version {LATEST_VERSION} (this database has {schema}); "
+                         "start the app once to migrate it")
+    started = now or time.time()
+    directory, name = os.path.split(path)
+    temporary = os.path.join(directory, ".partial-" + name)  # keeps the extension, which sets the format
+    exported = {}
+    with open_export(temporary, "w") as file:
+        writer = ColumnarWriter(file) if export_format(path) == "columnar" else JsonlWriter(file)
+        writer.begin({"schema": schema, "database": store.database_info("database_id"), "exported_at": int(started),
+                      "since": since})
+        for table in tables:
+            columns = store.history_columns(table)
+            column = columns.index(HISTORY_TABLES[table])
+            count, highest = 0, None
+            for rows in store.history_rows(table, since.get(table), chunk_size):
+                writer.write(table, columns, rows)
+                count += len(rows)
+                highest = max((row[column] for row in rows if row[column] is not None), default=highest)
+            if highest is not None:
+                # Rows stamped just before the export may not have been committed yet
+                highest = min(highest, int(started) - EXPORT_WATERMARK_LAG)
+            if since.get(table) is not None:
+                highest = since[table] if highest is None else max(highest, since[table])
+            exported[table] = (count, highest)
+    os.replace(temporary, path)
+    return exported
+
+def import_history(store, path):
+    """Load an export into store; returns {table: rows imported}."""
+    imported = {}
+    with open_export(path, "r") as file:
+        batches = read_columnar(file) if export_format(path) == "columnar" else read_jsonl(file)
+        info = next(batches)
+        if info.get("schema", 0) > store.migrate():
+            raise ValueError(f"{path} was exported from a newer schema (version {info['schema']})")
+        source = info.get("database")
+        if source is None or source not in (store.database_info("database_id"), store.database_info("imported_from")):
+            if not store.history_empty():
+                raise ValueError(f"{path} comes from another database, and its ids would overwrite unrelated rows; "
+                                 "import it into an empty database or the one it was exported from")
+            if source is not None:
+                store.set_database_info("imported_from", source)
+        for table, columns, rows in batches:
+            imported[table] = imported.get(table, 0) + store.import_history(table, columns, rows)
+    return imported
+
+def report(action, counts, elapsed):
+    rows = sum(counts.values())
+    print(f"{action} {rows:,} rows in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s): "
+          + ", ".join(f"{table} {count:,}" for table, count in counts.items()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import chats, mistakes and user_progress.")
+    parser.add_argument("action", choices=("export", "import"))
+    parser.add_argument("path", help="a .lcol (columnar), .jsonl or .jsonl.gz file")
+    parser.add_argument("--database", default=DATABASE_PATH)
+    parser.add_argument("--tables", nargs="+", default=list(HISTORY_TABLES), choices=list(HISTORY_TABLES))
+    parser.add_argument("--since", type=int, help="only export rows added or changed from this Unix time on")
+    parser.add_argument("--watermark", nargs="?", const=EXPORT_WATERMARK,
+                        help=f"export only rows added or changed since the last run recorded here "
+                             f"(default {EXPORT_WATERMARK})")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    store = Storage(args.database)
+    start = time.perf_counter()
+    if args.action == "import":
+        report("imported", import_history(store, args.path), time.perf_counter() - start)
+    else:
+        watermarks = load_watermarks(args.watermark) if args.watermark else {}
+        since = {table: watermarks.get(table, args.since) for table in args.tables}
+        exported = export_history(store, args.path, args.tables,
+                                  {table: value for table, value in since.items() if value is not None}, args.chunk_size)
+        report("exported", {table: count for table, (count, _) in exported.items()}, time.perf_counter() - start)
+        if args.watermark:
+            watermarks.update({table: highest for table, (_, highest) in exported.items() if highest is not None})
+            save_watermarks(args.watermark, watermarks)
@@ -0,0 +1,206 @@
+# flow_control.py
+
+import asyncio
+import time
+from collections import deque
+
+class TokenBucket:
+    """Async rate limiter allowing rate acquisitions per second, in bursts of up to burst.
+
+    Callers reserve a token up front and sleep off any deficit, so waiters
+    are released in arrival order without a lock. A rate of 0 disables
+    limiting.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self.waits = 0
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        if self._tokens < 0:
+            self.waits += 1
+            try:
+                await asyncio.sleep(-self._tokens / self.rate)
+            except asyncio.CancelledError:
+                # Hand the reserved token back to later callers
+                self._tokens += 1
+                raise
+
+class _Flight:
+    """Chunks produced so far by one shared upstream stream."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Event()
+        self.subscribers = 0
+        self.task = None
+
+    def notify(self):
+        # Waiters hold the old event; later waits use a fresh one
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+class SingleFlight:
+    """Shares one in-flight call among concurrent callers with the same key.
+
+    call() shares an awaited result; stream() replays an async generator's
+    items to every subscriber, including ones that join mid-stream. A shared
+    stream is cancelled once its last subscriber goes away. Keys are only
+    held while their call is running, so nothing is cached afterwards.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._flights = {}
+        self.coalesced = 0
+
+    async def call(self, key, factory):
+        """Await factory(), or the call already running for key."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._release(self._calls, key, done))
+        else:
+            self.coalesced += 1
+        # A cancelled caller must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def stream(self, key, factory):
+        """Yield the items of factory(), or of the stream already running for key."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.ensure_future(self._pump(key, flight, factory()))
+        else:
+            self.coalesced += 1
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                elif flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                else:
+                    await flight.changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if not flight.subscribers and not flight.done:
+                self._release(self._flights, key, flight)
+                flight.task.cancel()
+
+    async def _pump(self, key, flight, chunks):
+        try:
+            async for chunk in chunks:
+                flight.chunks.append(chunk)
+                flight.notify()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._release(self._flights, key, flight)
+            flight.notify()
+
+    @staticmethod
+    def _release(running, key, value):
+        if running.get(key) is value:
+            del running[key]
+
+    def in_flight(self):
+        return len(self._calls) + len(self._flights)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+    def __init__(self, retry_in):
+        super().__init__(f"circuit open, next trial in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by the failure rate of recent calls.
+
+    While closed, the outcomes of the last window calls are kept; once at
+    least min_calls are in and failure_rate of them failed, the circuit
+    opens and allow() refuses calls for reset_timeout seconds. Then a single
+    trial call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_rate, window, min_calls, reset_timeout):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)  # True for failures
+        self._open_until = 0.0
+        self._trial_running = False
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self):
+        """Return True if a call may go upstream now."""
+        if self.state == self.OPEN:
+            if time.monotonic() < self._open_until:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._trial_running:
+                self.rejected += 1
+                return False
+            self._trial_running = True
+        return True
+
+    def record(self, success):
+        """Report the outcome of a call that allow() let through."""
+        if self.state == self.OPEN:
+            # Calls that were already running when the circuit opened
+            return
+        if self.state == self.HALF_OPEN:
+            self._trial_running = False
+            if success:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            else:
+                self.trip()
+            return
+        self._outcomes.append(not success)
+        if (len(self._outcomes) >= self.min_calls
+                and sum(self._outcomes) >= self.failure_rate * len(self._outcomes)):
+            self.trip()
+
+    def cancel(self):
+        """Report that an allowed call was abandoned without an outcome."""
+        if self.state == self.HALF_OPEN:
+            self._trial_running = False
+
+    def trip(self, duration=None):
+        """Open the circuit for duration seconds (reset_timeout by default)."""
+        self.state = self.OPEN
+        self._open_until = time.monotonic() + (self.reset_timeout if duration is None else duration)
+        self._trial_running = False
+        self._outcomes.clear()
+        self.opened += 1
+
+    def retry_in(self):
+        return max(0.0, self._open_until - time.monotonic())
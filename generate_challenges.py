@@ -0,0 +1,62 @@
+# generate_challenges.py
+
+"""Pre-generate the challenge bank through the configured LLM backends.
+
+Run this ahead of time (and again after adding languages or scenes).
+Challenge mode then serves rounds from the bank without calling the LLM.
+Keys that already hold enough challenges are skipped, so the script can
+be run again to resume.
+Usage: python generate_challenges.py [--languages Spanish French] [--per-key 20]
+"""
+
+import argparse
+import asyncio
+
+from backends import llm_router
+from challenges import build_bank
+from config import (
+    PROMPT_PRELOAD_LANGUAGES, CHALLENGE_DIFFICULTY_LEVELS, CHALLENGE_BANK_SIZE, CHALLENGE_GENERATION_CONCURRENCY,
+    SCENE_OPTIONS
+)
+from llm_client import llm_client
+from logs import configure_logging
+from storage import storage
+
+def bank_keys(languages, difficulties):
+    return [
+        (target_lang, difficulty, scene)
+        for target_lang in languages
+        for difficulty in difficulties
+        for scene in SCENE_OPTIONS.get(difficulty.title(), [])
+    ]
+
+async def main(args):
+    keys = bank_keys(args.languages, args.difficulties)
+    done = 0
+
+    def progress(key, added):
+        nonlocal done
+        done += 1
+        print(f"[{done}/{len(keys)}] {' / '.join(key)}: +{added}")
+
+    try:
+        added = await build_bank(storage, llm_router, keys, args.per_key, args.concurrency, progress)
+    finally:
+        await llm_client.aclose()
+    counts = storage.challenge_counts()
+    short = [key for key in added if counts.get(key, 0) < args.per_key]
+    print(f"Added {sum(added.values())} challenges; the bank holds {sum(counts.values())}.")
+    if short:
+        print(f"{len(short)} keys are still short of {args.per_key}; run again to retry them.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate the challenge bank.")
+    parser.add_argument("--languages", nargs="+", default=PROMPT_PRELOAD_LANGUAGES)
+    parser.add_argument("--difficulties", nargs="+", default=CHALLENGE_DIFFICULTY_LEVELS,
+                        choices=CHALLENGE_DIFFICULTY_LEVELS)
+    parser.add_argument("--per-key", type=int, default=CHALLENGE_BANK_SIZE,
+                        help="challenges per (language, difficulty, scene)")
+    parser.add_argument("--concurrency", type=int, default=CHALLENGE_GENERATION_CONCURRENCY)
+    configure_logging()
+    storage.migrate()
+    asyncio.run(main(parser.parse_args()))
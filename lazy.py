@@ -0,0 +1,23 @@
+# lazy.py
+
+import importlib.util
+import sys
+
+def lazy_import(name):
+    """Return module name, executed on first attribute access rather than now.
+
+    For dependencies that take a long time to import but aren't needed
+    until the app is built or a request comes in. The module is registered
+    in sys.modules, so a later plain import gets the same object.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
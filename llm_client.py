@@ -0,0 +1,276 @@
+# llm_client.py
+
+import asyncio
+import hashlib
+import itertools
+import json
+import math
+import random
+from contextlib import aclosing
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from config import (
+    OPENROUTER_API_KEY, OPENROUTER_URL, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT,
+    LLM_MAX_CONNECTIONS, LLM_POOL_SIZE, LLM_KEEPALIVE_EXPIRY, LLM_BACKOFF_CAP,
+    LLM_RETRY_AFTER_CAP, LLM_MAX_IN_FLIGHT, LLM_RATE_LIMIT, LLM_RATE_BURST,
+    LLM_COALESCE_REQUESTS, LLM_BREAKER_ENABLED, LLM_BREAKER_FAILURE_RATE,
+    LLM_BREAKER_WINDOW, LLM_BREAKER_MIN_CALLS, LLM_BREAKER_RESET_TIMEOUT
+)
+from flow_control import CircuitBreaker, CircuitOpenError, SingleFlight, TokenBucket
+
+HEADERS = {
+    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+    "Content-Type": "application/json"
+}
+
+# Statuses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Failures that happen before the provider saw the request, so a retry is
+# cheap. Read timeouts are not retried: each would cost another full wait.
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+class UpstreamError(Exception):
+    """Raised when a request still gets a non-200 response after retries."""
+
+    def __init__(self, status_code, text, retry_after=None):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+        self.retry_after = retry_after
+
+def backoff_delay(attempt, base_delay, cap=LLM_BACKOFF_CAP):
+    """Exponential backoff with full jitter for the given (zero-based) attempt."""
+    return random.uniform(0, min(cap, base_delay * (2 ** attempt)))
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delay or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def is_upstream_failure(status_code):
+    """Statuses that count against the provider's health in the circuit breaker."""
+    return status_code == 429 or status_code >= 500
+
+class _PoolShard:
+    """One keep-alive connection pool plus a gate sized to it.
+
+    Requests wait on the gate instead of queueing inside httpx, whose pool
+    bookkeeping is quadratic in the number of connections and waiters.
+    """
+
+    def __init__(self, headers, timeout, size):
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=size,
+                max_keepalive_connections=size,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+            )
+        )
+        self.slots = asyncio.Semaphore(size)
+
+def request_key(payload):
+    """Digest of a request payload; identical prompts and settings share a key."""
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+class LLMClient:
+    """Async chat-completions client that reuses pooled keep-alive connections.
+
+    Every upstream attempt passes a global in-flight gate and a token-bucket
+    rate limiter, so bursts queue locally instead of tripping provider
+    quotas. With coalesce set, concurrent identical payloads share a single
+    upstream request. With circuit_breaker set, a run of failures makes
+    further calls raise CircuitOpenError at once until a trial call succeeds.
+    """
+
+    def __init__(self, url=OPENROUTER_URL, headers=None, connect_timeout=LLM_CONNECT_TIMEOUT,
+                 read_timeout=LLM_READ_TIMEOUT, max_connections=LLM_MAX_CONNECTIONS,
+                 pool_size=LLM_POOL_SIZE, max_in_flight=LLM_MAX_IN_FLIGHT, rate_limit=LLM_RATE_LIMIT,
+                 rate_burst=LLM_RATE_BURST, coalesce=LLM_COALESCE_REQUESTS,
+                 circuit_breaker=LLM_BREAKER_ENABLED, retry_after_cap=LLM_RETRY_AFTER_CAP):
+        self.url = url
+        self.headers = headers if headers is not None else HEADERS
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.retry_after_cap = retry_after_cap
+        self.pool_size = min(pool_size, max_connections)
+        self.shard_count = math.ceil(max_connections / self.pool_size)
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = TokenBucket(rate_limit, rate_burst)
+        self.coalesce = coalesce
+        self.single_flight = SingleFlight()
+        self.breaker = CircuitBreaker(
+            LLM_BREAKER_FAILURE_RATE, LLM_BREAKER_WINDOW, LLM_BREAKER_MIN_CALLS, LLM_BREAKER_RESET_TIMEOUT
+        ) if circuit_breaker else None
+        self._shards = []
+        self._next_shard = None
+        self._in_flight = None
+        self._loop = None
+
+    def _get_shard(self):
+        # Pooled connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if not self._shards or self._loop is not loop:
+            self._shards = [
+                _PoolShard(self.headers, self.timeout, self.pool_size)
+                for _ in range(self.shard_count)
+            ]
+            self._next_shard = itertools.cycle(self._shards)
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+            self._loop = loop
+        return next(self._next_shard)
+
+    async def _admit(self):
+        """Check the circuit breaker, wait for the rate limiter, then take an in-flight slot."""
+        if self.breaker and not self.breaker.allow():
+            raise CircuitOpenError(self.breaker.retry_in())
+        shard = self._get_shard()
+        try:
+            await self.rate_limiter.acquire()
+            await self._in_flight.acquire()
+        except BaseException:
+            self._settle(None)
+            raise
+        return shard
+
+    def _settle(self, success):
+        """Report an attempt's outcome to the breaker; None means it was abandoned."""
+        if self.breaker is None:
+            return
+        if success is None:
+            self.breaker.cancel()
+        else:
+            self.breaker.record(success)
+
+    def _retry_wait(self, error, attempt, retry_delay):
+        """Seconds to wait before retrying after error, or None if it is not worth retrying."""
+        if isinstance(error, UpstreamError):
+            if error.status_code not in RETRY_STATUSES:
+                return None
+            if error.retry_after is not None:
+                # Waiting out a long Retry-After would stall the turn; fail now
+                return error.retry_after if error.retry_after <= self.retry_after_cap else None
+        elif not isinstance(error, RETRY_ERRORS):
+            return None
+        return backoff_delay(attempt, retry_delay)
+
+    async def post(self, payload):
+        """Send a single chat-completions request and return the raw response."""
+        shard = await self._admit()
+        success = None
+        try:
+            async with shard.slots:
+                response = await shard.client.post(self.url, json=payload)
+            success = not is_upstream_failure(response.status_code)
+            return response
+        except httpx.TransportError:
+            success = False
+            raise
+        finally:
+            self._in_flight.release()
+            self._settle(success)
+
+    async def complete(self, payload, max_retries=3, retry_delay=1):
+        """Send payload and return the 200 response.
+
+        Connection failures, 429 and 5xx responses are retried with jittered
+        backoff, or after the provider's Retry-After when it sends one. The
+        last error (a transport error or UpstreamError) is raised once retries
+        are exhausted so the caller can pick a friendly message for it.
+        CircuitOpenError is raised without a request while the breaker is open.
+        """
+        if self.coalesce:
+            return await self.single_flight.call(
+                request_key(payload), lambda: self._complete(payload, max_retries, retry_delay))
+        return await self._complete(payload, max_retries, retry_delay)
+
+    async def _complete(self, payload, max_retries, retry_delay):
+        for attempt in range(max_retries):
+            try:
+                response = await self.post(payload)
+                if response.status_code != 200:
+                    raise UpstreamError(response.status_code, response.text,
+                                        parse_retry_after(response.headers.get("Retry-After")))
+                return response
+            except (httpx.TransportError, UpstreamError) as e:
+                delay = self._retry_wait(e, attempt, retry_delay)
+                if delay is None or attempt >= max_retries - 1:
+                    raise
+            await asyncio.sleep(delay)
+
+    async def stream(self, payload, max_retries=3, retry_delay=1):
+        """Yield content deltas from a streamed (SSE) chat completion.
+
+        Errors are retried as in complete() until the first delta arrives;
+        after that they propagate to the caller.
+        """
+        payload = dict(payload, stream=True)
+        if self.coalesce:
+            deltas = self.single_flight.stream(
+                request_key(payload), lambda: self._stream(payload, max_retries, retry_delay))
+        else:
+            deltas = self._stream(payload, max_retries, retry_delay)
+        # Close the shared stream promptly if our caller stops listening
+        async with aclosing(deltas):
+            async for delta in deltas:
+                yield delta
+
+    async def _stream(self, payload, max_retries, retry_delay):
+        started = False
+        for attempt in range(max_retries):
+            shard = await self._admit()
+            success = None
+            try:
+                async with shard.slots:
+                    async with shard.client.stream("POST", self.url, json=payload) as response:
+                        if response.status_code != 200:
+                            await response.aread()
+                            success = not is_upstream_failure(response.status_code)
+                            raise UpstreamError(response.status_code, response.text,
+                                                parse_retry_after(response.headers.get("Retry-After")))
+                        success = True
+                        async for line in response.aiter_lines():
+                            # Blank lines separate events; ":" lines are keep-alive comments
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                return
+                            choices = json.loads(data).get("choices") or [{}]
+                            delta = choices[0].get("delta", {}).get("content")
+                            if delta:
+                                started = True
+                                yield delta
+                        return
+            except (httpx.TransportError, UpstreamError) as e:
+                if isinstance(e, httpx.TransportError):
+                    success = False
+                delay = None if started else self._retry_wait(e, attempt, retry_delay)
+                if delay is None or attempt >= max_retries - 1:
+                    raise
+            finally:
+                self._in_flight.release()
+                self._settle(success)
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        for shard in self._shards:
+            await shard.client.aclose()
+        self._shards = []
+        self._next_shard = None
+        self._loop = None
+
+# Shared client used by the chat pipeline
+llm_client = LLMClient()
@@ -0,0 +1,52 @@
+# logs.py
+
+import json
+import logging
+import sys
+import time
+
+from config import LOG_LEVEL, LOG_FORMAT
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, event and any fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the fields appended as key=value."""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", {})
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+def fields(**values):
+    """Structured fields for a log call: log.info("event", extra=fields(key=value))."""
+    return {"fields": values}
+
+def get_logger(name):
+    return logging.getLogger(f"chatalyst.{name}")
+
+def configure_logging(level=LOG_LEVEL, log_format=LOG_FORMAT):
+    """Send chatalyst.* records to stderr; safe to call more than once."""
+    logger = logging.getLogger("chatalyst")
+    logger.setLevel(level)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JsonFormatter() if log_format == "json" else
+                             TextFormatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    return logger
@@ -0,0 +1,163 @@
+# metrics.py
+
+import bisect
+import threading
+import time
+
+# Upper bounds (seconds) of the latency buckets, roughly log-spaced from
+# tens of microseconds (cache hits, sentiment) to a slow upstream reply
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+class Histogram:
+    """Fixed-bucket latency histogram; memory does not grow with the sample count.
+
+    Quantiles are estimated by interpolating within the bucket they fall in.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+
+    def quantile(self, q):
+        with self._lock:
+            counts, total, largest = list(self._counts), self._count, self._max
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else largest
+                return min(largest, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return largest
+
+    def snapshot(self):
+        with self._lock:
+            counts, total, value_sum = list(self._counts), self._count, self._sum
+        return counts, total, value_sum
+
+    def summary(self):
+        """Count, mean and p50/p95/p99 in milliseconds."""
+        _, total, value_sum = self.snapshot()
+        return {
+            "count": total,
+            "mean_ms": value_sum / total * 1000 if total else 0.0,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000
+        }
+
+class _Timer:
+    """Times a with-block into a histogram, whether or not it raises."""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class Metrics:
+    """Per-stage latency histograms, counters and gauges, rendered as Prometheus text."""
+
+    def __init__(self, namespace="chatalyst"):
+        self.namespace = namespace
+        self._stages = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        histogram = self._stages.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._stages.setdefault(name, Histogram())
+        return histogram
+
+    def observe(self, stage, seconds):
+        self.stage(stage).observe(seconds)
+
+    def timer(self, stage):
+        """Context manager timing its block into the stage's histogram."""
+        return _Timer(self.stage(stage))
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge(self, name, read, help_text=""):
+        """Register read(), called at scrape time, as a gauge."""
+        self._gauges[name] = (read, help_text)
+
+    def stage_summaries(self):
+        return {name: histogram.summary() for name, histogram in sorted(self._stages.items())}
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        prefix = self.namespace
+        lines = [
+            f"# HELP {prefix}_stage_duration_seconds Time spent in each stage of a chat turn.",
+            f"# TYPE {prefix}_stage_duration_seconds histogram"
+        ]
+        quantiles = [
+            f"# HELP {prefix}_stage_duration_quantile_seconds Estimated p50/p95/p99 per stage.",
+            f"# TYPE {prefix}_stage_duration_quantile_seconds gauge"
+        ]
+        for stage, histogram in sorted(self._stages.items()):
+            counts, total, value_sum = histogram.snapshot()
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {value_sum:.6f}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {total}')
+            for q in (0.5, 0.95, 0.99):
+                quantiles.append(f'{prefix}_stage_duration_quantile_seconds{{stage="{stage}",quantile="{q}"}} '
+                                 f'{histogram.quantile(q):.6f}')
+        lines += quantiles
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                declared.add(name)
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+            lines.append(f"{prefix}_{name}_total{{{label_text}}} {value}" if label_text
+                         else f"{prefix}_{name}_total {value}")
+
+        for name, (read, help_text) in sorted(self._gauges.items()):
+            if help_text:
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {read()}")
+        return "\n".join(lines) + "\n"
+
+# Shared registry for the app
+metrics = Metrics()
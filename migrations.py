@@ -0,0 +1,414 @@
+# migrations.py
+
+"""Versioned schema migrations, tracked with SQLite's user_version pragma.
+
+Each entry upgrades the schema from the previous version. Existing data is
+carried forward, so restarts never lose history. To change the schema,
+append a new (version, statements) entry instead of editing an old one.
+"""
+
+MIGRATIONS = [
+    # 1: the original tables, as created by earlier releases
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS chats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_input TEXT,
+            bot_response TEXT,
+            sentiment_score REAL,
+            scene TEXT,
+            timestamp TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS mistakes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_input TEXT,
+            mistake_type TEXT,
+            correction TEXT,
+            explanation TEXT,
+            context TEXT,
+            timestamp TEXT,
+            review_count INTEGER DEFAULT 0,
+            mastered BOOLEAN DEFAULT FALSE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_progress (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_date TEXT,
+            scene TEXT,
+            total_interactions INTEGER,
+            correct_responses INTEGER,
+            mistakes_made INTEGER,
+            confidence_score REAL
+        )
+        """
+    ]),
+    # 2: integer (Unix epoch) timestamps, chats.session_id and lookup indexes.
+    # Stored local-time strings are converted to UTC epoch seconds.
+    (2, [
+        """
+        CREATE TABLE chats_v2 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL DEFAULT '',
+            user_input TEXT,
+            bot_response TEXT,
+            sentiment_score REAL,
+            scene TEXT,
+            timestamp INTEGER
+        )
+        """,
+        """
+        INSERT INTO chats_v2 (id, user_input, bot_response, sentiment_score, scene, timestamp)
+        SELECT id, user_input, bot_response, sentiment_score, scene,
+               CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+        FROM chats
+        """,
+        "DROP TABLE chats",
+        "ALTER TABLE chats_v2 RENAME TO chats",
+        """
+        CREATE TABLE mistakes_v2 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_input TEXT,
+            mistake_type TEXT,
+            correction TEXT,
+            explanation TEXT,
+            context TEXT,
+            timestamp INTEGER,
+            review_count INTEGER DEFAULT 0,
+            mastered BOOLEAN DEFAULT FALSE
+        )
+        """,
+        """
+        INSERT INTO mistakes_v2 (id, user_input, mistake_type, correction, explanation,
+                                 context, timestamp, review_count, mastered)
+        SELECT id, user_input, mistake_type, correction, explanation, context,
+               CAST(strftime('%s', timestamp, 'utc') AS INTEGER), review_count, mastered
+        FROM mistakes
+        """,
+        "DROP TABLE mistakes",
+        "ALTER TABLE mistakes_v2 RENAME TO mistakes",
+        "CREATE INDEX idx_chats_session_timestamp ON chats(session_id, timestamp)",
+        "CREATE INDEX idx_chats_scene ON chats(scene)",
+        "CREATE INDEX idx_mistakes_type_mastered ON mistakes(mistake_type, mastered)",
+        "CREATE INDEX idx_mistakes_timestamp ON mistakes(timestamp)"
+    ]),
+    # 3: mistakes are tagged with the session that made them
+    (3, [
+        "ALTER TABLE mistakes ADD COLUMN session_id TEXT NOT NULL DEFAULT ''"
+    ]),
+    # 4: optional persistent tier of the response cache
+    (4, [
+        """
+        CREATE TABLE response_cache (
+            key TEXT PRIMARY KEY,
+            body TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    ]),
+    # 5: learning-stats aggregates, overall and per session, kept current by
+    # triggers so the insight and dashboard queries read O(categories) rows
+    (5, [
+        """
+        CREATE TABLE mistake_totals (
+            mistake_type TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0,
+            mastered_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE session_mistake_totals (
+            session_id TEXT NOT NULL,
+            mistake_type TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            mastered_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (session_id, mistake_type)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE scene_totals (
+            scene TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE session_scene_totals (
+            session_id TEXT NOT NULL,
+            scene TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (session_id, scene)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT INTO mistake_totals (mistake_type, count, mastered_count)
+        SELECT COALESCE(mistake_type, ''), COUNT(*), SUM(CASE WHEN mastered THEN 1 ELSE 0 END)
+        FROM mistakes GROUP BY COALESCE(mistake_type, '')
+        """,
+        """
+        INSERT INTO session_mistake_totals (session_id, mistake_type, count, mastered_count)
+        SELECT session_id, COALESCE(mistake_type, ''), COUNT(*), SUM(CASE WHEN mastered THEN 1 ELSE 0 END)
+        FROM mistakes GROUP BY session_id, COALESCE(mistake_type, '')
+        """,
+        """
+        INSERT INTO scene_totals (scene, count)
+        SELECT COALESCE(scene, ''), COUNT(*) FROM chats GROUP BY COALESCE(scene, '')
+        """,
+        """
+        INSERT INTO session_scene_totals (session_id, scene, count)
+        SELECT session_id, COALESCE(scene, ''), COUNT(*) FROM chats GROUP BY session_id, COALESCE(scene, '')
+        """,
+        """
+        CREATE TRIGGER mistakes_totals_insert AFTER INSERT ON mistakes
+        BEGIN
+            INSERT INTO mistake_totals (mistake_type, count, mastered_count)
+            VALUES (COALESCE(NEW.mistake_type, ''), 1, CASE WHEN NEW.mastered THEN 1 ELSE 0 END)
+            ON CONFLICT (mistake_type) DO UPDATE SET
+                count = count + 1, mastered_count = mastered_count + excluded.mastered_count;
+            INSERT INTO session_mistake_totals (session_id, mistake_type, count, mastered_count)
+            VALUES (NEW.session_id, COALESCE(NEW.mistake_type, ''), 1, CASE WHEN NEW.mastered THEN 1 ELSE 0 END)
+            ON CONFLICT (session_id, mistake_type) DO UPDATE SET
+                count = count + 1, mastered_count = mastered_count + excluded.mastered_count;
+        END
+        """,
+        """
+        CREATE TRIGGER mistakes_totals_delete AFTER DELETE ON mistakes
+        BEGIN
+            UPDATE mistake_totals
+            SET count = count - 1, mastered_count = mastered_count - (CASE WHEN OLD.mastered THEN 1 ELSE 0 END)
+            WHERE mistake_type = COALESCE(OLD.mistake_type, '');
+            UPDATE session_mistake_totals
+            SET count = count - 1, mastered_count = mastered_count - (CASE WHEN OLD.mastered THEN 1 ELSE 0 END)
+            WHERE session_id = OLD.session_id AND mistake_type = COALESCE(OLD.mistake_type, '');
+        END
+        """,
+        """
+        CREATE TRIGGER mistakes_totals_update AFTER UPDATE OF session_id, mistake_type, mastered ON mistakes
+        BEGIN
+            UPDATE mistake_totals
+            SET count = count - 1, mastered_count = mastered_count - (CASE WHEN OLD.mastered THEN 1 ELSE 0 END)
+            WHERE mistake_type = COALESCE(OLD.mistake_type, '');
+            UPDATE session_mistake_totals
+            SET count = count - 1, mastered_count = mastered_count - (CASE WHEN OLD.mastered THEN 1 ELSE 0 END)
+            WHERE session_id = OLD.session_id AND mistake_type = COALESCE(OLD.mistake_type, '');
+            INSERT INTO mistake_totals (mistake_type, count, mastered_count)
+            VALUES (COALESCE(NEW.mistake_type, ''), 1, CASE WHEN NEW.mastered THEN 1 ELSE 0 END)
+            ON CONFLICT (mistake_type) DO UPDATE SET
+                count = count + 1, mastered_count = mastered_count + excluded.mastered_count;
+            INSERT INTO session_mistake_totals (session_id, mistake_type, count, mastered_count)
+            VALUES (NEW.session_id, COALESCE(NEW.mistake_type, ''), 1, CASE WHEN NEW.mastered THEN 1 ELSE 0 END)
+            ON CONFLICT (session_id, mistake_type) DO UPDATE SET
+                count = count + 1, mastered_count = mastered_count + excluded.mastered_count;
+        END
+        """,
+        """
+        CREATE TRIGGER chats_totals_insert AFTER INSERT ON chats
+        BEGIN
+            INSERT INTO scene_totals (scene, count) VALUES (COALESCE(NEW.scene, ''), 1)
+            ON CONFLICT (scene) DO UPDATE SET count = count + 1;
+            INSERT INTO session_scene_totals (session_id, scene, count)
+            VALUES (NEW.session_id, COALESCE(NEW.scene, ''), 1)
+            ON CONFLICT (session_id, scene) DO UPDATE SET count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER chats_totals_delete AFTER DELETE ON chats
+        BEGIN
+            UPDATE scene_totals SET count = count - 1 WHERE scene = COALESCE(OLD.scene, '');
+            UPDATE session_scene_totals SET count = count - 1
+            WHERE session_id = OLD.session_id AND scene = COALESCE(OLD.scene, '');
+        END
+        """,
+        """
+        CREATE TRIGGER chats_totals_update AFTER UPDATE OF session_id, scene ON chats
+        BEGIN
+            UPDATE scene_totals SET count = count - 1 WHERE scene = COALESCE(OLD.scene, '');
+            UPDATE session_scene_totals SET count = count - 1
+            WHERE session_id = OLD.session_id AND scene = COALESCE(OLD.scene, '');
+            INSERT INTO scene_totals (scene, count) VALUES (COALESCE(NEW.scene, ''), 1)
+            ON CONFLICT (scene) DO UPDATE SET count = count + 1;
+            INSERT INTO session_scene_totals (session_id, scene, count)
+            VALUES (NEW.session_id, COALESCE(NEW.scene, ''), 1)
+            ON CONFLICT (session_id, scene) DO UPDATE SET count = count + 1;
+        END
+        """
+    ]),
+    # 6: spaced-repetition review of mistakes. Each row carries its SM-2
+    # state and next due time; existing mistakes are due right away.
+    (6, [
+        "ALTER TABLE mistakes ADD COLUMN due_at INTEGER",
+        "ALTER TABLE mistakes ADD COLUMN ease REAL NOT NULL DEFAULT 2.5",
+        "ALTER TABLE mistakes ADD COLUMN review_interval INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE mistakes ADD COLUMN review_streak INTEGER NOT NULL DEFAULT 0",
+        "UPDATE mistakes SET due_at = COALESCE(timestamp, 0)",
+        "CREATE INDEX idx_mistakes_session_due ON mistakes(session_id, due_at)"
+    ]),
+    # 7: challenge bank, generated ahead of time per (language, difficulty, scene).
+    # Earlier releases created an unused multiple-choice challenges table; it
+    # was never written to, so it is replaced.
+    (7, [
+        "DROP TABLE IF EXISTS challenges",
+        """
+        CREATE TABLE challenges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            target_lang TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            scene TEXT NOT NULL,
+            prompt TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            hint TEXT NOT NULL DEFAULT '',
+            created_at INTEGER NOT NULL
+        )
+        """,
+        "CREATE UNIQUE INDEX idx_challenges_bank ON challenges(target_lang, difficulty, scene, prompt)"
+    ]),
+    # 8: mistakes point at the chat turn they were found in, so re-analysis
+    # can reconcile them. Existing rows are matched on the turn's session,
+    # time and text; rows with no matching chat keep a NULL chat_id.
+    (8, [
+        "ALTER TABLE mistakes ADD COLUMN chat_id INTEGER",
+        """
+        UPDATE mistakes SET chat_id = (
+            SELECT chats.id FROM chats
+            WHERE chats.session_id = mistakes.session_id AND chats.timestamp = mistakes.timestamp
+              AND chats.user_input IS mistakes.user_input AND chats.bot_response IS mistakes.correction
+            ORDER BY chats.id
+            LIMIT 1
+        )
+        """,
+        "CREATE INDEX idx_mistakes_chat ON mistakes(chat_id)"
+    ]),
+    # 9: chats by time, so an incremental export finds where to start with a seek
+    (9, [
+        "CREATE INDEX idx_chats_timestamp ON chats(timestamp)"
+    ]),
+    # 10: a random id per database, so an import can tell whether an export
+    # came from this database (or the one it was copied from) or another one
+    (10, [
+        "CREATE TABLE database_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+        "INSERT INTO database_info (key, value) VALUES ('database_id', lower(hex(randomblob(16))))"
+    ]),
+    # 11: expired response_cache rows are deleted by age
+    (11, [
+        "CREATE INDEX idx_response_cache_created ON response_cache(created_at)"
+    ]),
+    # 12: a counter bumped on every change to mistakes that derived views
+    # show, so every process (app workers, backfill, import) can tell when
+    # its cached dashboard or review queue is stale. Review scheduling
+    # updates (ease, due_at, ...) alone don't count.
+    (12, [
+        "INSERT INTO database_info (key, value) VALUES ('mistakes_version', '0')",
+        """
+        CREATE TRIGGER mistakes_version_insert AFTER INSERT ON mistakes
+        BEGIN
+            UPDATE database_info SET value = CAST(value AS INTEGER) + 1 WHERE key = 'mistakes_version';
+        END
+        """,
+        """
+        CREATE TRIGGER mistakes_version_delete AFTER DELETE ON mistakes
+        BEGIN
+            UPDATE database_info SET value = CAST(value AS INTEGER) + 1 WHERE key = 'mistakes_version';
+        END
+        """,
+        """
+        CREATE TRIGGER mistakes_version_update AFTER UPDATE ON mistakes
+        WHEN OLD.mistake_type IS NOT NEW.mistake_type OR OLD.mastered IS NOT NEW.mastered
+          OR OLD.session_id IS NOT NEW.session_id OR OLD.user_input IS NOT NEW.user_input
+          OR OLD.correction IS NOT NEW.correction OR OLD.timestamp IS NOT NEW.timestamp
+        BEGIN
+            UPDATE database_info SET value = CAST(value AS INTEGER) + 1 WHERE key = 'mistakes_version';
+        END
+        """
+    ]),
+    # 13: when each history row was last written, so incremental exports pick
+    # up rows changed in place (review state, backfilled sentiment, ...), not
+    # just new ones. Writes that don't set updated_at get the current time;
+    # imports carry the exported value over. Existing rows start at their
+    # creation time; user_progress has none, so its rows start now.
+    (13, [
+        "ALTER TABLE chats ADD COLUMN updated_at INTEGER",
+        "ALTER TABLE mistakes ADD COLUMN updated_at INTEGER",
+        "ALTER TABLE user_progress ADD COLUMN updated_at INTEGER",
+        "UPDATE chats SET updated_at = timestamp",
+        "UPDATE mistakes SET updated_at = timestamp",
+        "UPDATE user_progress SET updated_at = CAST(strftime('%s', 'now') AS INTEGER)",
+        "CREATE INDEX idx_chats_updated ON chats(updated_at)",
+        "CREATE INDEX idx_mistakes_updated ON mistakes(updated_at)",
+        "CREATE INDEX idx_user_progress_updated ON user_progress(updated_at)",
+        # Only incremental exports used it, and they now go by updated_at
+        "DROP INDEX idx_chats_timestamp",
+        """
+        CREATE TRIGGER chats_touch_insert AFTER INSERT ON chats
+        WHEN NEW.updated_at IS NULL
+        BEGIN
+            UPDATE chats SET updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER chats_touch_update AFTER UPDATE ON chats
+        WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE chats SET updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER mistakes_touch_insert AFTER INSERT ON mistakes
+        WHEN NEW.updated_at IS NULL
+        BEGIN
+            UPDATE mistakes SET updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER mistakes_touch_update AFTER UPDATE ON mistakes
+        WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE mistakes SET updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER user_progress_touch_insert AFTER INSERT ON user_progress
+        WHEN NEW.updated_at IS NULL
+        BEGIN
+            UPDATE user_progress SET updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER user_progress_touch_update AFTER UPDATE ON user_progress
+        WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE user_progress SET updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = NEW.id;
+        END
+        """
+    ])
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def migrate(conn):
+    """Apply pending migrations in one transaction and return the schema version.
+
+    An up-to-date schema, as on every start but the first after an upgrade,
+    is recognized from user_version without taking the write lock, so a
+    starting worker never waits behind writers. Otherwise BEGIN IMMEDIATE
+    takes the lock before user_version is read again, so workers starting
+    at the same time apply each migration only once.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= LATEST_VERSION:
+        return version
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, statements in MIGRATIONS:
+            if target <= version:
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {target}")
+            version = target
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
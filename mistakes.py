@@ -0,0 +1,79 @@
+# mistakes.py
+
+from config import MISTAKE_KEYWORDS_EXTRA
+
+# Keywords in a bot reply that point at the kind of mistake being corrected.
+# Earlier categories win when a reply mentions several.
+MISTAKE_KEYWORDS = {
+    "grammar": ["grammar", "tense", "conjugation", "structure", "incorrect"],
+    "vocabulary": ["word choice", "meaning", "vocabulary", "wrong word"],
+    "pronunciation": ["pronunciation", "accent", "sound", "pronounce"],
+    "cultural": ["cultural context", "formal", "informal", "politeness"]
+}
+
+class MistakeClassifier:
+    """Precompiled keyword table that finds whole-word mistake keywords.
+
+    Keywords only match as whole words ("sound" no longer matches "sounds
+    great"). Each one is located with str.find, which runs at C speed, in
+    priority order, so classify() stops at the first whole-word hit. On
+    344-char replies (bench_mistakes.py) that runs about as fast as the old
+    substring scan. One alternation regex is no faster: search() finds the
+    first hit at a similar rate, and the finditer() scan that a priority
+    pick needs is about 6x slower. matches() has to find every keyword and
+    runs about 5x slower than classify().
+    """
+
+    def __init__(self, categories):
+        self.categories = list(categories)
+        # (priority, category, keyword), with longer keywords tried first
+        self.keywords = [
+            (priority, category, keyword.lower())
+            for priority, (category, keywords) in enumerate(categories.items())
+            for keyword in sorted(keywords, key=len, reverse=True)
+        ]
+
+    @staticmethod
+    def _is_whole_word(text, start, end):
+        return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+    def matches(self, text):
+        """Return (category, keyword, start, end) for every keyword found, in text order.
+
+        Offsets index into text.lower().
+        """
+        lower_text = text.lower()
+        found = []
+        for _, category, keyword in self.keywords:
+            start = lower_text.find(keyword)
+            while start != -1:
+                end = start + len(keyword)
+                if self._is_whole_word(lower_text, start, end):
+                    found.append((category, keyword, start, end))
+                start = lower_text.find(keyword, start + 1)
+        return sorted(found, key=lambda match: match[2])
+
+    def classify(self, text):
+        """Return the highest-priority category mentioned in text, or "general"."""
+        lower_text = text.lower()
+        for _, category, keyword in self.keywords:
+            start = lower_text.find(keyword)
+            while start != -1:
+                if self._is_whole_word(lower_text, start, start + len(keyword)):
+                    return category
+                start = lower_text.find(keyword, start + 1)
+        return "general"
+
+def merge_keywords(base, extra):
+    """Add extra keywords to existing categories and append new categories last."""
+    merged = {category: list(keywords) for category, keywords in base.items()}
+    for category, keywords in extra.items():
+        merged.setdefault(category, []).extend(keywords)
+    return merged
+
+# Built-in categories plus any added in config.py
+mistake_classifier = MistakeClassifier(merge_keywords(MISTAKE_KEYWORDS, MISTAKE_KEYWORDS_EXTRA))
+
+def analyze_mistake(user_input, bot_response):
+    """Analyze the type of mistake and provide structured feedback."""
+    return mistake_classifier.classify(bot_response)
@@ -0,0 +1,76 @@
+# prompts.py
+
+import hashlib
+import threading
+
+from config import PROMPT_PRELOAD_LANGUAGES, PROMPT_CACHE_SIZE
+
+# Static instructions for a (target language, level, scene). Everything that
+# changes from turn to turn goes after this, so providers that cache prompt
+# prefixes can reuse it for every turn of every learner in the same scene.
+SYSTEM_PREFIX = (
+    "You are Chatalyst, a friendly language guide. "
+    "Help the user learn {target_lang} in a simple way. "
+    "The user is at {level} level. "
+    "Use short sentences and easy words. "
+    "Encourage them and provide examples. "
+    "Current scene: {scene}."
+)
+
+def prompt_key(target_lang, level, scene):
+    """Normalized (target_lang, level, scene), so "spanish " and "Spanish" share a prefix."""
+    return " ".join(target_lang.split()).title(), level.strip().capitalize(), " ".join(scene.split())
+
+class PromptRegistry:
+    """System-message prefixes per (target_lang, level, scene), built once.
+
+    Every scene in scene_options is rendered up front for each language in
+    languages; other languages are rendered on first use. At most
+    max_entries are kept, oldest first out, so free-text languages can't
+    grow it without bound. Spellings of the same key share one prefix
+    string, so it is byte-identical across turns and learners.
+    """
+
+    def __init__(self, scene_options, languages=PROMPT_PRELOAD_LANGUAGES, max_entries=PROMPT_CACHE_SIZE):
+        self._entries = {}  # (target_lang, level, scene) as given -> (prefix, prefix_hash)
+        self._rendered = {}  # prompt_key(...) -> (prefix, prefix_hash)
+        self._lock = threading.Lock()
+        self.max_entries = max(max_entries, len(languages) * sum(map(len, scene_options.values())))
+        for target_lang in languages:
+            for level, scenes in scene_options.items():
+                for scene in scenes:
+                    self._render(target_lang, level, scene)
+
+    def _entry(self, target_lang, level, scene):
+        # Lock-free lookup on the hot path; only misses render
+        entry = self._entries.get((target_lang, level, scene))
+        return entry if entry is not None else self._render(target_lang, level, scene)
+
+    def _render(self, target_lang, level, scene):
+        key = prompt_key(target_lang, level, scene)
+        with self._lock:
+            entry = self._rendered.get(key)
+            if entry is None:
+                prefix = SYSTEM_PREFIX.format(target_lang=key[0], level=key[1], scene=key[2])
+                entry = (prefix, hashlib.sha1(prefix.encode()).hexdigest()[:16])
+                self._rendered[key] = entry
+            self._entries[(target_lang, level, scene)] = entry
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            while len(self._rendered) > self.max_entries:
+                del self._rendered[next(iter(self._rendered))]
+            return entry
+
+    def prefix(self, target_lang, level, scene):
+        return self._entry(target_lang, level, scene)[0]
+
+    def prefix_hash(self, target_lang, level, scene):
+        return self._entry(target_lang, level, scene)[1]
+
+    def system_message(self, target_lang, level, scene, context=""):
+        """Static prefix first, then the per-turn context."""
+        prefix = self._entry(target_lang, level, scene)[0]
+        return prefix + "\n\n" + context if context else prefix
+
+    def __len__(self):
+        return len(self._rendered)
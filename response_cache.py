@@ -0,0 +1,109 @@
+# response_cache.py
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PRUNE_INTERVAL
+
+WHITESPACE = re.compile(r"\s+")
+TRAILING_PUNCTUATION = re.compile(r"[\s.!?¡¿,;:]+$")
+
+def normalize_input(text):
+    """Fold case, whitespace and trailing punctuation so "Hola!" and "hola" match."""
+    text = WHITESPACE.sub(" ", text.strip().lower())
+    return TRAILING_PUNCTUATION.sub("", text)
+
+def context_fingerprint(turns):
+    """Short digest of the (user_input, bot_response) turns sent with a prompt."""
+    digest = hashlib.sha1()
+    for user_input, bot_response in turns:
+        digest.update(user_input.encode())
+        digest.update(b"\0")
+        digest.update(bot_response.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+def cache_key(model, target_lang, level, scene, user_input, turns):
+    """Key a reply on everything that shapes it: model, learner settings, input and context."""
+    parts = [model, target_lang.lower(), level.lower(), scene, normalize_input(user_input),
+             context_fingerprint(turns)]
+    return hashlib.sha1("\0".join(parts).encode()).hexdigest()
+
+class ResponseCache:
+    """LRU cache of reply bodies with a time-to-live.
+
+    Bodies are stored without the emotion-aware wrapping, which depends on
+    the learner's sentiment and is applied per turn. When a store is given
+    (a storage.Storage), entries are also written to SQLite and read back on
+    a memory miss, so they survive restarts and are shared across workers.
+    Expired rows are deleted from the store every prune_interval puts (and
+    by prune() at startup), so the table holds about a TTL's worth of replies.
+    """
+
+    def __init__(self, store=None, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL,
+                 prune_interval=RESPONSE_CACHE_PRUNE_INTERVAL):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self._puts = 0
+        self._entries = OrderedDict()  # key -> (created_at, body)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached body for key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+
+        entry = self.store.cached_response(key, now - self.ttl) if self.store else None
+        with self._lock:
+            if entry:
+                self._insert(key, entry)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, body):
+        created_at = int(time.time())
+        with self._lock:
+            self._insert(key, (created_at, body))
+            self._puts += 1
+            due = self._puts % self.prune_interval == 0
+        if self.store:
+            self.store.store_cached_response(key, body, created_at)
+            if due:
+                self.prune()
+
+    def prune(self):
+        """Delete expired replies from the store; returns how many were removed."""
+        return self.store.prune_cached_responses(time.time() - self.ttl) if self.store else 0
+
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
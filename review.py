@@ -0,0 +1,121 @@
+# review.py
+
+import heapq
+import threading
+import time
+
+from config import (
+    REVIEW_RELEARN_INTERVAL, REVIEW_FIRST_INTERVAL, REVIEW_SECOND_INTERVAL, REVIEW_MIN_EASE, REVIEW_MASTERED_INTERVAL
+)
+
+# Answer grades offered in review mode, on SM-2's 0-5 quality scale
+GRADES = {"Again": 1, "Hard": 3, "Good": 4, "Easy": 5}
+
+def sm2(ease, interval, streak, quality):
+    """Next (ease, interval, streak, mastered) after a review graded quality (0-5).
+
+    A correct answer (3+) moves the mistake to the next interval: one day,
+    six days, then the last interval times the ease factor. A wrong one
+    brings it back within REVIEW_RELEARN_INTERVAL and restarts the streak.
+    Intervals are in seconds.
+    """
+    ease = max(REVIEW_MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < 3:
+        streak, interval = 0, REVIEW_RELEARN_INTERVAL
+    else:
+        streak += 1
+        if streak == 1:
+            interval = REVIEW_FIRST_INTERVAL
+        elif streak == 2:
+            interval = REVIEW_SECOND_INTERVAL
+        else:
+            interval = round(interval * ease)
+    return ease, interval, streak, interval >= REVIEW_MASTERED_INTERVAL
+
+class ReviewQueue:
+    """One session's mistakes ordered by due time, in a min-heap.
+
+    The heap is loaded from the (session_id, due_at) index on first use. New
+    mistakes are picked up by id when store.mistakes_version changes. A
+    graded mistake gets a fresh heap entry, and its old entry is skipped
+    when popped, so serving and grading cost O(log n) per mistake.
+    """
+
+    def __init__(self, store, session_id):
+        self.store = store
+        self.session_id = session_id
+        self._heap = []  # (due_at, mistake_id), possibly stale
+        self._due = {}  # mistake_id -> current due_at
+        self._last_id = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        version = self.store.mistakes_version
+        if version == self._version:
+            return
+        if self._version is None:
+            rows = self.store.review_items(self.session_id)
+            self._heap = [(due_at or 0, mistake_id) for mistake_id, due_at in rows]
+            heapq.heapify(self._heap)
+        else:
+            rows = self.store.review_items(self.session_id, after_id=self._last_id)
+            for mistake_id, due_at in rows:
+                heapq.heappush(self._heap, (due_at or 0, mistake_id))
+        for mistake_id, due_at in rows:
+            self._due[mistake_id] = due_at or 0
+            self._last_id = max(self._last_id, mistake_id)
+        self._version = version
+
+    def _pop_current(self):
+        while self._heap:
+            due_at, mistake_id = heapq.heappop(self._heap)
+            if self._due.get(mistake_id) == due_at:
+                return due_at, mistake_id
+        return None
+
+    def due(self, limit, now=None):
+        """Ids of up to limit mistakes due by now, most overdue first."""
+        now = now or time.time()
+        with self._lock:
+            self._refresh()
+            taken = []
+            while len(taken) < limit:
+                entry = self._pop_current()
+                if entry is None:
+                    break
+                taken.append(entry)
+                if entry[0] > now:
+                    break
+            for entry in taken:
+                heapq.heappush(self._heap, entry)
+            return [mistake_id for due_at, mistake_id in taken if due_at <= now]
+
+    def next_due_at(self):
+        """When the earliest mistake falls due, or None if the session has none."""
+        with self._lock:
+            self._refresh()
+            entry = self._pop_current()
+            if entry is None:
+                return None
+            heapq.heappush(self._heap, entry)
+            return entry[0]
+
+    def grade(self, mistake_id, quality, now=None):
+        """Store the review of mistake_id and reschedule it; returns its new due time."""
+        now = int(now or time.time())
+        due_at = self.store.record_review(mistake_id, quality, now)
+        with self._lock:
+            if due_at is not None and mistake_id in self._due:
+                self._due[mistake_id] = due_at
+                heapq.heappush(self._heap, (due_at, mistake_id))
+                # Drop stale entries once they outnumber the live ones
+                if len(self._heap) > 2 * len(self._due) + 64:
+                    self._heap = [(due, key) for key, due in self._due.items()]
+                    heapq.heapify(self._heap)
+        return due_at
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._due)
@@ -0,0 +1,62 @@
+# sentiment.py
+
+"""Sentiment scoring for learner messages.
+
+Scores are the same polarity TextBlob reports (its default pattern
+analyzer), but the backend is imported on first use rather than at startup,
+and results are memoized on the text.
+"""
+
+import importlib.util
+import os
+from functools import lru_cache
+
+from config import NLTK_RESOURCES, SENTIMENT_CACHE_SIZE
+
+_polarity_backend = None
+
+def _backend():
+    # Importing textblob pulls in NLTK and the pattern lexicon, so defer it
+    # until a score is actually needed
+    global _polarity_backend
+    if _polarity_backend is None:
+        from textblob.en import polarity
+        _polarity_backend = polarity
+    return _polarity_backend
+
+@lru_cache(maxsize=SENTIMENT_CACHE_SIZE)
+def analyze_sentiment(text):
+    """Return the polarity of text in [-1.0, 1.0], as TextBlob(text).sentiment.polarity."""
+    return _backend()(text)
+
+def analyze_many(texts):
+    """Score a list of texts, analyzing each distinct text only once.
+
+    Used for backfills, where stored inputs repeat heavily.
+    """
+    polarity = _backend()
+    scores = {}
+    for text in texts:
+        if text not in scores:
+            scores[text] = polarity(text)
+    return [scores[text] for text in texts]
+
+def missing_corpora(nltk_resources=NLTK_RESOURCES):
+    """Data files scoring needs that aren't installed, found without network or imports.
+
+    TextBlob's polarity lexicon ships inside the textblob package, so it is
+    looked up on disk. NLTK is only imported if nltk_resources lists any.
+    """
+    missing = []
+    spec = importlib.util.find_spec("textblob")
+    lexicon = os.path.join(spec.submodule_search_locations[0], "en", "en-sentiment.xml") if spec else None
+    if lexicon is None or not os.path.exists(lexicon):
+        missing.append("textblob/en/en-sentiment.xml")
+    if nltk_resources:
+        import nltk.data
+        for resource in nltk_resources:
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                missing.append(resource)
+    return missing
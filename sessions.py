@@ -0,0 +1,156 @@
+# sessions.py
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from config import (
+    SESSION_MAX_COUNT, SESSION_IDLE_TIMEOUT, CONTEXT_TOKEN_BUDGET, CONTEXT_MAX_TURNS, CONTEXT_MESSAGE_TOKENS
+)
+from context_builder import RunningSummary, estimate_tokens, truncate_tokens
+
+class ConversationWindow:
+    """Ring buffer of a session's recent turns, trimmed to a token budget.
+
+    Messages are cut to message_tokens on the way in, and turns pushed out
+    of the window are folded into a RunningSummary, so the prompt context
+    stays within token_budget plus the summary's budget.
+    loaded stays False until the window has been rehydrated from the
+    database, so a resumed session costs one query rather than one per turn.
+    """
+
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, max_turns=CONTEXT_MAX_TURNS,
+                 message_tokens=CONTEXT_MESSAGE_TOKENS):
+        self.token_budget = token_budget
+        self.message_tokens = message_tokens
+        self._turns = deque(maxlen=max_turns)  # (user_input, bot_response, tokens)
+        self._tokens = 0
+        self.summary = RunningSummary()
+        self.loaded = False
+
+    def add(self, user_input, bot_response):
+        if len(self._turns) == self._turns.maxlen:
+            self._evict()
+        user_input = truncate_tokens(user_input, self.message_tokens)
+        bot_response = truncate_tokens(bot_response, self.message_tokens)
+        tokens = estimate_tokens(user_input) + estimate_tokens(bot_response)
+        self._turns.append((user_input, bot_response, tokens))
+        self._tokens += tokens
+        # Always keep the latest turn, even if it alone exceeds the budget
+        while self._tokens > self.token_budget and len(self._turns) > 1:
+            self._evict()
+
+    def _evict(self):
+        user_input, bot_response, tokens = self._turns.popleft()
+        self._tokens -= tokens
+        self.summary.add(user_input, bot_response)
+
+    def load(self, turns):
+        """Rehydrate from stored (user_input, bot_response) pairs, oldest first."""
+        for user_input, bot_response in turns:
+            self.add(user_input, bot_response)
+        self.loaded = True
+
+    def turns(self):
+        """Return the (user_input, bot_response) pairs in the window, oldest first.
+
+        Messages come back as stored, i.e. cut to message_tokens.
+        """
+        return [(user_input, bot_response) for user_input, bot_response, _ in self._turns]
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+    def __len__(self):
+        return len(self._turns)
+
+def new_session(session_id):
+    """Fresh per-user state, as set up by the onboarding form."""
+    return {
+        "session_id": session_id,
+        "learner_id": session_id,  # stored history's key; the browser's id once its profile is restored
+        "window": ConversationWindow(),
+        "known_lang": "",
+        "target_lang": "",
+        "level": "",
+        "scene": "",
+        "review": None,  # review.ReviewQueue, created when review mode is first opened
+        "review_item": None,
+        "current_challenge": None,
+        "challenge_score": 0
+    }
+
+def session_id_for(request):
+    """Session key for a Gradio request; direct calls share the "" session."""
+    return getattr(request, "session_hash", None) or ""
+
+class SessionManager:
+    """Per-user session state keyed by Gradio session hash.
+
+    Sessions are kept in least-recently-used order, so idle ones are evicted
+    from the front in O(1) and the total is capped at max_sessions.
+    """
+
+    def __init__(self, max_sessions=SESSION_MAX_COUNT, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()  # session_id -> (last_seen, state)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, session_id):
+        """Return the state for session_id, creating it on first use."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            state = entry[1] if entry else new_session(session_id)
+            self._sessions[session_id] = (now, state)
+            self._evict(now)
+            return state
+
+    def discard(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict(time.monotonic())
+
+    def _evict(self, now):
+        while self._sessions:
+            session_id, (last_seen, _) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - last_seen < self.idle_timeout:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._sessions)
+
+# Shared session registry used by the app
+sessions = SessionManager()
+
+def session_for(request, profile=None):
+    """The request's session, with the tab's onboarding choices restored from profile.
+
+    Idle sessions are evicted and come back blank, but each tab keeps its
+    choices (target_lang, level, scene, ...) and the browser's learner_id in
+    its own profile state, so a learner returning after the idle timeout
+    carries on where they were.
+    """
+    session = sessions.get(session_id_for(request))
+    if profile:
+        session.update(profile)
+    return session
+
+def assign_learner(learner_id, profile=None):
+    """The browser's persistent learner id, minted on its first visit, and the profile carrying it.
+
+    Gradio's session hash changes on every page load, so stored turns,
+    review schedules and the challenge allowance are keyed on this id,
+    which the browser keeps in local storage, instead.
+    """
+    learner_id = learner_id or uuid.uuid4().hex
+    return learner_id, dict(profile or {}, learner_id=learner_id)
@@ -0,0 +1,540 @@
+# storage.py
+
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from config import DATABASE_PATH, DB_POOL_SIZE, DB_BUSY_TIMEOUT, DB_CACHE_SIZE_KB, DB_MMAP_SIZE
+from migrations import migrate
+from review import sm2
+
+# Applied to every pooled connection. WAL lets readers proceed while a turn
+# is being written; NORMAL sync is durable across application crashes.
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT}",
+    f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size={DB_MMAP_SIZE}",
+    "PRAGMA temp_store=MEMORY"
+]
+
+# Statements are kept as constants so sqlite3's per-connection statement
+# cache reuses the prepared form on every call
+INSERT_CHAT = """
+    INSERT INTO chats (session_id, user_input, bot_response, sentiment_score, scene, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# New mistakes are due for review right away
+INSERT_MISTAKE = """
+    INSERT INTO mistakes (session_id, user_input, mistake_type, correction, explanation,
+    context, timestamp, due_at, chat_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SELECT_RECENT_CONTEXT = """
+    SELECT user_input, bot_response
+    FROM chats
+    WHERE session_id = ?
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+"""
+
+# The stats queries read the trigger-maintained totals tables (see
+# migration 5), so they cost O(categories) however large the history gets
+SELECT_MISTAKE_STATS = """
+    SELECT mistake_type, count, mastered_count
+    FROM mistake_totals
+    WHERE count > 0
+    ORDER BY count DESC
+"""
+
+SELECT_SESSION_MISTAKE_STATS = """
+    SELECT mistake_type, count, mastered_count
+    FROM session_mistake_totals
+    WHERE session_id = ? AND count > 0
+    ORDER BY count DESC
+"""
+
+SELECT_SCENE_STATS = """
+    SELECT scene, count
+    FROM scene_totals
+    WHERE count > 0
+    ORDER BY count DESC
+    LIMIT ?
+"""
+
+SELECT_SESSION_SCENE_STATS = """
+    SELECT scene, count
+    FROM session_scene_totals
+    WHERE session_id = ? AND count > 0
+    ORDER BY count DESC
+    LIMIT ?
+"""
+
+SELECT_RECENT_MISTAKES = """
+    SELECT user_input, correction, mistake_type, timestamp
+    FROM mistakes
+    ORDER BY timestamp DESC
+    LIMIT ?
+"""
+
+# Reads only the (session_id, due_at) index, which carries the row id
+SELECT_REVIEW_ITEMS = """
+    SELECT id, due_at
+    FROM mistakes
+    WHERE session_id = ?
+"""
+
+# Rows added since a load: the unary + keeps SQLite on the rowid range,
+# so the cost is the number of new rows rather than the session's history
+SELECT_NEW_REVIEW_ITEMS = """
+    SELECT id, due_at
+    FROM mistakes
+    WHERE id > ? AND +session_id = ?
+"""
+
+SELECT_REVIEW_CARD = """
+    SELECT id, user_input, mistake_type, correction, review_count, mastered
+    FROM mistakes
+    WHERE id = ?
+"""
+
+SELECT_REVIEW_STATE = """
+    SELECT ease, review_interval, review_streak
+    FROM mistakes
+    WHERE id = ?
+"""
+
+UPDATE_REVIEW = """
+    UPDATE mistakes
+    SET ease = ?, review_interval = ?, review_streak = ?, mastered = ?, due_at = ?,
+        review_count = review_count + 1
+    WHERE id = ?
+"""
+
+# Duplicates of a stored challenge (same key and prompt) are skipped
+INSERT_CHALLENGE = """
+    INSERT OR IGNORE INTO challenges (target_lang, difficulty, scene, prompt, answer, hint, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+SELECT_CHALLENGES = """
+    SELECT id, prompt, answer, hint
+    FROM challenges
+    WHERE target_lang = ? AND difficulty = ? AND scene = ?
+"""
+
+SELECT_CHALLENGE_COUNTS = """
+    SELECT target_lang, difficulty, scene, COUNT(*)
+    FROM challenges
+    GROUP BY target_lang, difficulty, scene
+"""
+
+# Keyset pagination for backfills: each page is a seek on the primary key
+SELECT_CHATS_AFTER = """
+    SELECT id, session_id, user_input, bot_response, sentiment_score, scene, timestamp
+    FROM chats
+    WHERE id > ?
+    ORDER BY id
+    LIMIT ?
+"""
+
+SELECT_CHAT_ID_RANGE = """
+    SELECT MIN(id), MAX(id) FROM chats
+"""
+
+SELECT_CHAT_MISTAKES = """
+    SELECT id, chat_id, mistake_type
+    FROM mistakes
+    WHERE chat_id BETWEEN ? AND ?
+"""
+
+UPDATE_CHAT_SENTIMENT = """
+    UPDATE chats SET sentiment_score = ? WHERE id = ?
+"""
+
+UPDATE_MISTAKE_TYPE = """
+    UPDATE mistakes SET mistake_type = ? WHERE id = ?
+"""
+
+DELETE_MISTAKE = """
+    DELETE FROM mistakes WHERE id = ?
+"""
+
+# Learner history tables that can be exported, with the column incremental
+# exports are bounded by: when the row was last written (see migration 13)
+HISTORY_TABLES = {"chats": "updated_at", "mistakes": "updated_at", "user_progress": "updated_at"}
+
+SELECT_ALL_HISTORY_AFTER = {
+    table: f"SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?"
+    for table in HISTORY_TABLES
+}
+
+# Incremental exports page through the updated_at index by (updated_at, id),
+# so they read only the rows written since the watermark, old or new
+SELECT_HISTORY_AFTER = {
+    table: f"SELECT * FROM {table} WHERE ({column}, id) > (?, ?) ORDER BY {column}, id LIMIT ?"
+    for table, column in HISTORY_TABLES.items()
+}
+
+HISTORY_EMPTY = "SELECT " + " AND ".join(f"NOT EXISTS (SELECT 1 FROM {table})" for table in HISTORY_TABLES)
+
+SELECT_DATABASE_INFO = "SELECT value FROM database_info WHERE key = ?"
+
+UPSERT_DATABASE_INFO = """
+    INSERT INTO database_info (key, value) VALUES (?, ?)
+    ON CONFLICT (key) DO UPDATE SET value = excluded.value
+"""
+
+SELECT_CACHED_RESPONSE = """
+    SELECT created_at, body
+    FROM response_cache
+    WHERE key = ? AND created_at >= ?
+"""
+
+UPSERT_CACHED_RESPONSE = """
+    INSERT OR REPLACE INTO response_cache (key, body, created_at)
+    VALUES (?, ?, ?)
+"""
+
+DELETE_EXPIRED_RESPONSES = "DELETE FROM response_cache WHERE created_at < ?"
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections, opened lazily up to size."""
+
+    def __init__(self, path=DATABASE_PATH, size=DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the block."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and commit on success, roll back on error."""
+        with self.connection() as conn:
+            with conn:
+                yield conn
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._opened -= 1
+
+class Storage:
+    """Repository for chats and mistakes backed by a connection pool.
+
+    mistakes_version changes with every committed change to the mistakes
+    that derived views show, whichever process made it, so readers can tell
+    when those views are stale.
+    """
+
+    def __init__(self, path=DATABASE_PATH, pool_size=DB_POOL_SIZE):
+        self.pool = ConnectionPool(path, pool_size)
+
+    @property
+    def mistakes_version(self):
+        """The trigger-maintained counter in database_info: one indexed read."""
+        return int(self.database_info("mistakes_version") or 0)
+
+    def migrate(self):
+        """Bring the schema up to date, keeping existing data; returns its version."""
+        with self.pool.connection() as conn:
+            return migrate(conn)
+
+    def schema_version(self):
+        """The schema version, read without migrating."""
+        with self.pool.connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def record_turn(self, user_input, bot_response, sentiment_score, scene,
+                    mistake_type="general", session_id="", timestamp=None):
+        """Store a chat turn, plus a mistake row unless mistake_type is "general".
+
+        Timestamps are integer Unix epoch seconds.
+        """
+        timestamp = timestamp or int(time.time())
+        with self.pool.transaction() as conn:
+            chat_id = conn.execute(
+                INSERT_CHAT, (session_id, user_input, bot_response, sentiment_score, scene, timestamp)
+            ).lastrowid
+            if mistake_type != "general":
+                conn.execute(INSERT_MISTAKE, (session_id, user_input, mistake_type, bot_response,
+                                              "Extracted from conversation", scene, timestamp, timestamp, chat_id))
+
+    def record_turns(self, turns):
+        """Store many turns in one transaction.
+
+        turns holds (session_id, user_input, bot_response, sentiment_score,
+        scene, mistake_type, timestamp) tuples.
+        """
+        with self.pool.transaction() as conn:
+            conn.executemany(INSERT_CHAT, [
+                (session_id, user_input, bot_response, sentiment_score, scene, timestamp)
+                for session_id, user_input, bot_response, sentiment_score, scene, _, timestamp in turns
+            ])
+            # The transaction holds the write lock, so the new chats took
+            # consecutive ids ending at last_insert_rowid()
+            first_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0] - len(turns) + 1
+            mistakes = [
+                (session_id, user_input, mistake_type, bot_response, "Extracted from conversation", scene,
+                 timestamp, timestamp, first_id + index)
+                for index, (session_id, user_input, bot_response, _, scene, mistake_type, timestamp)
+                in enumerate(turns)
+                if mistake_type != "general"
+            ]
+            conn.executemany(INSERT_MISTAKE, mistakes)
+
+    def recent_context(self, limit=3, session_id=""):
+        """Return the session's last limit (user_input, bot_response) pairs, oldest first."""
+        with self.pool.connection() as conn:
+            rows = conn.execute(SELECT_RECENT_CONTEXT, (session_id, limit)).fetchall()
+        return rows[::-1]
+
+    def mistake_stats(self, session_id=None):
+        """Return (mistake_type, count, mastered_count) rows, most frequent first.
+
+        Covers every session unless session_id is given.
+        """
+        with self.pool.connection() as conn:
+            if session_id is None:
+                return conn.execute(SELECT_MISTAKE_STATS).fetchall()
+            return conn.execute(SELECT_SESSION_MISTAKE_STATS, (session_id,)).fetchall()
+
+    def scene_stats(self, limit=3, session_id=None):
+        """Return (scene, count) rows for the most practiced scenes."""
+        with self.pool.connection() as conn:
+            if session_id is None:
+                return conn.execute(SELECT_SCENE_STATS, (limit,)).fetchall()
+            return conn.execute(SELECT_SESSION_SCENE_STATS, (session_id, limit)).fetchall()
+
+    def recent_mistakes(self, limit=5):
+        """Return (user_input, correction, mistake_type, timestamp) rows, newest first."""
+        with self.pool.connection() as conn:
+            return conn.execute(SELECT_RECENT_MISTAKES, (limit,)).fetchall()
+
+    def review_items(self, session_id, after_id=0):
+        """Return (mistake_id, due_at) for the session's mistakes, or only those after after_id."""
+        with self.pool.connection() as conn:
+            if after_id:
+                return conn.execute(SELECT_NEW_REVIEW_ITEMS, (after_id, session_id)).fetchall()
+            return conn.execute(SELECT_REVIEW_ITEMS, (session_id,)).fetchall()
+
+    def review_cards(self, mistake_ids):
+        """Return (id, user_input, mistake_type, correction, review_count, mastered) rows in the given order."""
+        with self.pool.connection() as conn:
+            rows = [conn.execute(SELECT_REVIEW_CARD, (mistake_id,)).fetchone() for mistake_id in mistake_ids]
+        return [row for row in rows if row is not None]
+
+    def record_review(self, mistake_id, quality, now=None):
+        """Apply an SM-2 review graded quality (0-5) to a mistake; returns its next due time.
+
+        Returns None if the mistake no longer exists.
+        """
+        now = now or int(time.time())
+        with self.pool.transaction() as conn:
+            row = conn.execute(SELECT_REVIEW_STATE, (mistake_id,)).fetchone()
+            if row is None:
+                return None
+            ease, interval, streak, mastered = sm2(*row, quality)
+            due_at = now + interval
+            conn.execute(UPDATE_REVIEW, (ease, interval, streak, mastered, due_at, mistake_id))
+        return due_at
+
+    def store_challenges(self, rows):
+        """Add (target_lang, difficulty, scene, prompt, answer, hint, created_at) rows; returns how many were new."""
+        with self.pool.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(INSERT_CHALLENGE, rows)
+            return conn.total_changes - before
+
+    def challenges(self, target_lang, difficulty, scene):
+        """Return (id, prompt, answer, hint) rows in the bank for one key."""
+        with self.pool.connection() as conn:
+            return conn.execute(SELECT_CHALLENGES, (target_lang, difficulty, scene)).fetchall()
+
+    def challenge_counts(self):
+        """Return {(target_lang, difficulty, scene): count} for the whole bank."""
+        with self.pool.connection() as conn:
+            return {tuple(row[:3]): row[3] for row in conn.execute(SELECT_CHALLENGE_COUNTS)}
+
+    def chats_after(self, last_id, limit):
+        """Return up to limit (id, session_id, user_input, bot_response, sentiment_score, scene,
+        timestamp) chat rows with id above last_id, in id order."""
+        with self.pool.connection() as conn:
+            return conn.execute(SELECT_CHATS_AFTER, (last_id, limit)).fetchall()
+
+    def chat_id_range(self):
+        """Return (min_id, max_id) of the chats table, (None, None) when empty."""
+        with self.pool.connection() as conn:
+            return conn.execute(SELECT_CHAT_ID_RANGE).fetchone()
+
+    def apply_reanalysis(self, chats, results, sentiment=True, mistakes=True):
+        """Write re-analysis results for a chunk of chats in one transaction.
+
+        chats are rows as returned by chats_after, and results the matching
+        (chat_id, sentiment_score, mistake_type) tuples in the same order.
+        Changed scores are updated. Each chat's mistake row is inserted,
+        retyped or deleted to match its new mistake_type. Returns counts
+        of each kind of change.
+        """
+        counts = {"sentiment": 0, "inserted": 0, "retyped": 0, "deleted": 0}
+        if not chats:
+            return counts
+        scores, inserts, retypes, deletes = [], [], [], []
+        with self.pool.transaction() as conn:
+            existing = {}
+            if mistakes:
+                for mistake_id, chat_id, mistake_type in conn.execute(
+                    SELECT_CHAT_MISTAKES, (chats[0][0], chats[-1][0])
+                ):
+                    existing.setdefault(chat_id, []).append((mistake_id, mistake_type))
+            for (chat_id, session_id, user_input, bot_response, old_score, scene, timestamp), (_, score, mistake_type) \
+                    in zip(chats, results):
+                if sentiment and (old_score is None or abs(old_score - score) > 1e-9):
+                    scores.append((score, chat_id))
+                if not mistakes:
+                    continue
+                stored = existing.get(chat_id, [])
+                if mistake_type == "general":
+                    deletes += [(mistake_id,) for mistake_id, _ in stored]
+                elif not stored:
+                    inserts.append((session_id, user_input, mistake_type, bot_response, "Extracted from conversation",
+                                    scene, timestamp, timestamp, chat_id))
+                else:
+                    retypes += [(mistake_type, mistake_id) for mistake_id, old_type in stored if old_type != mistake_type]
+            conn.executemany(UPDATE_CHAT_SENTIMENT, scores)
+            conn.executemany(INSERT_MISTAKE, inserts)
+            conn.executemany(UPDATE_MISTAKE_TYPE, retypes)
+            conn.executemany(DELETE_MISTAKE, deletes)
+        counts.update(sentiment=len(scores), inserted=len(inserts), retyped=len(retypes), deleted=len(deletes))
+        return counts
+
+    def history_columns(self, table):
+        """Column names of a HISTORY_TABLES table, in table order."""
+        if table not in HISTORY_TABLES:
+            raise ValueError(f"unknown history table: {table}")
+        with self.pool.connection() as conn:
+            return tuple(row[1] for row in conn.execute(f"PRAGMA table_info({table})"))
+
+    def history_rows(self, table, since=None, chunk_size=1000):
+        """Yield a table's rows as lists of at most chunk_size tuples.
+
+        Without since, every row is yielded in id order. With since, only
+        rows whose HISTORY_TABLES column is at least since are yielded, in
+        that column's order. Each chunk is read separately, so a long export
+        never holds a read transaction open or more than one chunk in memory.
+        """
+        columns = self.history_columns(table)
+        id_column = columns.index("id")
+        column = columns.index(HISTORY_TABLES[table])
+        last_id, last_value = 0, since
+        while True:
+            with self.pool.connection() as conn:
+                if since is None:
+                    rows = conn.execute(SELECT_ALL_HISTORY_AFTER[table], (last_id, chunk_size)).fetchall()
+                else:
+                    rows = conn.execute(SELECT_HISTORY_AFTER[table], (last_value, last_id, chunk_size)).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id, last_value = rows[-1][id_column], rows[-1][column]
+
+    def import_history(self, table, columns, rows):
+        """Insert or update rows of a HISTORY_TABLES table by id, in one transaction.
+
+        Rows that are already stored are updated in place, so importing the
+        same export twice, or overlapping incremental exports, is harmless.
+        Ids are kept, so rows from another database would overwrite unrelated
+        rows with the same ids; export.import_history checks where an export
+        came from before calling this. The stats triggers keep the totals
+        tables in step. Returns the row count.
+        """
+        known = self.history_columns(table)
+        unknown = [column for column in columns if column not in known]
+        if unknown:
+            raise ValueError(f"{table} has no column {', '.join(unknown)}; migrate the database first")
+        if "id" not in columns:
+            raise ValueError(f"{table} rows need an id column")
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != "id")
+        statement = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (id) DO UPDATE SET {updates}"
+        )
+        if "updated_at" in columns:
+            # Rows already imported at this version are left alone
+            statement += f" WHERE excluded.updated_at IS NOT {table}.updated_at"
+        with self.pool.transaction() as conn:
+            conn.executemany(statement, rows)
+        return len(rows)
+
+    def history_empty(self):
+        with self.pool.connection() as conn:
+            return bool(conn.execute(HISTORY_EMPTY).fetchone()[0])
+
+    def database_info(self, key):
+        """A value from database_info (e.g. "database_id"), or None."""
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_DATABASE_INFO, (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_database_info(self, key, value):
+        with self.pool.transaction() as conn:
+            conn.execute(UPSERT_DATABASE_INFO, (key, value))
+
+    def cached_response(self, key, min_created_at):
+        """Return (created_at, body) for a cached reply no older than min_created_at."""
+        with self.pool.connection() as conn:
+            return conn.execute(SELECT_CACHED_RESPONSE, (key, min_created_at)).fetchone()
+
+    def store_cached_response(self, key, body, created_at):
+        with self.pool.transaction() as conn:
+            conn.execute(UPSERT_CACHED_RESPONSE, (key, body, created_at))
+
+    def prune_cached_responses(self, min_created_at):
+        """Delete cached replies older than min_created_at; returns how many."""
+        with self.pool.transaction() as conn:
+            return conn.execute(DELETE_EXPIRED_RESPONSES, (min_created_at,)).rowcount
+
+# Shared repository used by the app
+storage = Storage()
@@ -0,0 +1,139 @@
+# write_behind.py
+
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import WRITE_QUEUE_SIZE, WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL
+from logs import fields, get_logger
+from metrics import metrics
+from mistakes import analyze_mistake
+
+log = get_logger("write_behind")
+
+_STOP = object()
+
+class WriteBehindQueue:
+    """Persists chat turns from a background thread in batched transactions.
+
+    submit() only enqueues, so the user-facing path never waits on SQLite or
+    an fsync. The writer commits up to max_batch turns at a time, or whatever
+    has arrived within flush_interval seconds of the first queued turn.
+    When the bounded queue is full, a caller on a plain thread writes the
+    turn itself instead of blocking. On an event loop the overflow write
+    goes to the loop's default executor, so other streaming turns never
+    wait on SQLite.
+    """
+
+    def __init__(self, store, max_queue=WRITE_QUEUE_SIZE, max_batch=WRITE_BATCH_SIZE,
+                 flush_interval=WRITE_FLUSH_INTERVAL):
+        self.store = store
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.overflows = 0
+        self.total_flush_time = 0.0
+        self.max_flush_time = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def submit(self, session_id, user_input, bot_response, sentiment_score, scene, timestamp=None):
+        """Queue a turn for storage; the returned Future resolves once it is committed."""
+        self.start()
+        turn = (session_id, user_input, bot_response, sentiment_score, scene, timestamp or int(time.time()))
+        future = Future()
+        try:
+            self._queue.put_nowait((turn, future))
+        except queue.Full:
+            with self._lock:
+                self.overflows += 1
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._write([(turn, future)])
+            else:
+                loop.run_in_executor(None, self._write, [(turn, future)])
+        return future
+
+    def flush(self, timeout=None):
+        """Block until every turn queued so far has been committed."""
+        if self._thread is None:
+            return
+        marker = Future()
+        self._queue.put((None, marker))
+        marker.result(timeout)
+
+    def stop(self, timeout=10):
+        """Write out everything still queued and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put((_STOP, None))
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # Flush markers (None) and _STOP close the batch early
+            while len(batch) < self.max_batch and batch[-1][0] is not None and batch[-1][0] is not _STOP:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stopping = batch[-1][0] is _STOP
+            self._write([item for item in batch if item[0] is not _STOP])
+            if stopping:
+                return
+
+    def _write(self, batch):
+        turns = [turn for turn, _ in batch if turn is not None]
+        start = time.perf_counter()
+        try:
+            rows = []
+            for session_id, user_input, bot_response, sentiment_score, scene, timestamp in turns:
+                with metrics.timer("mistake"):
+                    mistake_type = analyze_mistake(user_input, bot_response)
+                rows.append((session_id, user_input, bot_response, sentiment_score, scene, mistake_type, timestamp))
+            if rows:
+                with metrics.timer("db_insert"):
+                    self.store.record_turns(rows)
+        except Exception as e:
+            log.exception("write_behind_flush_failed", extra=fields(turns=len(turns)))
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.batches += 1
+            self.rows += len(turns)
+            self.total_flush_time += elapsed
+            self.max_flush_time = max(self.max_flush_time, elapsed)
+        for _, future in batch:
+            future.set_result(None)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "rows": self.rows,
+                "overflows": self.overflows,
+                "avg_flush_ms": self.total_flush_time / self.batches * 1000 if self.batches else 0.0,
+                "max_flush_ms": self.max_flush_time * 1000
+            }